@@ -0,0 +1,97 @@
+# Copyright 2016 Tesora Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Time the validation of API request bodies against their schemas.
+
+Usage: tools/with_venv.sh python tools/benchmark_validation.py [count]
+
+For each request, this prints the time it takes to validate its body with
+a validator built for every request, as the API used to, and with the
+validator the API keeps for the schema.
+"""
+
+import sys
+import timeit
+import uuid
+
+import jsonschema
+
+from trove.common import apischema
+from trove.common import wsgi
+
+
+def cluster_create(size):
+    return {"cluster": {
+        "name": "products",
+        "datastore": {"type": "mongodb", "version": "3.2"},
+        "instances": [{"flavorRef": "7", "volume": {"size": 10},
+                       "nics": [{"net-id": "net"}],
+                       "availability_zone": "nova",
+                       "modules": [{"id": str(uuid.uuid4())}]}
+                      for _ in range(size)]}}
+
+
+def configuration_create(size):
+    return {"configuration": {
+        "name": "large",
+        "description": "Many values",
+        "datastore": {"type": "mysql", "version": "5.6"},
+        "values": dict(("param_%d" % i, i) for i in range(size))}}
+
+
+def instance_resize():
+    return {"resize": {"flavorRef": "7"}}
+
+
+REQUESTS = [
+    ("cluster create (3 instances)", apischema.cluster['create'],
+     cluster_create(3)),
+    ("cluster create (50 instances)", apischema.cluster['create'],
+     cluster_create(50)),
+    ("configuration create (10 values)", apischema.configuration['create'],
+     configuration_create(10)),
+    ("configuration create (500 values)", apischema.configuration['create'],
+     configuration_create(500)),
+    ("instance resize action", apischema.instance['action']['resize'][
+        'flavorRef'], instance_resize()),
+]
+
+
+def uncached(schema, body):
+    validator = jsonschema.Draft4Validator(schema)
+    if not validator.is_valid(body):
+        sorted(validator.iter_errors(body), key=lambda e: e.path)
+
+
+def cached(schema, body):
+    sorted(wsgi.get_validator(schema).iter_errors(body),
+           key=lambda e: e.path)
+
+
+def main(count):
+    print("%-36s %12s %12s" % ("request (%d runs)" % count,
+                               "uncached ms", "cached ms"))
+    for name, schema, body in REQUESTS:
+        # Both must accept the body, or this times the error path.
+        if list(wsgi.get_validator(schema).iter_errors(body)):
+            raise ValueError("Invalid body for %s." % name)
+        times = [timeit.timeit(lambda: func(schema, body), number=count)
+                 for func in (uncached, cached)]
+        print("%-36s %12.3f %12.3f" % (
+            name, times[0] * 1000 / count, times[1] * 1000 / count))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000)
@@ -15,7 +15,6 @@
 """Model classes that form the core of snapshots functionality."""
 
 from oslo_log import log as logging
-from sqlalchemy import desc
 from swiftclient.client import ClientException
 
 from trove.backup.state import BackupState
@@ -25,6 +24,7 @@ from trove.common.i18n import _
 from trove.common.remote import create_swift_client
 from trove.common import utils
 from trove.datastore import models as datastore_models
+from trove.db import get_db_api
 from trove.db.models import DatabaseModelBase
 from trove.quota.quota import run_with_quotas
 from trove.taskmanager import api
@@ -179,22 +179,13 @@ class Backup(object):
     @classmethod
     def _paginate(cls, context, query):
         """Paginate the results of the base query.
-        We use limit/offset as the results need to be ordered by date
-        and not the primary key.
+        The results are ordered by date, most recent first, and paginated
+        on (updated, id) as dates are not unique.
         """
-        marker = int(context.marker or 0)
         limit = int(context.limit or CONF.backups_page_size)
-        # order by 'updated DESC' to show the most recent backups first
-        query = query.order_by(desc(DBBackup.updated))
-        # Apply limit/offset
-        query = query.limit(limit)
-        query = query.offset(marker)
-        # check if we need to send a marker for the next page
-        if query.count() < limit:
-            marker = None
-        else:
-            marker += limit
-        return query.all(), marker
+        return get_db_api().paginate_by_keys(
+            query, [(DBBackup.updated, True), (DBBackup.id, True)], limit,
+            marker=context.marker)
 
     @classmethod
     def list(cls, context, datastore=None):
@@ -315,7 +306,7 @@ class DBBackup(DatabaseModelBase):
                     'size', 'tenant_id', 'state', 'instance_id',
                     'checksum', 'backup_timestamp', 'deleted', 'created',
                     'updated', 'deleted_at', 'parent_id',
-                    'datastore_version_id']
+                    'datastore_version_id', 'progress']
     preserve_on_delete = True
 
     @property
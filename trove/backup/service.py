@@ -45,10 +45,12 @@ class BackupController(wsgi.Controller):
         context = req.environ[wsgi.CONTEXT_KEY]
         policy.authorize_on_tenant(context, 'backup:index')
         backups, marker = Backup.list(context, datastore)
+        etag = wsgi.etag(req, [marker, [backup.data() for backup in backups]])
+        wsgi.check_etag(req, etag)
         view = views.BackupViews(backups)
         paged = pagination.SimplePaginatedDataView(req.url, 'backups', view,
                                                    marker)
-        return wsgi.Result(paged.data(), 200)
+        return wsgi.Result(paged.data(), 200, etag=etag)
 
     def show(self, req, tenant_id, id):
         """Return a single backup."""
@@ -212,6 +212,22 @@ class Cluster(object):
         return inst_models.Instances.load_all_by_cluster_id(
             self.context, self.db_info.id, load_servers=False)
 
+    def get_etag_data(self):
+        """Return the database records the API shows of the cluster, from
+        which its ETag is built.
+        """
+        db_instances = inst_models.DBInstance.find_all(
+            cluster_id=self.id, deleted=False).all()
+        statuses = dict(
+            (status.instance_id, status) for status in
+            inst_models.InstanceServiceStatus.find_all_in(
+                'instance_id', [db_inst.id for db_inst in db_instances]))
+        data = self.db_info.data()
+        data['instances'] = [
+            inst_models.get_etag_data(db_inst, statuses.get(db_inst.id))
+            for db_inst in sorted(db_instances, key=lambda i: i.id)]
+        return data
+
     @property
     def server_group(self):
         # The server group could be empty, so we need a flag to cache it
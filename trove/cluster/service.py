@@ -87,7 +87,14 @@ class ClusterController(wsgi.Controller):
         context = req.environ[wsgi.CONTEXT_KEY]
         cluster = models.Cluster.load(context, id)
         self.authorize_cluster_action(context, 'show', cluster)
-        return wsgi.Result(views.load_view(cluster, req=req).data(), 200)
+        etag = None
+        if CONF.api_etag_max_age:
+            # Answer polling clients before asking Nova about the instances.
+            etag = wsgi.etag(req, [context.is_admin, cluster.get_etag_data()],
+                             max_age=CONF.api_etag_max_age)
+            wsgi.check_etag(req, etag)
+        return wsgi.Result(views.load_view(cluster, req=req).data(), 200,
+                           etag=etag)
 
     def show_instance(self, req, tenant_id, cluster_id, instance_id):
         """Return a single instance belonging to a cluster."""
@@ -83,6 +83,8 @@ class ClusterView(object):
             }
             if instance.shard_id:
                 instance_dict["shard_id"] = instance.shard_id
+            if getattr(instance, 'load_error', None):
+                instance_dict["error"] = instance.load_error
             if self.load_servers:
                 instance_dict["status"] = instance.status
                 if CONF.get(instance.datastore_version.manager).volume_support:
@@ -89,6 +89,10 @@ class API(wsgi.Router):
                        controller=instance_resource,
                        action="create",
                        conditions={'method': ['POST']})
+        mapper.connect("/{tenant_id}/instances/detail",
+                       controller=instance_resource,
+                       action="detail",
+                       conditions={'method': ['GET']})
         mapper.connect("/{tenant_id}/instances/{id}",
                        controller=instance_resource,
                        action="show",
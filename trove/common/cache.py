@@ -0,0 +1,108 @@
+# Copyright 2016 Tesora Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import collections
+import time
+
+import eventlet
+from oslo_log import log as logging
+
+from trove.common import cfg
+from trove.common.i18n import _
+
+LOG = logging.getLogger(__name__)
+CONF = cfg.CONF
+
+
+class StaleWhileRevalidateCache(object):
+    """A per-process cache of values that are slow to look up.
+
+    A value is served from the cache for api_cache_ttl seconds. For
+    api_cache_stale_ttl seconds more, it is still served, while a
+    background greenthread loads a fresh one. Older values are loaded
+    before returning, as if they were not cached at all. A failed
+    background load drops the value, so that the next caller sees the
+    error. The cache holds up to api_cache_size values, dropping the least
+    recently used ones first.
+    """
+
+    def __init__(self, ttl=None, stale_ttl=None, size=None):
+        self._ttl = ttl
+        self._stale_ttl = stale_ttl
+        self._size = size
+        self._entries = collections.OrderedDict()
+        self._refreshing = set()
+
+    @property
+    def ttl(self):
+        return CONF.api_cache_ttl if self._ttl is None else self._ttl
+
+    @property
+    def stale_ttl(self):
+        return (CONF.api_cache_stale_ttl if self._stale_ttl is None
+                else self._stale_ttl)
+
+    @property
+    def size(self):
+        return CONF.api_cache_size if self._size is None else self._size
+
+    def get(self, key, load, use_cache=True):
+        """Return the value of key, calling load() to look it up.
+
+        :param use_cache: False to always call load(). The value it returns
+                          is still cached for later callers.
+        """
+        entry = self._entries.pop(key, None) if use_cache else None
+        if entry is not None:
+            age = time.time() - entry[1]
+            if age <= self.ttl + self.stale_ttl:
+                self._entries[key] = entry
+                if age > self.ttl and key not in self._refreshing:
+                    self._refreshing.add(key)
+                    eventlet.spawn_n(self._refresh, key, load, entry)
+                return entry[0]
+        value = load()
+        self.set(key, value)
+        return value
+
+    def _refresh(self, key, load, entry):
+        try:
+            value = load()
+            # Do not overwrite a value invalidated in the meantime.
+            if self._entries.get(key) is entry:
+                self.set(key, value)
+        except Exception:
+            LOG.exception(_("Error refreshing cached value of %s."), key)
+            if self._entries.get(key) is entry:
+                self.invalidate(key)
+        finally:
+            self._refreshing.discard(key)
+
+    def set(self, key, value):
+        self._entries.pop(key, None)
+        if self.ttl <= 0:
+            return
+        self._entries[key] = [value, time.time()]
+        while len(self._entries) > self.size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, key):
+        self._entries.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
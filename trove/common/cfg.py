@@ -123,6 +123,36 @@ common_opts = [
               help='Host to listen for RPC messages.'),
     cfg.IntOpt('report_interval', default=30,
                help='The interval (in seconds) which periodic tasks are run.'),
+    cfg.BoolOpt('root_helper_daemon', default=False,
+                help='Whether guests run the file operations they need root '
+                'for (existence checks, reads, writes, listing, chown and '
+                'chmod) in a helper process started once with sudo, instead '
+                'of running sudo for each of them. Guests fall back to sudo '
+                'when the helper fails.'),
+    cfg.StrOpt('root_helper_socket',
+               default='/var/run/trove-guestagent/root-helper.sock',
+               help='Path of the unix socket of the guest root helper.'),
+    cfg.IntOpt('root_helper_connections', default=4, min=1,
+               help='Maximum number of connections a guest opens to its '
+               'root helper, which runs the operations of each connection '
+               'in its own thread.'),
+    cfg.IntOpt('status_keepalive_interval', default=0, min=0,
+               help='Maximum interval (in seconds) between the heartbeats of '
+               'a guest whose datastore status does not change. Guests send '
+               'a heartbeat when the status changes, and otherwise only '
+               'when this interval would be exceeded. Set the same value on '
+               'guests and on the control plane, which considers a guest '
+               'unreachable after this interval plus '
+               'agent_heartbeat_expiry. 0 sends a heartbeat every '
+               'report_interval.'),
+    cfg.IntOpt('status_probe_timeout', default=3, min=1,
+               help='Timeout (in seconds) of the connection guests keep to '
+               'their datastore to check its status.'),
+    cfg.IntOpt('status_transition_interval', default=5, min=0,
+               help='The interval (in seconds) at which guests check the '
+               'status of a datastore that is starting, stopping or '
+               'recovering, when it is less than report_interval. 0 checks '
+               'it every report_interval.'),
     cfg.BoolOpt('trove_dns_support', default=False,
                 help='Whether Trove should add DNS entries on create '
                      '(using Designate DNSaaS).'),
@@ -164,6 +194,53 @@ common_opts = [
                help='Page size for listing databases.'),
     cfg.IntOpt('instances_page_size', default=20,
                help='Page size for listing instances.'),
+    cfg.IntOpt('db_slave_max_lag', default=30, min=0,
+               help='Maximum number of seconds the slave database '
+               '([database] slave_connection) may be behind the master for '
+               'the API to send the reads of GET requests to it. The reads '
+               'of a tenant that wrote less than this plus '
+               'db_slave_check_interval seconds ago go to the master.'),
+    cfg.IntOpt('db_slave_check_interval', default=10, min=1,
+               help='Number of seconds between checks of the health and '
+               'replication lag of the slave database.'),
+    cfg.IntOpt('api_cache_ttl', default=0, min=0,
+               help='Number of seconds the API serves the status and '
+               'addresses of Nova servers, and the volume usage reported '
+               'by guests, from a per-process cache. 0 disables the cache. '
+               'Requests with a "Cache-Control: no-cache" header always '
+               'get fresh data.'),
+    cfg.IntOpt('api_cache_stale_ttl', default=60, min=0,
+               help='Number of seconds after api_cache_ttl during which '
+               'cached data is still served while it is refreshed in the '
+               'background.'),
+    cfg.IntOpt('api_cache_size', default=10000, min=1,
+               help='Maximum number of entries in each API cache.'),
+    cfg.IntOpt('datastore_catalog_ttl', default=60, min=0,
+               help='Number of seconds datastores, datastore versions, '
+               'capabilities, flavor associations and configuration '
+               'parameters are served from a per-process cache before '
+               'checking whether they were changed. Changes made through '
+               'trove-manage or the management API are seen by other '
+               'processes within this time. 0 disables the cache.'),
+    cfg.IntOpt('api_etag_max_age', default=0, min=0,
+               help='Maximum number of seconds the ETag of an instance or '
+               'cluster stays the same while its database records do not '
+               'change. Clients polling with If-None-Match may not see '
+               'changes of Nova servers or of volume usage for this long. '
+               '0 disables ETags on instances and clusters.'),
+    cfg.IntOpt('api_fanout_concurrency', default=10, min=1,
+               help='Maximum number of cluster members, or of Nova, Cinder '
+               'and guest calls, the API loads at once for one request.'),
+    cfg.IntOpt('api_fanout_timeout', default=60, min=0,
+               help='Number of seconds the API waits for the cluster '
+               'members, or the Nova, Cinder and guest calls, it loads at '
+               'once for one request. The ones not loaded in time are '
+               'reported as failed. 0 waits for them all.'),
+    cfg.IntOpt('nova_server_lookup_limit', default=50, min=0,
+               help='Maximum number of Nova servers fetched one by one, '
+               'concurrently, when listing a page of instances. Pages '
+               'with more servers list all the servers of the tenant '
+               'instead.'),
     cfg.IntOpt('clusters_page_size', default=20,
                help='Page size for listing clusters.'),
     cfg.IntOpt('backups_page_size', default=20,
@@ -229,6 +306,21 @@ common_opts = [
     cfg.IntOpt('trove_conductor_workers',
                help='Number of workers for the Conductor service. The default '
                'will be the number of CPUs available.'),
+    cfg.IntOpt('conductor_heartbeat_batch_interval', default=0, min=0,
+               help='Number of seconds the Conductor buffers guest '
+               'heartbeats for before applying them to the database in a '
+               'single transaction. Only the newest heartbeat of each '
+               'instance is applied. 0 applies every heartbeat as it '
+               'arrives.'),
+    cfg.IntOpt('conductor_heartbeat_batch_size', default=500, min=1,
+               help='Maximum number of instances whose heartbeats are '
+               'buffered by the Conductor before they are applied, '
+               'regardless of conductor_heartbeat_batch_interval.'),
+    cfg.IntOpt('conductor_lastseen_cache_size', default=10000, min=0,
+               help='Number of (instance, method) last seen message '
+               'timestamps the Conductor keeps in memory, so that late '
+               'messages can be discarded without a database query. '
+               '0 disables the cache.'),
     cfg.StrOpt('use_nova_key_name', default=None,
                help='Use key_name for for nova instances'),
     cfg.BoolOpt('use_nova_server_config_drive', default=True,
@@ -326,6 +418,25 @@ common_opts = [
                 help='Encrypt backups using OpenSSL.'),
     cfg.StrOpt('backup_aes_cbc_key', default='default_aes_cbc_key',
                help='Default OpenSSL aes_cbc key.'),
+    cfg.BoolOpt('backup_use_inprocess_codec', default=False,
+                help='Compress and encrypt backups inside the guest agent '
+                'instead of piping them through gzip and openssl. Blocks of '
+                'the backup stream are compressed and encrypted (with '
+                'AES-256-CTR) concurrently, and the codec is recorded in the '
+                'backup metadata so restores pick the matching decoder.'),
+    cfg.StrOpt('backup_compression_codec', default='gzip',
+               choices=['gzip', 'zstd', 'lz4'],
+               help='Compression used when backup_use_inprocess_codec is '
+               'enabled. gzip output remains readable by gzip; zstd and lz4 '
+               'are faster but require the zstandard and lz4 python '
+               'modules on the guest.'),
+    cfg.IntOpt('backup_codec_block_size', default=1024 ** 2,
+               help='Size (in bytes) of the blocks of the backup stream that '
+               'are compressed and encrypted independently by the '
+               'in-process codec.'),
+    cfg.IntOpt('backup_codec_threads', default=None, min=1,
+               help='Number of blocks encoded concurrently by the in-process '
+               'backup codec. Defaults to the number of CPUs.'),
     cfg.BoolOpt('backup_use_snet', default=False,
                 help='Send backup files over snet.'),
     cfg.IntOpt('backup_chunk_size', default=2 ** 16,
@@ -337,6 +448,80 @@ common_opts = [
     cfg.IntOpt('backup_segment_max_size', default=2 * (1024 ** 3),
                help='Maximum size (in bytes) of each segment of the backup '
                'file.'),
+    cfg.IntOpt('backup_segment_upload_concurrency', default=1, min=1,
+               help='Number of backup segments uploaded to Swift '
+               'concurrently. With a value of 1 each segment is streamed '
+               'directly from the backup process; higher values read '
+               'segments ahead into a buffer while earlier segments are '
+               'still being uploaded.'),
+    cfg.IntOpt('backup_segment_download_concurrency', default=1, min=1,
+               help='Number of backup segments (or byte ranges of a single '
+               'segment backup) downloaded from Swift concurrently during a '
+               'restore. Segments are reassembled in order before being fed '
+               'to the restore process.'),
+    cfg.IntOpt('backup_segment_buffer_size', default=256 * (1024 ** 2),
+               help='Maximum amount of memory (in bytes) used to hold '
+               'read-ahead segments when uploading or downloading segments '
+               'concurrently. Segments that do not fit in their share of the '
+               'buffer are spooled to temporary files in '
+               'backup_segment_spool_dir.'),
+    cfg.StrOpt('backup_segment_spool_dir', default=None,
+               help='Directory used to spool read-ahead backup segments that '
+               'do not fit in memory. Defaults to the system temporary '
+               'directory.'),
+    cfg.IntOpt('backup_segment_upload_retries', default=3, min=0,
+               help='Number of times the upload of a buffered backup '
+               'segment is retried after a Swift error. Segments are '
+               'buffered when backup_segment_upload_concurrency is above 1 '
+               'or backup_journal_dir is set.'),
+    cfg.StrOpt('backup_journal_dir', default=None,
+               help='Directory in which the guest agent records the backup '
+               'segments committed to Swift. When set, a backup that is '
+               'retried after a failure does not upload again the segments '
+               'that are unchanged since the failed attempt, and the '
+               'segments of a failed backup are kept for the retry. The '
+               'segments a backup that is no longer running left in the '
+               'journal are deleted before the next backup. When not set, '
+               'the segments of a failed backup are deleted.'),
+    cfg.IntOpt('backup_retries', default=0, min=0,
+               help='Number of times the guest agent runs a backup again '
+               'after it failed to save it. With backup_journal_dir set, '
+               'the segments saved by the failed attempt are not uploaded '
+               'again if they are unchanged, and they are deleted once the '
+               'last attempt failed.'),
+    cfg.IntOpt('backup_progress_interval', default=60, min=0,
+               help='Interval (in seconds) at which the guest agent reports '
+               'the progress and throughput of a running backup or '
+               'restore. Set to 0 to only report them when the backup or '
+               'restore completes.'),
+    cfg.IntOpt('restore_buffer_size', default=64 * 1024 ** 2, min=0,
+               help='Maximum amount of backup data (in bytes) downloaded '
+               'ahead of the restore process during a restore.'),
+    cfg.IntOpt('restore_rate_limit', default=0, min=0,
+               help='Maximum rate (in bytes per second) at which backup '
+               'data is fed to the restore process. Use it to limit the '
+               'I/O a restore puts on shared storage. 0 means no limit.'),
+    cfg.IntOpt('restore_incremental_concurrency', default=2, min=1,
+               help='Number of backups of an incremental backup chain that '
+               'are downloaded and extracted at the same time during a '
+               'restore. The logs are always applied one backup at a time, '
+               'in order.'),
+    cfg.IntOpt('backup_dedup_chunk_size', default=4 * 1024 ** 2, min=4096,
+               help='Average size of the chunks a backup is split into by '
+               'the deduplicating (DedupStorage) storage strategy. Chunks '
+               'vary between a quarter and four times this size.'),
+    cfg.BoolOpt('backup_dedup_compress_chunks', default=True,
+                help='Compress each chunk stored by the deduplicating '
+                'storage strategy.'),
+    cfg.BoolOpt('backup_dedup_encrypt_chunks', default=True,
+                help='Encrypt each chunk stored by the deduplicating storage '
+                'strategy with a key derived from backup_aes_cbc_key.'),
+    cfg.IntOpt('backup_dedup_gc_grace_period', default=2 * 24 * 3600,
+               help='Chunks stored by the deduplicating storage strategy '
+               'are only garbage collected once they are this many seconds '
+               'old, and a backup still running after this long is '
+               'considered failed. This must be longer than the longest '
+               'running backup.'),
     cfg.StrOpt('remote_dns_client',
                default='trove.common.remote.dns_client',
                help='Client to send DNS calls to.'),
@@ -36,6 +36,8 @@ class TroveContext(context.RequestContext):
         self.marker = kwargs.pop('marker', None)
         self.service_catalog = kwargs.pop('service_catalog', None)
         self.user_identity = kwargs.pop('user_identity', None)
+        # False if the caller asked not to be served cached data.
+        self.use_cache = kwargs.pop('use_cache', True)
 
         # TODO(esp): not sure we need this
         self.timeout = kwargs.pop('timeout', None)
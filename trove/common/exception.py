@@ -222,6 +222,11 @@ class GuestError(TroveError):
                 "%(original_message)s.")
 
 
+class RootHelperError(TroveError):
+
+    message = _("The guest agent root helper failed: %(reason)s")
+
+
 class GuestTimeout(TroveError):
 
     message = _("Timeout trying to connect to the Guest Agent.")
@@ -233,6 +238,11 @@ class BadRequest(TroveError):
                 "either malformed or otherwise incorrect.")
 
 
+class InvalidMarker(BadRequest):
+
+    message = _("Invalid pagination marker: %(marker)s.")
+
+
 class MissingKey(BadRequest):
 
     message = _("Required element/key - %(key)s was not specified.")
@@ -329,6 +339,11 @@ class PollTimeOut(TroveError):
     message = _("Polling request timed out.")
 
 
+class FanOutTimeout(TroveError):
+
+    message = _("Timed out after %(timeout)s seconds.")
+
+
 class Forbidden(TroveError):
 
     message = _("User does not have admin privileges.")
@@ -0,0 +1,59 @@
+# Copyright 2016 Tesora Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import time
+
+import eventlet
+
+from trove.common import cfg
+from trove.common import exception
+
+CONF = cfg.CONF
+
+
+def fan_out(calls, concurrency=None, timeout=None):
+    """Run the given callables concurrently and return their results, in
+    the same order.
+
+    At most api_fanout_concurrency calls run at once, and all of them share
+    a deadline of api_fanout_timeout seconds from now. A call that raises
+    does not stop the others: its exception is returned in place of its
+    result, and a call that is not done by the deadline (or not started
+    before it) gets a FanOutTimeout.
+    """
+    calls = list(calls)
+    if not calls:
+        return []
+    if concurrency is None:
+        concurrency = CONF.api_fanout_concurrency
+    if timeout is None:
+        timeout = CONF.api_fanout_timeout
+    deadline = time.time() + timeout if timeout else None
+
+    def run(call):
+        remaining = None
+        if deadline is not None:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return exception.FanOutTimeout(timeout=timeout)
+        try:
+            with eventlet.Timeout(remaining,
+                                  exception.FanOutTimeout(timeout=timeout)):
+                return call()
+        except Exception as e:
+            return e
+
+    pool = eventlet.GreenPool(max(1, min(concurrency, len(calls))))
+    return list(pool.imap(run, calls))
@@ -13,10 +13,16 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import base64
 import bisect
 import collections
+import datetime
+import json
+
 import six.moves.urllib.parse as urllib_parse
 
+from trove.common import exception
+
 
 def url_quote(s):
     if s is None:
@@ -68,6 +74,31 @@ def paginate_dict_list(li, key, limit=None, marker=None, include_marker=False):
                          key=lambda x: x[key])
 
 
+def encode_marker(values):
+    """Encode the sort key values of the last item of a page into an
+    opaque marker for the next page.
+    """
+    values = [value.isoformat() if isinstance(value, datetime.datetime)
+              else value for value in values]
+    return base64.urlsafe_b64encode(
+        json.dumps(values).encode('utf-8')).decode('utf-8')
+
+
+def decode_marker(marker, length):
+    """Decode a marker made by encode_marker into its 'length' values.
+
+    Datetimes come back as ISO 8601 strings.
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(
+            str(marker)).decode('utf-8'))
+    except (TypeError, ValueError):
+        raise exception.InvalidMarker(marker=marker)
+    if not isinstance(values, list) or len(values) != length:
+        raise exception.InvalidMarker(marker=marker)
+    return values
+
+
 class PaginatedDataView(object):
 
     def __init__(self, collection_type, collection, current_page_url,
@@ -42,6 +42,19 @@ class ServerGroup(object):
                           compute_id)
         return server_group
 
+    @classmethod
+    def load_by_member(cls, context):
+        """Return the server groups of the tenant, keyed by compute id."""
+        client = create_nova_client(context)
+        server_groups = {}
+        try:
+            for sg in client.server_groups.list():
+                for member in sg.members:
+                    server_groups[member] = sg
+        except Exception:
+            LOG.exception(_("Could not load server groups"))
+        return server_groups
+
     @classmethod
     def create(cls, context, locality, name_suffix):
         client = create_nova_client(context)
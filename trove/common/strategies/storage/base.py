@@ -46,3 +46,13 @@ class Storage(Strategy):
     @abc.abstractmethod
     def get_container_name(self):
         """Get the name of the container."""
+
+    def discard(self, filename):
+        """Remove what failed attempts to save filename left behind."""
+
+    def leftovers(self):
+        """Return the filenames of the backups that attempts to save left
+        data for, so that it can be discarded once they are no longer
+        running.
+        """
+        return []
@@ -0,0 +1,546 @@
+# Copyright 2016 Tesora Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+#
+
+import binascii
+import datetime
+import hashlib
+import hmac
+import json
+import re
+import time
+import zlib
+
+import eventlet
+from eventlet import pools
+from eventlet import tpool
+from oslo_log import log as logging
+from oslo_utils import timeutils
+from swiftclient.client import ClientException
+
+from trove.common import cfg
+from trove.common.i18n import _
+from trove.common import remote
+from trove.common.strategies.storage import swift
+from trove.guestagent.common import backup_codec
+
+LOG = logging.getLogger(__name__)
+CONF = cfg.CONF
+
+CHUNK_PREFIX = 'chunks/'
+MANIFEST_PREFIX = 'dedup_'
+MANIFEST_VERSION = 1
+# Metadata header marking an object as a deduplicated backup manifest.
+MANIFEST_HEADER = 'x-object-meta-dedup-manifest'
+# Object holding the number of backups referring to each chunk.
+INDEX_NAME = 'chunk_references'
+INDEX_VERSION = 1
+# Objects listing the chunks of the backups being saved.
+PENDING_PREFIX = 'pending/'
+# Seconds a delete relies on the pending chunk lists it has read. A backup
+# checks that the chunks it reused still exist once this long has passed
+# since it listed them.
+REFERENCE_LIFETIME = 60
+KEY_SALT = b'trove-backup-dedup'
+
+
+class ContentDefinedChunker(object):
+    """Split a stream into chunks at content-defined boundaries.
+
+    Candidate boundaries are the places where two consecutive bytes belong
+    to a fixed set of anchor values. They are found with a regular
+    expression, so the scan runs at C speed, and a candidate is accepted if
+    the checksum of the window of bytes before it matches a mask. Boundaries
+    therefore depend only on the local content and, unlike fixed size
+    segments, line up again after data has been inserted or removed earlier
+    in the stream. The anchor set excludes the bytes that form long runs
+    (NUL, 0xff and space) which would otherwise produce a candidate at every
+    position.
+    """
+    anchor = re.compile(b'[\x01\x04\x18\x1b\x2f\x32\x46\x49'
+                        b'\x60\x77\x8e\xa5\xbc\xd3\xea\xed]{2}')
+    # Roughly one position in 256 is a candidate on high entropy data.
+    candidate_rate = 256
+    window = 48
+
+    def __init__(self, stream, average_size):
+        self.stream = stream
+        self.min_size = max(average_size // 4, self.window)
+        self.max_size = average_size * 4
+        accept_rate = max((average_size - self.min_size) //
+                          self.candidate_rate, 1)
+        # Round down to a power of two to build the mask.
+        self.mask = (1 << (accept_rate.bit_length() - 1)) - 1
+        self._buffer = b''
+        self._eof = False
+
+    def _boundary(self):
+        """Offset of the end of the next chunk in the buffer."""
+        for match in self.anchor.finditer(self._buffer, self.min_size,
+                                          self.max_size):
+            end = match.end()
+            window = self._buffer[end - self.window:end]
+            if zlib.crc32(window) & self.mask == 0:
+                return end
+        return self.max_size
+
+    def __iter__(self):
+        while True:
+            if not self._eof and len(self._buffer) < self.max_size:
+                data = self.stream.read(self.max_size - len(self._buffer))
+                if data:
+                    self._buffer += data
+                    continue
+                self._eof = True
+            if not self._buffer:
+                return
+            if len(self._buffer) <= self.min_size:
+                end = len(self._buffer)
+            else:
+                end = min(self._boundary(), len(self._buffer))
+            chunk = self._buffer[:end]
+            self._buffer = self._buffer[end:]
+            yield chunk
+
+
+class DedupStorage(swift.SwiftStorage):
+    """Deduplicating Storage Strategy for Swift.
+
+    The backup stream is split into content-defined chunks which are stored
+    under a name derived from their content, so a chunk shared by several
+    backups is only uploaded once. Each backup is saved as a manifest object
+    listing its chunks. Chunks are compressed and encrypted one by one, with
+    a nonce derived from their content so identical chunks are stored
+    identically; the backup runner should therefore be configured not to
+    compress or encrypt the stream itself.
+    """
+    __strategy_name__ = 'dedup'
+
+    def __init__(self, *args, **kwargs):
+        super(DedupStorage, self).__init__(*args, **kwargs)
+        self._key = backup_codec.AesCtrCipher.derive_key(
+            CONF.backup_aes_cbc_key, KEY_SALT)
+        self._compressor = backup_codec.GzipCompressor()
+
+    def _connection_pool(self, size):
+        # Swift connections are not safe to share between greenthreads.
+        return pools.Pool(
+            max_size=size,
+            create=lambda: remote.create_swift_client(self.context))
+
+    def _chunk_name(self, chunk):
+        return hmac.new(self._key, chunk, hashlib.sha256).hexdigest()
+
+    def _cipher(self, name):
+        # The nonce comes from the chunk name so that identical chunks are
+        # encrypted identically and can still be deduplicated.
+        nonce = binascii.unhexlify(name)[:backup_codec.AesCtrCipher.nonce_size]
+        return backup_codec.AesCtrCipher(None, salt=KEY_SALT, nonce=nonce,
+                                         key=self._key)
+
+    def _encode_chunk(self, name, chunk, manifest):
+        if manifest['compression'] != backup_codec.NONE:
+            chunk = self._compressor.compress_block(chunk)
+        if manifest['encryption'] != backup_codec.NONE:
+            chunk = self._cipher(name).encrypt_at(0, chunk)
+        return chunk
+
+    def _decode_chunk(self, name, data, manifest):
+        if manifest['encryption'] != backup_codec.NONE:
+            data = self._cipher(name).decrypt_at(0, data)
+        if manifest['compression'] != backup_codec.NONE:
+            decompressor = self._compressor.decompressor()
+            data = decompressor.decompress(data) + decompressor.flush()
+        if self._chunk_name(data) != name:
+            msg = _("Backup chunk %s failed its integrity check.") % name
+            LOG.error(msg)
+            raise swift.SwiftDownloadIntegrityError(msg)
+        return data
+
+    def _store_chunk(self, connections, name, chunk, manifest, stats,
+                     stream=None):
+        """Upload a chunk unless Swift already has it.
+
+        Return True if the chunk was already stored.
+        """
+        container = self.get_container_name()
+        with connections.item() as connection:
+            if self._chunk_exists(connection, container, name):
+                stats['reused'] += 1
+                return True
+
+            data = tpool.execute(self._encode_chunk, name, chunk, manifest)
+            checksum = hashlib.md5(data).hexdigest()
+            started = time.time()
+            etag = connection.put_object(container, CHUNK_PREFIX + name,
+                                         data, etag=checksum)
+            self._segment_uploaded(stream, len(data), started)
+        if etag != checksum:
+            LOG.error(_("Error saving chunk %(name)s to swift. "
+                        "ETAG: %(tag)s Chunk MD5: %(checksum)s."),
+                      {'name': name, 'tag': etag, 'checksum': checksum})
+            stats['failed'] += 1
+            return False
+        stats['uploaded'] += 1
+        stats['uploaded_bytes'] += len(data)
+        return False
+
+    def _chunk_exists(self, connection, container, name):
+        try:
+            connection.head_object(container, CHUNK_PREFIX + name)
+        except ClientException as e:
+            if e.http_status == 404:
+                return False
+            raise
+        return True
+
+    def _record_pending(self, filename, names, pending):
+        """Save the names of a batch of chunks before checking them.
+
+        Deletes keep the chunks listed by the backups being saved, so a
+        chunk found in Swift stays there until the manifest refers to it.
+        """
+        name = '%s%s/%08d' % (PENDING_PREFIX, filename, len(pending))
+        self.connection.put_object(self.get_container_name(), name,
+                                   json.dumps(names))
+        pending.append(name)
+
+    def _discard_pending(self, pending):
+        for name in pending:
+            try:
+                self.connection.delete_object(self.get_container_name(),
+                                              name)
+            except ClientException:
+                # Deletes discard the lists of backups that ran longer
+                # than the grace period.
+                LOG.exception(_("Error deleting %s from swift."), name)
+
+    def save(self, filename, stream, metadata=None):
+        """Persist the stream to swift as deduplicated chunks.
+
+        The chunk manifest is saved to <BACKUP_CONTAINER>/dedup_<filename>
+        once every chunk is safely stored.
+        """
+        container = self.get_container_name()
+        manifest_name = MANIFEST_PREFIX + filename
+        location = "%s/%s/%s" % (self.connection.url, container,
+                                 manifest_name)
+
+        LOG.info(_('Saving %(filename)s to %(container)s in swift as '
+                   'deduplicated chunks.')
+                 % {'filename': filename, 'container': container})
+        if (getattr(stream, 'is_zipped', False) or
+                getattr(stream, 'is_encrypted', False)):
+            LOG.warning(_("The backup stream is compressed or encrypted by "
+                          "the backup runner; very little of it will be "
+                          "deduplicated."))
+        self.connection.put_container(container)
+
+        manifest = {
+            'version': MANIFEST_VERSION,
+            'compression': (self._compressor.name
+                            if CONF.backup_dedup_compress_chunks
+                            else backup_codec.NONE),
+            'encryption': (backup_codec.AesCtrCipher.name
+                           if CONF.backup_dedup_encrypt_chunks
+                           else backup_codec.NONE),
+            'chunks': [],
+        }
+        stats = {'reused': 0, 'uploaded': 0, 'uploaded_bytes': 0,
+                 'failed': 0, 'bytes': 0}
+        pending = []
+        try:
+            saved = self._save_chunks(filename, stream, manifest, stats,
+                                      pending)
+            if saved:
+                saved = self._save_manifest(filename, stream, manifest,
+                                            metadata)
+        finally:
+            self._discard_pending(pending)
+        if not saved:
+            return False, "Error saving data to Swift!", None, location
+
+        return (True, "Successfully saved data to Swift! Stored %(uploaded)s "
+                "of %(count)s chunks." % dict(stats,
+                                              count=len(manifest['chunks'])),
+                saved, location)
+
+    def _save_chunks(self, filename, stream, manifest, stats, pending):
+        """Store the chunks of the stream Swift does not have yet.
+
+        The chunks are listed in a pending object a batch at a time, before
+        being looked up with concurrent HEAD requests. A delete may have
+        read the pending lists just before a batch was listed, so once
+        REFERENCE_LIFETIME seconds have passed since the last batch, the
+        chunks that were already stored are looked up again.
+        """
+        concurrency = CONF.backup_segment_upload_concurrency
+        connections = self._connection_pool(concurrency)
+        pool = eventlet.GreenPool(concurrency)
+        uploads = []
+        seen = set()
+        batch = []
+        listed_at = time.time()
+
+        def _store_batch():
+            self._record_pending(filename, [name for name, chunk in batch],
+                                 pending)
+            for name, chunk in batch:
+                # Blocks while all upload slots are busy.
+                uploads.append((name, pool.spawn(
+                    self._store_chunk, connections, name, chunk, manifest,
+                    stats, stream)))
+            del batch[:]
+            return time.time()
+
+        chunker = ContentDefinedChunker(stream, CONF.backup_dedup_chunk_size)
+        for chunk in chunker:
+            name = self._chunk_name(chunk)
+            manifest['chunks'].append([name, len(chunk)])
+            stats['bytes'] += len(chunk)
+            if name in seen:
+                continue
+            seen.add(name)
+            if stats['failed']:
+                break
+            batch.append((name, chunk))
+            if len(batch) >= concurrency:
+                listed_at = _store_batch()
+        if batch and not stats['failed']:
+            listed_at = _store_batch()
+        pool.waitall()
+        # Raise any upload error.
+        reused = [chunk_name for chunk_name, upload in uploads
+                  if upload.wait()]
+        if stats['failed']:
+            return False
+
+        if reused:
+            eventlet.sleep(max(listed_at + REFERENCE_LIFETIME - time.time(),
+                               0))
+        container = self.get_container_name()
+
+        def _exists(name):
+            with connections.item() as connection:
+                return self._chunk_exists(connection, container, name)
+
+        missing = [chunk_name for chunk_name, exists
+                   in zip(reused, pool.imap(_exists, reused)) if not exists]
+        if missing:
+            LOG.error(_("%(count)s chunks of backup %(filename)s were "
+                        "deleted while it was being saved."),
+                      {'count': len(missing), 'filename': filename})
+            return False
+
+        LOG.info(_("Backup %(filename)s has %(count)s chunks: %(uploaded)s "
+                   "uploaded (%(uploaded_bytes)s bytes), %(reused)s already "
+                   "stored.")
+                 % dict(stats, filename=filename,
+                        count=len(manifest['chunks'])))
+        return True
+
+    def _save_manifest(self, filename, stream, manifest, metadata):
+        """Save the manifest and return its checksum, or None on error."""
+        if metadata is None:
+            metadata = {}
+        metadata.update(stream.metadata())
+        headers = {self._set_attr('dedup_manifest'): 'true'}
+        for key, value in metadata.items():
+            headers[self._set_attr(key)] = value
+
+        manifest_data = json.dumps(manifest)
+        checksum = hashlib.md5(manifest_data.encode('utf-8')).hexdigest()
+        etag = self.connection.put_object(self.get_container_name(),
+                                          MANIFEST_PREFIX + filename,
+                                          manifest_data, headers=headers)
+        if etag != checksum:
+            LOG.error(_("Error saving backup manifest to swift. "
+                        "ETAG: %(tag)s Manifest MD5: %(checksum)s"),
+                      {'tag': etag, 'checksum': checksum})
+            return None
+        return checksum
+
+    def _load_manifest(self, container, filename, backup_checksum=None):
+        headers, body = self.connection.get_object(container, filename)
+        if backup_checksum and CONF.verify_swift_checksum_on_restore:
+            self._verify_checksum(headers.get('etag', ''), backup_checksum)
+        manifest = json.loads(body)
+        if manifest.get('version') != MANIFEST_VERSION:
+            raise swift.DownloadError(
+                _("Unsupported backup manifest version: %s.")
+                % manifest.get('version'))
+        return manifest
+
+    def load(self, location, backup_checksum):
+        """Return an iterator over the chunks of a backup, in order."""
+        storage_url, container, filename = self._explodeLocation(location)
+        manifest = self._load_manifest(container, filename, backup_checksum)
+
+        concurrency = CONF.backup_segment_download_concurrency
+        connections = self._connection_pool(concurrency)
+
+        def _fetch(name):
+            with connections.item() as connection:
+                headers, data = connection.get_object(container,
+                                                      CHUNK_PREFIX + name)
+            return tpool.execute(self._decode_chunk, name, data, manifest)
+
+        # imap keeps the chunks in order while fetching ahead.
+        pool = eventlet.GreenPool(concurrency)
+        return pool.imap(_fetch, [name for name, size in manifest['chunks']])
+
+    def _load_index(self, container):
+        try:
+            headers, body = self.connection.get_object(container, INDEX_NAME)
+            index = json.loads(body)
+            if index.get('version') == INDEX_VERSION:
+                return index
+        except ClientException as e:
+            if e.http_status != 404:
+                raise
+        return {'version': INDEX_VERSION, 'manifests': {}, 'references': {}}
+
+    def _update_index(self, container, deleted, chunks):
+        """Return the number of remaining backups referring to each chunk.
+
+        The counts are kept in an index object along with the etags of the
+        manifests they were counted from, so that only the manifests saved
+        since the last delete are read. The index is rebuilt from every
+        manifest if one of them was deleted or replaced without updating
+        it, such as by a concurrent delete.
+        """
+        index = self._load_index(container)
+        counted = index['manifests']
+        references = index['references']
+        if counted.pop(deleted, None) is not None:
+            for name in chunks:
+                references[name] = references.get(name, 0) - 1
+
+        headers, listing = self.connection.get_container(
+            container, prefix=MANIFEST_PREFIX, full_listing=True)
+        listed = dict((obj['name'], obj['hash']) for obj in listing
+                      if obj['name'] != deleted)
+        if any(listed.get(name) != etag for name, etag in counted.items()):
+            LOG.debug("Rebuilding the chunk reference index of %s."
+                      % container)
+            counted = {}
+            references = {}
+        for filename, etag in listed.items():
+            if filename in counted:
+                continue
+            try:
+                manifest = self._load_manifest(container, filename)
+            except ClientException as e:
+                if e.http_status == 404:
+                    # Deleted since the listing was taken.
+                    continue
+                raise
+            counted[filename] = etag
+            for name in set(name for name, size in manifest['chunks']):
+                references[name] = references.get(name, 0) + 1
+        references = dict((name, count) for name, count in references.items()
+                          if count > 0)
+
+        try:
+            self.connection.put_object(container, INDEX_NAME, json.dumps(
+                {'version': INDEX_VERSION, 'manifests': counted,
+                 'references': references}))
+        except ClientException:
+            # The next delete reads the manifests the index is missing.
+            LOG.exception(_("Error saving the chunk reference index of "
+                            "%s."), container)
+        return references
+
+    def _pending_references(self, container):
+        """Return the chunks listed by the backups being saved.
+
+        The lists left by backups that have been running for longer than
+        the grace period are deleted, since those backups have failed.
+        """
+        headers, listing = self.connection.get_container(
+            container, prefix=PENDING_PREFIX, full_listing=True)
+        cutoff = timeutils.utcnow() - datetime.timedelta(
+            seconds=CONF.backup_dedup_gc_grace_period)
+        references = set()
+        for obj in listing:
+            try:
+                if timeutils.normalize_time(timeutils.parse_isotime(
+                        obj['last_modified'])) < cutoff:
+                    self.connection.delete_object(container, obj['name'])
+                    continue
+                headers, body = self.connection.get_object(container,
+                                                           obj['name'])
+            except ClientException as e:
+                if e.http_status == 404:
+                    # The backup has finished since the listing was taken.
+                    continue
+                raise
+            references.update(json.loads(body))
+        return references
+
+    def delete(self, filename):
+        """Delete a backup and the chunks no other backup refers to.
+
+        The chunk reference counts are kept up to date with the manifests
+        of the remaining backups in the container. Chunks listed by a
+        backup that is still being saved are kept as well. These lists are
+        read before the manifests, so a backup finishing in between is seen
+        through one or the other, and read again whenever they are older
+        than half of REFERENCE_LIFETIME, after which the backup checks the
+        chunks it reused once more. The chunks are deleted with a cutoff of
+        backup_dedup_gc_grace_period seconds ago as their X-Timestamp, so
+        Swift itself refuses to delete a chunk a backup has uploaded since
+        then.
+        """
+        container = self.get_container_name()
+        chunks = set(name for name, size in
+                     self._load_manifest(container, filename)['chunks'])
+        LOG.debug("Deleting deduplicated backup %(cont)s/%(filename)s."
+                  % {'cont': container, 'filename': filename})
+        self.connection.delete_object(container, filename)
+
+        read_at = time.time()
+        pending = self._pending_references(container)
+        references = self._update_index(container, filename, chunks)
+        candidates = [name for name in chunks if name not in references]
+        headers = {'X-Timestamp': '%.5f' % (
+            time.time() - CONF.backup_dedup_gc_grace_period)}
+        connections = self._connection_pool(
+            CONF.backup_segment_upload_concurrency)
+
+        def _unreferenced(read_at, pending):
+            for name in candidates:
+                if time.time() - read_at > REFERENCE_LIFETIME / 2.0:
+                    read_at = time.time()
+                    pending = self._pending_references(container)
+                if name not in pending:
+                    yield name
+
+        def _collect(name):
+            with connections.item() as connection:
+                try:
+                    connection.delete_object(container, CHUNK_PREFIX + name,
+                                             headers=headers)
+                except ClientException as e:
+                    # 409 Conflict: uploaded within the grace period.
+                    if e.http_status in (404, 409):
+                        return False
+                    raise
+            return True
+
+        pool = eventlet.GreenPool(CONF.backup_segment_upload_concurrency)
+        deleted = sum(pool.imap(_collect, _unreferenced(read_at, pending)))
+        LOG.debug("Deleted %(deleted)s of %(count)s unreferenced chunks."
+                  % {'deleted': deleted, 'count': len(candidates)})
@@ -14,11 +14,19 @@
 #    under the License.
 #
 
+import collections
 import hashlib
 import json
+import os
+import sys
+import tempfile
+import time
 
+import eventlet
+from eventlet import pools
 from oslo_log import log as logging
 import six
+from swiftclient.client import ClientException
 
 from trove.common import cfg
 from trove.common.i18n import _
@@ -41,6 +49,60 @@ class SwiftDownloadIntegrityError(Exception):
     """Integrity error while running the Swift Download Command."""
 
 
+class SegmentJournal(object):
+    """Local record of the segments of a backup committed to swift.
+
+    A line is appended to the journal for every segment, so it stays
+    readable if the guest agent dies while the backup is running.
+    """
+
+    suffix = '.journal'
+
+    def __init__(self, directory, filename):
+        self.path = os.path.join(directory, filename + self.suffix)
+        self.segments = {}
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        if os.path.exists(self.path):
+            with open(self.path) as journal:
+                for line in journal:
+                    try:
+                        segment = json.loads(line)
+                    except ValueError:
+                        # The last line was not completely written.
+                        break
+                    self.segments[segment['name']] = segment
+
+    def committed(self, segment):
+        """Whether the same segment was committed by an earlier attempt."""
+        recorded = self.segments.get(segment['name'])
+        return bool(recorded and
+                    recorded['checksum'] == segment['checksum'] and
+                    recorded['size_bytes'] == segment['size_bytes'])
+
+    def commit(self, segment):
+        record = {'name': segment['name'],
+                  'checksum': segment['checksum'],
+                  'size_bytes': segment['size_bytes']}
+        with open(self.path, 'a') as journal:
+            journal.write(json.dumps(record) + '\n')
+            journal.flush()
+            os.fsync(journal.fileno())
+        self.segments[segment['name']] = record
+
+    def remove(self):
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+    @classmethod
+    def filenames(cls, directory):
+        """The filenames of the backups with a journal in directory."""
+        if not os.path.isdir(directory):
+            return []
+        return sorted(name[:-len(cls.suffix)] for name in os.listdir(directory)
+                      if name.endswith(cls.suffix))
+
+
 class StreamReader(object):
     """Wrap the stream from the backup process and chunk it into segements."""
 
@@ -121,9 +183,6 @@ class SwiftStorage(base.Storage):
         LOG.debug('Creating container %s.' % self.get_container_name())
         self.connection.put_container(self.get_container_name())
 
-        # Swift Checksum is the checksum of the concatenated segment checksums
-        swift_checksum = hashlib.md5()
-
         # Wrap the output of the backup process to segment it for swift
         stream_reader = StreamReader(stream, filename,
                                      self.get_container_name(),
@@ -134,37 +193,36 @@ class SwiftStorage(base.Storage):
         # Full location where the backup manifest is stored
         location = "%s/%s/%s" % (url, self.get_container_name(), filename)
 
-        # Information about each segment upload job
-        segment_results = []
-
-        # Read from the stream and write to the container in swift
-        while not stream_reader.end_of_file:
-            LOG.debug('Saving segment %s.' % stream_reader.segment)
-            path = stream_reader.segment_path
-            etag = self.connection.put_object(self.get_container_name(),
-                                              stream_reader.segment,
-                                              stream_reader)
+        journal = None
+        if CONF.backup_journal_dir:
+            journal = SegmentJournal(CONF.backup_journal_dir, filename)
+            if journal.segments:
+                LOG.info(_('Found %(count)s segments of %(filename)s saved '
+                           'by an earlier attempt; unchanged segments will '
+                           'not be uploaded again.')
+                         % {'count': len(journal.segments),
+                            'filename': filename})
 
-            segment_checksum = stream_reader.segment_checksum.hexdigest()
-
-            # Check each segment MD5 hash against swift etag
-            # Raise an error and mark backup as failed
-            if etag != segment_checksum:
-                LOG.error(_("Error saving data segment to swift. "
-                          "ETAG: %(tag)s Segment MD5: %(checksum)s."),
-                          {'tag': etag, 'checksum': segment_checksum})
-                return False, "Error saving data to Swift!", None, location
+        # Information about each segment upload job
+        if CONF.backup_segment_upload_concurrency > 1 or journal:
+            # Journaled segments are buffered so they can be compared with
+            # the earlier attempt before being uploaded.
+            segment_results, swift_checksum = self._save_segments_parallel(
+                stream_reader, CONF.backup_segment_upload_concurrency,
+                journal)
+        else:
+            segment_results, swift_checksum = self._save_segments(
+                stream_reader)
 
-            segment_results.append({
-                'path': path,
-                'etag': etag,
-                'size_bytes': stream_reader.segment_length
-            })
+        if segment_results is None:
+            return False, "Error saving data to Swift!", None, location
 
-            if six.PY3:
-                swift_checksum.update(segment_checksum.encode())
-            else:
-                swift_checksum.update(segment_checksum)
+        if journal:
+            # An earlier attempt may have produced more segments.
+            saved = set(segment['path'] for segment in segment_results)
+            self._delete_segments(
+                name for name in journal.segments
+                if '%s/%s' % (self.get_container_name(), name) not in saved)
 
         # All segments uploaded.
         num_segments = len(segment_results)
@@ -193,6 +251,7 @@ class SwiftStorage(base.Storage):
             self.connection.put_object(self.get_container_name(),
                                        filename,
                                        manifest_data,
+                                       headers=headers,
                                        query_string='multipart-manifest=put')
 
             # Validation checksum is the Swift Checksum
@@ -230,9 +289,274 @@ class SwiftStorage(base.Storage):
                 {'tag': etag, 'checksum': final_swift_checksum})
             return False, "Error saving data to Swift!", None, location
 
+        if journal:
+            journal.remove()
+
         return (True, "Successfully saved data to Swift!",
                 final_swift_checksum, location)
 
+    def discard(self, filename):
+        """Remove the segments and the journal kept for a retry of a backup
+        that failed for good.
+        """
+        if CONF.backup_journal_dir:
+            journal = SegmentJournal(CONF.backup_journal_dir, filename)
+            self._delete_segments(journal.segments)
+            journal.remove()
+
+    def leftovers(self):
+        """The backups with a segment journal, which is removed once they
+        are saved or discarded.
+        """
+        if CONF.backup_journal_dir:
+            return SegmentJournal.filenames(CONF.backup_journal_dir)
+        return []
+
+    def _check_segment_etag(self, etag, segment_checksum):
+        # Check each segment MD5 hash against swift etag
+        if etag != segment_checksum:
+            LOG.error(_("Error saving data segment to swift. "
+                      "ETAG: %(tag)s Segment MD5: %(checksum)s."),
+                      {'tag': etag, 'checksum': segment_checksum})
+            return False
+        return True
+
+    def _delete_segments(self, names):
+        """Remove the segments of a backup that could not be completed."""
+        for name in names:
+            LOG.debug('Deleting orphaned segment %s.' % name)
+            try:
+                self.connection.delete_object(self.get_container_name(),
+                                              name)
+            except ClientException as e:
+                if e.http_status != 404:
+                    LOG.warning(_("Could not delete orphaned segment "
+                                  "%(name)s: %(error)s")
+                                % {'name': name, 'error': e})
+
+    def _save_segments(self, stream_reader):
+        """Stream each segment directly from the backup process to swift.
+
+        Returns the list of uploaded segments and the Swift checksum (the
+        checksum of the concatenated segment checksums), or (None, None) if
+        a segment failed its checksum validation. The segments already
+        uploaded are deleted if the backup fails.
+        """
+        segment_results = []
+        swift_checksum = hashlib.md5()
+        segment_names = []
+
+        # Read from the stream and write to the container in swift
+        while not stream_reader.end_of_file:
+            LOG.debug('Saving segment %s.' % stream_reader.segment)
+            path = stream_reader.segment_path
+            segment_names.append(stream_reader.segment)
+            started = time.time()
+            try:
+                etag = self.connection.put_object(self.get_container_name(),
+                                                  stream_reader.segment,
+                                                  stream_reader)
+            except Exception:
+                exc_info = sys.exc_info()
+                self._delete_segments(segment_names)
+                six.reraise(*exc_info)
+            self._segment_uploaded(stream_reader.stream,
+                                   stream_reader.segment_length, started)
+
+            segment_checksum = stream_reader.segment_checksum.hexdigest()
+
+            # Raise an error and mark backup as failed
+            if not self._check_segment_etag(etag, segment_checksum):
+                self._delete_segments(segment_names)
+                return None, None
+
+            segment_results.append({
+                'path': path,
+                'etag': etag,
+                'size_bytes': stream_reader.segment_length
+            })
+
+            if six.PY3:
+                swift_checksum.update(segment_checksum.encode())
+            else:
+                swift_checksum.update(segment_checksum)
+
+        return segment_results, swift_checksum
+
+    def _read_segment(self, stream_reader, spool_size):
+        """Read the current segment of the stream into a spool file.
+
+        The segment is kept in memory up to spool_size bytes and is
+        spooled to a temporary file beyond that.
+        """
+        segment = {'name': stream_reader.segment,
+                   'path': stream_reader.segment_path}
+        spool = tempfile.SpooledTemporaryFile(
+            max_size=spool_size, dir=CONF.backup_segment_spool_dir)
+        chunk_size = min(CHUNK_SIZE, stream_reader.max_file_size)
+        chunk = stream_reader.read(chunk_size)
+        while chunk:
+            spool.write(chunk)
+            chunk = stream_reader.read(chunk_size)
+        spool.seek(0)
+        segment['spool'] = spool
+        segment['checksum'] = stream_reader.segment_checksum.hexdigest()
+        segment['size_bytes'] = stream_reader.segment_length
+        return segment
+
+    def _segment_uploaded(self, stream, size, started):
+        """Report a segment upload to the backup stream if it is metered."""
+        segment_uploaded = getattr(stream, 'segment_uploaded', None)
+        if segment_uploaded:
+            segment_uploaded(size, time.time() - started)
+
+    def _segment_committed(self, connections, segment, journal):
+        """Whether an earlier attempt already stored this segment."""
+        if not journal.committed(segment):
+            return False
+        with connections.item() as connection:
+            try:
+                headers = connection.head_object(self.get_container_name(),
+                                                 segment['name'])
+            except ClientException as e:
+                if e.http_status == 404:
+                    return False
+                raise
+        return headers.get('etag', '').strip('"') == segment['checksum']
+
+    def _upload_segment(self, connections, segment, failed, stream=None,
+                        journal=None):
+        """Upload a buffered segment using a pooled swift connection.
+
+        A failed upload is retried from the buffer up to
+        backup_segment_upload_retries times.
+        """
+        try:
+            if failed:
+                # Another segment already failed, don't bother uploading.
+                return None
+            if journal and self._segment_committed(connections, segment,
+                                                   journal):
+                LOG.debug('Segment %s is unchanged since the earlier '
+                          'attempt.' % segment['name'])
+                return segment['checksum']
+
+            retries = CONF.backup_segment_upload_retries
+            attempt = 0
+            while True:
+                LOG.debug('Saving segment %s.' % segment['name'])
+                started = time.time()
+                try:
+                    with connections.item() as connection:
+                        etag = connection.put_object(
+                            self.get_container_name(), segment['name'],
+                            segment['spool'],
+                            content_length=segment['size_bytes'],
+                            etag=segment['checksum'])
+                    if etag == segment['checksum']:
+                        break
+                    error = _("ETAG %s does not match") % etag
+                except Exception as e:
+                    if attempt >= retries:
+                        raise
+                    error = e
+                if attempt >= retries:
+                    self._check_segment_etag(etag, segment['checksum'])
+                    failed.append(segment['name'])
+                    return etag
+                attempt += 1
+                LOG.warning(_("Error saving segment %(name)s to swift "
+                              "(%(error)s), retrying %(attempt)s of "
+                              "%(retries)s.")
+                            % {'name': segment['name'], 'error': error,
+                               'attempt': attempt, 'retries': retries})
+                segment['spool'].seek(0)
+                eventlet.sleep(min(2 ** attempt, 30))
+
+            self._segment_uploaded(stream, segment['size_bytes'], started)
+            if journal:
+                journal.commit(segment)
+            return etag
+        except Exception:
+            failed.append(segment['name'])
+            raise
+        finally:
+            segment['spool'].close()
+
+    def _save_segments_parallel(self, stream_reader, concurrency,
+                                journal=None):
+        """Upload segments to swift using a bounded pool of greenthreads.
+
+        Segments are read ahead from the backup process while earlier
+        segments are still being uploaded. At most 'concurrency' segments
+        are uploading at any time, plus the one currently being read, so the
+        read-ahead buffer is bounded by backup_segment_buffer_size (beyond
+        which segments are spooled to disk).
+
+        With a journal, segments identical to those saved by an earlier
+        attempt are not uploaded again and the segments are kept if the
+        backup fails, so that a retry can resume. Otherwise the segments
+        already uploaded are deleted if the backup fails.
+
+        Returns the same values as _save_segments.
+        """
+        spool_size = CONF.backup_segment_buffer_size // (concurrency + 1)
+        LOG.debug('Uploading up to %(concurrency)s segments concurrently '
+                  'using an in-memory buffer of %(spool)s bytes per segment.'
+                  % {'concurrency': concurrency, 'spool': spool_size})
+
+        # Swift connections are not safe to share between greenthreads.
+        connections = pools.Pool(
+            max_size=concurrency,
+            create=lambda: remote.create_swift_client(self.context))
+        pool = eventlet.GreenPool(concurrency)
+        failed = []
+        uploads = []
+
+        while not stream_reader.end_of_file and not failed:
+            segment = self._read_segment(stream_reader, spool_size)
+            # Blocks while all upload slots are busy, which keeps the
+            # number of buffered segments bounded.
+            uploads.append(
+                (segment,
+                 pool.spawn(self._upload_segment, connections, segment,
+                            failed, stream_reader.stream, journal)))
+
+        # Wait for every upload before looking at the results so that no
+        # segment is still being written when the manifest is created or the
+        # backup is marked as failed. Any upload exception is raised once
+        # the orphaned segments are cleaned up.
+        pool.waitall()
+        segment_results = []
+        swift_checksum = hashlib.md5()
+        exc_info = None
+        for segment, upload in uploads:
+            try:
+                etag = upload.wait()
+            except Exception:
+                exc_info = exc_info or sys.exc_info()
+                continue
+            if failed:
+                continue
+            segment_results.append({
+                'path': segment['path'],
+                'etag': etag,
+                'size_bytes': segment['size_bytes']
+            })
+            if six.PY3:
+                swift_checksum.update(segment['checksum'].encode())
+            else:
+                swift_checksum.update(segment['checksum'])
+
+        if failed:
+            if not journal:
+                self._delete_segments(
+                    segment['name'] for segment, upload in uploads)
+            if exc_info:
+                six.reraise(*exc_info)
+            return None, None
+        return segment_results, swift_checksum
+
     def _explodeLocation(self, location):
         storage_url = "/".join(location.split('/')[:-2])
         container = location.split('/')[-2]
@@ -253,6 +577,11 @@ class SwiftStorage(base.Storage):
         """Restore a backup from the input stream to the restore_location."""
         storage_url, container, filename = self._explodeLocation(location)
 
+        concurrency = CONF.backup_segment_download_concurrency
+        if concurrency > 1:
+            return self._load_parallel(container, filename, backup_checksum,
+                                       concurrency)
+
         headers, info = self.connection.get_object(container, filename,
                                                    resp_chunk_size=CHUNK_SIZE)
 
@@ -261,6 +590,122 @@ class SwiftStorage(base.Storage):
 
         return info
 
+    def _load_parallel(self, container, filename, backup_checksum,
+                       concurrency):
+        """Download a backup using concurrent requests.
+
+        For a Static Large Object the manifest is read and every segment is
+        fetched separately and validated against its etag. A single object
+        is fetched in byte ranges and validated as a whole once all ranges
+        have been read.
+        """
+        headers = self.connection.head_object(container, filename)
+        etag = headers.get('etag', '')
+        if CONF.verify_swift_checksum_on_restore:
+            self._verify_checksum(etag, backup_checksum)
+
+        if headers.get('x-static-large-object', '').lower() == 'true':
+            manifest_headers, manifest = self.connection.get_object(
+                container, filename, query_string='multipart-manifest=get')
+            parts = []
+            for segment in json.loads(manifest):
+                segment_container, segment_name = (
+                    segment['name'].lstrip('/').split('/', 1))
+                parts.append({'container': segment_container,
+                              'name': segment_name,
+                              'etag': segment['hash'],
+                              'headers': {}})
+            LOG.debug('Downloading %(count)s segments of %(filename)s.'
+                      % {'count': len(parts), 'filename': filename})
+            return self._download_parts(parts, concurrency)
+
+        length = int(headers.get('content-length', 0))
+        range_size = max(CHUNK_SIZE, -(-length // concurrency))
+        parts = []
+        for start in range(0, length, range_size):
+            end = min(start + range_size, length) - 1
+            parts.append({'container': container,
+                          'name': filename,
+                          'etag': None,
+                          'headers': {'Range': 'bytes=%d-%d' % (start, end)}})
+        LOG.debug('Downloading %(filename)s in %(count)s ranges.'
+                  % {'count': len(parts), 'filename': filename})
+        return self._download_parts(parts, concurrency, etag.strip('"'))
+
+    def _download_part(self, connections, part, spool_size):
+        """Download a segment or byte range into a spool file."""
+        spool = tempfile.SpooledTemporaryFile(
+            max_size=spool_size, dir=CONF.backup_segment_spool_dir)
+        checksum = hashlib.md5()
+        with connections.item() as connection:
+            headers, body = connection.get_object(
+                part['container'], part['name'], resp_chunk_size=CHUNK_SIZE,
+                headers=part['headers'])
+            for chunk in body:
+                checksum.update(chunk)
+                spool.write(chunk)
+
+        if part['etag'] and checksum.hexdigest() != part['etag']:
+            spool.close()
+            msg = (_("Segment %(name)s checksum %(current)s does not match "
+                     "the manifest checksum %(original)s.") %
+                   {'name': part['name'], 'current': checksum.hexdigest(),
+                    'original': part['etag']})
+            LOG.error(msg)
+            raise SwiftDownloadIntegrityError(msg)
+
+        spool.seek(0)
+        return spool
+
+    def _download_parts(self, parts, concurrency, object_etag=None):
+        """Yield the contents of the parts in order.
+
+        Up to 'concurrency' parts are downloaded at the same time. Parts
+        that complete out of order wait in their spool files, so the reorder
+        buffer is bounded by backup_segment_buffer_size in memory (beyond
+        which parts are spooled to disk) and by 'concurrency' parts overall.
+        If object_etag is given, the reassembled stream is checked against
+        it once everything has been read.
+        """
+        spool_size = CONF.backup_segment_buffer_size // (concurrency + 1)
+        # Swift connections are not safe to share between greenthreads.
+        connections = pools.Pool(
+            max_size=concurrency,
+            create=lambda: remote.create_swift_client(self.context))
+        pool = eventlet.GreenPool(concurrency)
+        pending = collections.deque()
+        parts = iter(parts)
+        checksum = hashlib.md5()
+
+        def _download_next():
+            part = next(parts, None)
+            if part is not None:
+                pending.append(pool.spawn(self._download_part, connections,
+                                          part, spool_size))
+
+        try:
+            for _i in range(concurrency):
+                _download_next()
+            while pending:
+                spool = pending.popleft().wait()
+                _download_next()
+                try:
+                    chunk = spool.read(CHUNK_SIZE)
+                    while chunk:
+                        if object_etag:
+                            checksum.update(chunk)
+                        yield chunk
+                        chunk = spool.read(CHUNK_SIZE)
+                finally:
+                    spool.close()
+        finally:
+            # Stop any downloads still running if the consumer gave up.
+            for download in pending:
+                download.kill()
+
+        if object_etag:
+            self._verify_checksum(object_etag, checksum.hexdigest())
+
     def _get_attr(self, original):
         """Get a friendly name from an object header key."""
         key = original.replace('-', '_')
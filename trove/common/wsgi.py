@@ -14,6 +14,7 @@
 #    under the License.
 """Wsgi helper utilities for trove"""
 
+import hashlib
 import math
 import re
 import time
@@ -38,6 +39,7 @@ from trove.common import exception
 from trove.common.i18n import _
 from trove.common import pastedeploy
 from trove.common import utils
+from trove.db import get_db_api
 
 CONTEXT_KEY = 'trove.context'
 Router = base_wsgi.Router
@@ -211,12 +213,36 @@ class Request(base_wsgi.Request):
         return match.group("version_no") if match else None
 
 
+def etag(request, parts, max_age=None):
+    """Return a strong ETag for the response to request.
+
+    :param parts: everything the response is built from, as a structure
+                  that can be serialized to JSON.
+    :param max_age: if set, the ETag also changes every max_age seconds,
+                    for responses that show data not covered by parts.
+    """
+    key = [request.url, request.best_match_content_type(), parts]
+    if max_age:
+        key.append(int(time.time()) // max_age)
+    return hashlib.md5(encodeutils.to_utf8(
+        jsonutils.dumps(key, sort_keys=True))).hexdigest()
+
+
+def check_etag(request, etag):
+    """Raise HTTPNotModified if the client already has the response whose
+    ETag is etag, as given in its If-None-Match header.
+    """
+    if etag in request.if_none_match:
+        raise webob.exc.HTTPNotModified(headers={'ETag': '"%s"' % etag})
+
+
 class Result(object):
     """A result whose serialization is compatible with JSON."""
 
-    def __init__(self, data, status=200):
+    def __init__(self, data, status=200, etag=None):
         self._data = data
         self.status = status
+        self.etag = etag
 
     def data(self, serialization_type):
         """Return an appropriate serialized type for the body.
@@ -262,6 +288,8 @@ class Resource(base_wsgi.Resource):
         except webob.exc.HTTPError as http_error:
             LOG.debug(traceback.format_exc())
             return Fault(http_error)
+        except webob.exc.HTTPNotModified as not_modified:
+            return not_modified
         except Exception as error:
             exception_uuid = str(uuid.uuid4())
             LOG.exception(exception_uuid + ": " + str(error))
@@ -293,6 +321,8 @@ class Resource(base_wsgi.Resource):
         # and the action_result is returned as-is. For us, that's bad news -
         # we never want that to happen except in the case of webob types.
         # So we override the behavior here so we can at least log it.
+        if isinstance(action_result, webob.exc.HTTPNotModified):
+            return action_result
         try:
             return super(Resource, self).serialize_response(
                 action, action_result, accept)
@@ -306,6 +336,20 @@ class Resource(base_wsgi.Resource):
             return action_result
 
 
+# Validators of the API schemas, which are static, keyed by schema id.
+# The schema is kept along with its validator so that its id is not reused.
+_validators = {}
+
+
+def get_validator(schema):
+    """Return a validator of schema, built on first use."""
+    entry = _validators.get(id(schema))
+    if entry is None:
+        entry = (schema, jsonschema.Draft4Validator(schema))
+        _validators[id(schema)] = entry
+    return entry[1]
+
+
 class Controller(object):
     """Base controller that creates a Resource with default serializers."""
 
@@ -400,15 +444,31 @@ class Controller(object):
         body = action_args.get('body', {})
         schema = self.get_schema(action, body)
         if schema:
-            validator = jsonschema.Draft4Validator(schema)
-            if not validator.is_valid(body):
-                errors = sorted(validator.iter_errors(body),
-                                key=lambda e: e.path)
+            errors = sorted(get_validator(schema).iter_errors(body),
+                            key=lambda e: e.path)
+            if errors:
                 error_msg = self.format_validation_msg(errors)
                 LOG.info(error_msg)
                 raise exception.BadRequest(message=error_msg)
 
+    @classmethod
+    def load_validators(cls, schemas=None):
+        """Build the validators of all the schemas of the controller, so
+        that requests do not wait for them.
+        """
+        if schemas is None:
+            schemas = cls.schemas
+        for schema in schemas.values():
+            if not isinstance(schema, dict):
+                continue
+            if 'type' in schema:
+                get_validator(schema)
+            else:
+                # Schemas chosen by get_schema from the request body.
+                cls.load_validators(schema)
+
     def create_resource(self):
+        self.load_validators()
         return Resource(
             self,
             RequestDeserializer(),
@@ -444,6 +504,8 @@ class TroveResponseSerializer(base_wsgi.ResponseSerializer):
             action)
         if isinstance(data, Result):
             response.status = data.status
+            if data.etag:
+                response.etag = data.etag
 
 
 class Fault(webob.exc.HTTPException):
@@ -542,6 +604,7 @@ class ContextMiddleware(base_wsgi.Middleware):
                 is_admin = True
                 break
         limits = self._extract_limits(request.params)
+        use_cache = 'no-cache' not in request.headers.get('Cache-Control', '')
         context = rd_context.TroveContext(auth_token=auth_token,
                                           tenant=tenant_id,
                                           user=user_id,
@@ -549,8 +612,14 @@ class ContextMiddleware(base_wsgi.Middleware):
                                           limit=limits.get('limit'),
                                           marker=limits.get('marker'),
                                           service_catalog=service_catalog,
-                                          roles=roles)
+                                          roles=roles,
+                                          use_cache=use_cache)
         request.environ[CONTEXT_KEY] = context
+        # Requests which do not change anything can be served by the slave
+        # database, until they write, unless their tenant wrote recently.
+        get_db_api().route_reads_to_slave(
+            request.environ.get('REQUEST_METHOD') in ('GET', 'HEAD'),
+            tenant=tenant_id)
 
     @classmethod
     def factory(cls, global_config, **local_config):
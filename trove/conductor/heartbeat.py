@@ -0,0 +1,186 @@
+# Copyright 2016 Tesora Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import time
+
+import eventlet
+from oslo_log import log as logging
+
+from trove.common import cfg
+from trove.common.i18n import _
+from trove.common.instance import ServiceStatus
+from trove.common import utils
+from trove.conductor import models
+from trove.conductor.models import LastSeen
+from trove.db import get_db_api
+from trove.instance import models as inst_models
+
+LOG = logging.getLogger(__name__)
+CONF = cfg.CONF
+
+METHOD_NAME = 'heartbeat'
+
+
+class HeartbeatBatcher(object):
+    """Buffer guest heartbeats and apply them in bulk.
+
+    Heartbeats are kept for up to 'interval' seconds, or until 'batch_size'
+    instances have reported, and only the newest message of every instance
+    (by its 'sent' timestamp) is kept. A flush then loads the last seen
+    timestamps of all the instances in one query and applies the remaining
+    messages to service_statuses and conductor_lastseen in one transaction,
+    which only commits if no newer message was seen in the meantime.
+    """
+
+    def __init__(self, apply_one, interval=None, batch_size=None):
+        # Used to apply the messages one at a time if a bulk update fails.
+        self.apply_one = apply_one
+        self.interval = (CONF.conductor_heartbeat_batch_interval
+                         if interval is None else interval)
+        self.batch_size = (CONF.conductor_heartbeat_batch_size
+                           if batch_size is None else batch_size)
+        self._pending = {}
+        self._timer = None
+        self.received = 0
+        self.coalesced = 0
+        self.discarded = 0
+        self.flushes = 0
+        self.flush_errors = 0
+        self.last_flush_latency = 0.0
+        self.max_flush_latency = 0.0
+
+    @property
+    def queue_depth(self):
+        return len(self._pending)
+
+    def add(self, instance_id, payload, sent=None):
+        """Queue a heartbeat, replacing any older one of the instance."""
+        status = payload.get('service_status')
+        if status is not None:
+            # Reject bogus statuses now rather than failing the whole batch.
+            status = ServiceStatus.from_description(status)
+        self.received += 1
+
+        pending = self._pending.get(instance_id)
+        if pending is not None:
+            self.coalesced += 1
+            if sent is None or (pending[1] is not None and
+                                pending[1] > sent):
+                # Keep the newest message, but do not lose the status of
+                # an older one when the newest does not report any.
+                if pending[0] is None:
+                    pending[0] = status
+                return
+            if status is None:
+                status = pending[0]
+        self._pending[instance_id] = [status, sent]
+
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+        elif self._timer is None:
+            self._timer = eventlet.spawn_after(self.interval, self.flush)
+
+    def flush(self):
+        """Apply all the queued heartbeats."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        pending, self._pending = self._pending, {}
+        if not pending:
+            return
+
+        started = time.time()
+        try:
+            self._apply(pending)
+        except Exception:
+            self.flush_errors += 1
+            LOG.exception(_("Error applying %d heartbeats in bulk, applying "
+                            "them one at a time."), len(pending))
+            self._apply_each(pending)
+        latency = time.time() - started
+        self.flushes += 1
+        self.last_flush_latency = latency
+        self.max_flush_latency = max(self.max_flush_latency, latency)
+        LOG.debug("Applied %(count)d heartbeats in %(latency).3fs."
+                  % {'count': len(pending), 'latency': latency})
+
+    def _apply(self, pending):
+        db_api = get_db_api()
+        last_seen = dict(
+            (seen.instance_id, float(seen.sent))
+            for seen in db_api.find_all_in(LastSeen, 'instance_id',
+                                           list(pending),
+                                           method_name=METHOD_NAME))
+
+        statuses = {}
+        seen_updates = {}
+        seen_inserts = []
+        now = utils.utcnow()
+        for instance_id, (status, sent) in pending.items():
+            if sent is None:
+                LOG.error(_("[Instance %s] sent field not present. Cannot "
+                            "compare.") % instance_id)
+            elif instance_id not in last_seen:
+                seen_inserts.append(LastSeen(instance_id, METHOD_NAME, sent))
+            elif last_seen[instance_id] > sent:
+                LOG.info(_("[Instance %s] Rec'd message is older than last "
+                           "seen. Discarding.") % instance_id)
+                self.discarded += 1
+                continue
+            elif last_seen[instance_id] < sent:
+                seen_updates[instance_id] = {'sent': sent}
+            values = {'updated_at': now}
+            if status is not None:
+                values['status_id'] = status.code
+                values['status_description'] = status.description
+            statuses[instance_id] = values
+
+        # The last seen timestamps are only advanced if they are still older
+        # when the transaction runs. Otherwise another worker applied a
+        # newer heartbeat since they were loaded, nothing is written, and
+        # the flush falls back to applying the messages one at a time.
+        db_api.bulk_update(
+            [(LastSeen, {'method_name': METHOD_NAME}, 'instance_id',
+              seen_updates, 'sent'),
+             (inst_models.InstanceServiceStatus, {}, 'instance_id',
+              statuses)],
+            inserts=seen_inserts)
+        for instance_id, values in seen_updates.items():
+            models.cache.set(instance_id, METHOD_NAME, values['sent'])
+        for seen in seen_inserts:
+            models.cache.set(seen.instance_id, METHOD_NAME, seen.sent)
+
+    def _apply_each(self, pending):
+        for instance_id, (status, sent) in pending.items():
+            payload = {}
+            if status is not None:
+                payload['service_status'] = status.description
+            try:
+                self.apply_one(instance_id, payload, sent)
+            except Exception:
+                LOG.exception(_("[Instance %s] Error applying heartbeat.")
+                              % instance_id)
+
+    def stats(self):
+        return {
+            'queue_depth': self.queue_depth,
+            'received': self.received,
+            'coalesced': self.coalesced,
+            'discarded': self.discarded,
+            'flushes': self.flushes,
+            'flush_errors': self.flush_errors,
+            'last_flush_latency': round(self.last_flush_latency, 3),
+            'max_flush_latency': round(self.max_flush_latency, 3),
+        }
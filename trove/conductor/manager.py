@@ -18,11 +18,11 @@ from oslo_service import periodic_task
 
 from trove.backup import models as bkup_models
 from trove.common import cfg
-from trove.common import exception as trove_exception
 from trove.common.i18n import _
 from trove.common.instance import ServiceStatus
 from trove.common.rpc import version as rpc_version
 from trove.common.serializable_notification import SerializableNotification
+from trove.conductor.heartbeat import HeartbeatBatcher
 from trove.conductor.models import LastSeen
 from trove.extensions.mysql import models as mysql_models
 from trove.instance import models as inst_models
@@ -37,6 +37,9 @@ class Manager(periodic_task.PeriodicTasks):
 
     def __init__(self):
         super(Manager, self).__init__(CONF)
+        self.heartbeats = None
+        if CONF.conductor_heartbeat_batch_interval > 0:
+            self.heartbeats = HeartbeatBatcher(self._apply_heartbeat)
 
     def _message_too_old(self, instance_id, method_name, sent):
         fields = {
@@ -53,29 +56,9 @@ class Manager(periodic_task.PeriodicTasks):
         LOG.debug("Instance %(instance)s sent %(method)s at %(sent)s "
                   % fields)
 
-        seen = None
-        try:
-            seen = LastSeen.load(instance_id=instance_id,
-                                 method_name=method_name)
-        except trove_exception.NotFound:
-            # This is fine.
-            pass
-
-        if seen is None:
-            LOG.debug("[Instance %s] Did not find any previous message. "
-                      "Creating." % instance_id)
-            seen = LastSeen.create(instance_id=instance_id,
-                                   method_name=method_name,
-                                   sent=sent)
-            seen.save()
-            return False
-
-        last_sent = float(seen.sent)
-        if last_sent < sent:
+        if LastSeen.advance(instance_id, method_name, sent):
             LOG.debug("[Instance %s] Rec'd message is younger than last "
                       "seen. Updating." % instance_id)
-            seen.sent = sent
-            seen.save()
             return False
 
         LOG.info(_("[Instance %s] Rec'd message is older than last seen. "
@@ -86,6 +69,12 @@ class Manager(periodic_task.PeriodicTasks):
         LOG.debug("Instance ID: %(instance)s, Payload: %(payload)s" %
                   {"instance": str(instance_id),
                    "payload": str(payload)})
+        if self.heartbeats:
+            self.heartbeats.add(instance_id, payload, sent)
+        else:
+            self._apply_heartbeat(instance_id, payload, sent)
+
+    def _apply_heartbeat(self, instance_id, payload, sent):
         status = inst_models.InstanceServiceStatus.find_by(
             instance_id=instance_id)
         if self._message_too_old(instance_id, 'heartbeat', sent):
@@ -95,6 +84,12 @@ class Manager(periodic_task.PeriodicTasks):
                 payload['service_status']))
         status.save()
 
+    @periodic_task.periodic_task
+    def report_heartbeat_stats(self, context):
+        """Log the state of the heartbeat batcher."""
+        if self.heartbeats:
+            LOG.info(_("Heartbeat batcher: %s") % self.heartbeats.stats())
+
     def update_backup(self, context, instance_id, backup_id,
                       sent=None, **backup_fields):
         LOG.debug("Instance ID: %(instance)s, Backup ID: %(backup)s" %
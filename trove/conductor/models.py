@@ -12,13 +12,64 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import collections
+
+from trove.common import cfg
+from trove.common import exception
 from trove.db import get_db_api
 
+CONF = cfg.CONF
+
 
 def persisted_models():
     return {'conductor_lastseen': LastSeen}
 
 
+class LastSeenCache(object):
+    """A least recently used cache of the last seen 'sent' timestamps.
+
+    It holds timestamps read from the database, or written to it by an
+    update that only succeeds if the stored timestamp is older (in
+    LastSeen.advance and in the bulk update of the heartbeat batcher), and
+    set() never moves an entry back. A cached timestamp is therefore never
+    newer than the one in the database, and a message older than it can be
+    discarded without a database round trip, while the database stays the
+    authority for the other messages.
+    """
+
+    def __init__(self, capacity=None):
+        self._capacity = capacity
+        self._entries = collections.OrderedDict()
+
+    @property
+    def capacity(self):
+        if self._capacity is None:
+            return CONF.conductor_lastseen_cache_size
+        return self._capacity
+
+    def get(self, instance_id, method_name):
+        key = (instance_id, method_name)
+        sent = self._entries.pop(key, None)
+        if sent is not None:
+            self._entries[key] = sent
+        return sent
+
+    def set(self, instance_id, method_name, sent):
+        key = (instance_id, method_name)
+        sent = max(sent, self._entries.pop(key, sent))
+        if self.capacity <= 0:
+            return
+        self._entries[key] = sent
+        while len(self._entries) > self.capacity:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
 class LastSeen(object):
     """A table used only by Conductor to discard messages that arrive
        late and out of order.
@@ -43,7 +94,52 @@ class LastSeen(object):
                                     method_name=method_name)
         return seen
 
+    @classmethod
+    def advance(cls, instance_id, method_name, sent):
+        """Record 'sent' as the last seen timestamp if it is newer.
+
+        Returns False if a newer message has already been seen. A message
+        sent at the same time as the last one seen is accepted, as it is
+        not known to be older. The update is conditional on the stored
+        timestamp being older, so conductor workers sharing the database
+        cannot go back in time.
+        """
+        cached = cache.get(instance_id, method_name)
+        if cached is not None and cached > sent:
+            return False
+
+        if cls._update_if_older(instance_id, method_name, sent):
+            return True
+        # Either this is the first message, or a message at least as new
+        # was already recorded (possibly by another worker).
+        seen = cls.load(instance_id=instance_id, method_name=method_name)
+        if seen is None:
+            try:
+                cls.create(instance_id, method_name, sent)
+                cache.set(instance_id, method_name, sent)
+                return True
+            except exception.DBConstraintError:
+                # Another worker recorded its first message concurrently.
+                if cls._update_if_older(instance_id, method_name, sent):
+                    return True
+                seen = cls.load(instance_id=instance_id,
+                                method_name=method_name)
+        cache.set(instance_id, method_name, float(seen.sent))
+        return float(seen.sent) == sent
+
+    @classmethod
+    def _update_if_older(cls, instance_id, method_name, sent):
+        if get_db_api().update_if_lower(cls, 'sent', sent,
+                                        instance_id=instance_id,
+                                        method_name=method_name):
+            cache.set(instance_id, method_name, sent)
+            return True
+        return False
+
     @classmethod
     def create(cls, instance_id, method_name, sent):
         seen = LastSeen(instance_id, method_name, sent)
         return seen.save()
+
+
+cache = LastSeenCache()
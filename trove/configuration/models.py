@@ -238,7 +238,8 @@ class DBConfigurationParameter(dbmodels.DatabaseModelBase):
         return self.configuration_key.__hash__()
 
 
-class DBDatastoreConfigurationParameters(dbmodels.DatabaseModelBase):
+class DBDatastoreConfigurationParameters(
+        dstore_models.DatastoreCatalogModelBase):
     """Model for storing the configuration parameters on a datastore."""
     _auto_generated_attrs = ['id']
     _data_fields = [
@@ -302,18 +303,23 @@ class DatastoreConfigurationParameters(object):
 
     @classmethod
     def load_parameters(cls, datastore_version_id, show_deleted=False):
-        try:
-            if show_deleted:
-                return DBDatastoreConfigurationParameters.find_all(
-                    datastore_version_id=datastore_version_id
-                )
-            else:
-                return DBDatastoreConfigurationParameters.find_all(
-                    datastore_version_id=datastore_version_id,
-                    deleted=False
-                )
-        except exception.NotFound:
-            raise exception.NotFound(uuid=datastore_version_id)
+        def find():
+            try:
+                if show_deleted:
+                    return DBDatastoreConfigurationParameters.find_all(
+                        datastore_version_id=datastore_version_id
+                    ).all()
+                else:
+                    return DBDatastoreConfigurationParameters.find_all(
+                        datastore_version_id=datastore_version_id,
+                        deleted=False
+                    ).all()
+            except exception.NotFound:
+                raise exception.NotFound(uuid=datastore_version_id)
+
+        return dstore_models.catalog.get(
+            ('configuration_parameters', datastore_version_id,
+             show_deleted), find)
 
     @classmethod
     def load_parameter(cls, config_id, show_deleted=False):
@@ -377,6 +383,7 @@ def create_or_update_datastore_configuration_parameter(name,
             deleted=False,
         )
         get_db_api().save(config)
+    dstore_models.catalog.changed()
 
 
 def load_datastore_configuration_parameters(datastore,
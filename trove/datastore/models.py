@@ -15,6 +15,8 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import time
+
 from oslo_log import log as logging
 
 from trove.common import cfg
@@ -35,6 +37,7 @@ db_api = get_db_api()
 def persisted_models():
     return {
         'datastore': DBDatastore,
+        'datastore_catalog': DBDatastoreCatalog,
         'capabilities': DBCapabilities,
         'datastore_version': DBDatastoreVersion,
         'capability_overrides': DBCapabilityOverrides,
@@ -42,28 +45,145 @@ def persisted_models():
     }
 
 
-class DBDatastore(dbmodels.DatabaseModelBase):
+class DBDatastoreCatalog(dbmodels.DatabaseModelBase):
+
+    _data_fields = ['id', 'generation']
+
+
+class DatastoreCatalog(object):
+    """A per-process cache of the datastore catalog.
+
+    Datastores, their versions, capabilities, version metadata and
+    configuration parameters only change through trove-manage and the
+    management API, yet are looked up many times for every request. Once
+    looked up, they are served from memory. Every change bumps a generation
+    counter in the datastore_catalog table, which the catalog reads at most
+    every datastore_catalog_ttl seconds, dropping everything it holds when
+    the generation has changed. Changes made in this process are seen at
+    once.
+
+    Models are held as copies that are not attached to a database session,
+    and every lookup returns a new copy, so that callers changing what they
+    get do not change the cache.
+    """
+
+    ID = 'datastores'
+
+    def __init__(self):
+        self._entries = {}
+        self._generation = None
+        self._checked = 0
+        # Bumped on every clear, so that a value loaded concurrently with a
+        # change is not cached.
+        self._version = 0
+
+    @property
+    def ttl(self):
+        return CONF.datastore_catalog_ttl
+
+    def get(self, key, load):
+        """Return the cached value of key, calling load() to look it up."""
+        if self.ttl <= 0:
+            return load()
+        self._check()
+        try:
+            return self._copy(self._entries[key])
+        except KeyError:
+            version = self._version
+            value = load()
+            if version == self._version:
+                self._entries[key] = self._copy(value)
+            return value
+
+    @classmethod
+    def _copy(cls, value):
+        if isinstance(value, dbmodels.DatabaseModelBase):
+            return type(value)(**value.data())
+        if isinstance(value, (list, tuple)):
+            return type(value)(cls._copy(item) for item in value)
+        return value
+
+    def _check(self):
+        now = time.time()
+        if now - self._checked < self.ttl:
+            return
+        self._checked = now
+        catalog = DBDatastoreCatalog.get_by(id=self.ID)
+        generation = catalog.generation if catalog else 0
+        if generation != self._generation:
+            if self._generation is not None:
+                LOG.debug("Datastore catalog changed to generation %d."
+                          % generation)
+            self.clear()
+            self._generation = generation
+            self._checked = now
+
+    def changed(self):
+        """Bump the generation, making every process reload the catalog."""
+        if not db_api.increment(DBDatastoreCatalog, 'generation',
+                                id=self.ID):
+            try:
+                db_api.save(DBDatastoreCatalog(id=self.ID, generation=1))
+            except exception.DBConstraintError:
+                # Created concurrently by another process.
+                db_api.increment(DBDatastoreCatalog, 'generation',
+                                 id=self.ID)
+        self.clear()
+
+    def clear(self):
+        self._entries.clear()
+        self._generation = None
+        self._checked = 0
+        self._version += 1
+
+
+catalog = DatastoreCatalog()
+
+
+class DatastoreCatalogModelBase(dbmodels.DatabaseModelBase):
+    """A model cached by the datastore catalog.
+
+    Saving or deleting one bumps the catalog generation.
+    """
+
+    def save(self):
+        model = super(DatastoreCatalogModelBase, self).save()
+        catalog.changed()
+        return model
+
+    def delete(self):
+        model = super(DatastoreCatalogModelBase, self).delete()
+        catalog.changed()
+        return model
+
+    def update(self, **values):
+        model = super(DatastoreCatalogModelBase, self).update(**values)
+        catalog.changed()
+        return model
+
+
+class DBDatastore(DatastoreCatalogModelBase):
 
     _data_fields = ['id', 'name', 'default_version_id']
 
 
-class DBCapabilities(dbmodels.DatabaseModelBase):
+class DBCapabilities(DatastoreCatalogModelBase):
 
     _data_fields = ['id', 'name', 'description', 'enabled']
 
 
-class DBCapabilityOverrides(dbmodels.DatabaseModelBase):
+class DBCapabilityOverrides(DatastoreCatalogModelBase):
 
     _data_fields = ['id', 'capability_id', 'datastore_version_id', 'enabled']
 
 
-class DBDatastoreVersion(dbmodels.DatabaseModelBase):
+class DBDatastoreVersion(DatastoreCatalogModelBase):
 
     _data_fields = ['id', 'datastore_id', 'name', 'manager', 'image_id',
                     'packages', 'active']
 
 
-class DBDatastoreVersionMetadata(dbmodels.DatabaseModelBase):
+class DBDatastoreVersionMetadata(DatastoreCatalogModelBase):
 
     _data_fields = ['id', 'datastore_version_id', 'key', 'value',
                     'created', 'deleted', 'deleted_at', 'updated_at']
@@ -105,8 +225,8 @@ class Capabilities(object):
         Bulk load and override default capabilities with configured
         datastore version specific settings.
         """
-        capability_defaults = [Capability(c)
-                               for c in DBCapabilities.find_all()]
+        capability_defaults = [Capability(c) for c in catalog.get(
+            'capabilities', lambda: DBCapabilities.find_all().all())]
 
         capability_overrides = []
         if self.datastore_version_id is not None:
@@ -114,9 +234,10 @@ class Capabilities(object):
             # we don't have a datastore version id number it won't stop
             # defaults from rendering.
             capability_overrides = [
-                CapabilityOverride(ce)
-                for ce in DBCapabilityOverrides.find_all(
-                    datastore_version_id=self.datastore_version_id)
+                CapabilityOverride(ce) for ce in catalog.get(
+                    ('capability_overrides', self.datastore_version_id),
+                    lambda: DBCapabilityOverrides.find_all(
+                        datastore_version_id=self.datastore_version_id).all())
             ]
 
         def override(cap):
@@ -342,11 +463,16 @@ class Datastore(object):
 
     @classmethod
     def load(cls, id_or_name):
+        return cls(catalog.get(('datastore', id_or_name),
+                               lambda: cls._find(id_or_name)))
+
+    @staticmethod
+    def _find(id_or_name):
         try:
-            return cls(DBDatastore.find_by(id=id_or_name))
+            return DBDatastore.find_by(id=id_or_name)
         except exception.ModelNotFoundError:
             try:
-                return cls(DBDatastore.find_by(name=id_or_name))
+                return DBDatastore.find_by(name=id_or_name)
             except exception.ModelNotFoundError:
                 raise exception.DatastoreNotFound(datastore=id_or_name)
 
@@ -396,22 +522,33 @@ class DatastoreVersion(object):
 
     @classmethod
     def load(cls, datastore, id_or_name):
+        return cls(catalog.get(
+            ('datastore_version', datastore.id, id_or_name),
+            lambda: cls._find(datastore.id, id_or_name)))
+
+    @staticmethod
+    def _find(datastore_id, id_or_name):
         try:
-            return cls(DBDatastoreVersion.find_by(datastore_id=datastore.id,
-                                                  id=id_or_name))
+            return DBDatastoreVersion.find_by(datastore_id=datastore_id,
+                                              id=id_or_name)
         except exception.ModelNotFoundError:
-            versions = DBDatastoreVersion.find_all(datastore_id=datastore.id,
+            versions = DBDatastoreVersion.find_all(datastore_id=datastore_id,
                                                    name=id_or_name)
             if versions.count() == 0:
                 raise exception.DatastoreVersionNotFound(version=id_or_name)
             if versions.count() > 1:
                 raise exception.NoUniqueMatch(name=id_or_name)
-            return cls(versions.first())
+            return versions.first()
 
     @classmethod
     def load_by_uuid(cls, uuid):
+        return cls(catalog.get(('datastore_version', uuid),
+                               lambda: cls._find_by_uuid(uuid)))
+
+    @staticmethod
+    def _find_by_uuid(uuid):
         try:
-            return cls(DBDatastoreVersion.find_by(id=uuid))
+            return DBDatastoreVersion.find_by(id=uuid)
         except exception.ModelNotFoundError:
             raise exception.DatastoreVersionNotFound(version=uuid)
 
@@ -538,6 +675,7 @@ def update_datastore(name, default_version):
         datastore.default_version_id = None
 
     db_api.save(datastore)
+    catalog.changed()
 
 
 def update_datastore_version(datastore, name, manager, image_id, packages,
@@ -559,6 +697,7 @@ def update_datastore_version(datastore, name, manager, image_id, packages,
     version.active = active
 
     db_api.save(version)
+    catalog.changed()
 
 
 class DatastoreVersionMetadata(object):
@@ -570,15 +709,19 @@ class DatastoreVersionMetadata(object):
         datastore and datastore version name.
         """
         db_api.configure_db(CONF)
-        db_ds_record = DBDatastore.find_by(
-            name=datastore_name
-        )
-        db_dsv_record = DBDatastoreVersion.find_by(
-            datastore_id=db_ds_record.id,
-            name=datastore_version_name
-        )
 
-        return db_dsv_record.id
+        def find():
+            db_ds_record = DBDatastore.find_by(
+                name=datastore_name
+            )
+            db_dsv_record = DBDatastoreVersion.find_by(
+                datastore_id=db_ds_record.id,
+                name=datastore_version_name
+            )
+            return db_dsv_record.id
+
+        return catalog.get(('datastore_version_id', datastore_name,
+                            datastore_version_name), find)
 
     @classmethod
     def _datastore_version_metadata_add(cls, datastore_name,
@@ -686,12 +829,13 @@ class DatastoreVersionMetadata(object):
             # metadata table return all the associated flavors for
             # that datastore version.
             nova_flavors = create_nova_client(context).flavors.list()
-            bound_flavors = DBDatastoreVersionMetadata.find_all(
-                datastore_version_id=datastore_version.id,
-                key='flavor', deleted=False
-            )
-            if (bound_flavors.count() != 0):
-                bound_flavors = tuple(f.value for f in bound_flavors)
+            bound_flavors = catalog.get(
+                ('flavors', datastore_version.id),
+                lambda: tuple(f.value for f in
+                              DBDatastoreVersionMetadata.find_all(
+                                  datastore_version_id=datastore_version.id,
+                                  key='flavor', deleted=False)))
+            if bound_flavors:
                 # Generate a filtered list of nova flavors
                 ds_nova_flavors = (f for f in nova_flavors
                                    if f.id in bound_flavors)
@@ -120,6 +120,12 @@ class DatabaseModelBase(models.ModelBase):
     def find_all(cls, **kwargs):
         return db_query.find_all(cls, **cls._process_conditions(kwargs))
 
+    @classmethod
+    def find_all_in(cls, field, values, **kwargs):
+        """Return all the models whose field is one of values."""
+        return get_db_api().find_all_in(cls, field, values,
+                                        **cls._process_conditions(kwargs))
+
     @classmethod
     def _process_conditions(cls, raw_conditions):
         """Override in inheritors to format/modify any conditions."""
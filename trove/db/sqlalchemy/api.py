@@ -13,12 +13,20 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import datetime
+
+from oslo_utils import timeutils
+import sqlalchemy
 import sqlalchemy.exc
 
 from trove.common import exception
+from trove.common import pagination
 from trove.db.sqlalchemy import migration
 from trove.db.sqlalchemy import session
 
+# Maximum number of values in a single IN clause.
+IN_CLAUSE_LIMIT = 500
+
 
 def list(query_func, *args, **kwargs):
     return query_func(*args, **kwargs).all()
@@ -47,10 +55,32 @@ def find_all_by_limit(query_func, model, conditions, limit, marker=None,
 
 
 def find_by(model, **kwargs):
-    return _query_by(model, **kwargs).first()
+    found = _query_by(model, **kwargs).first()
+    if found is None and session.reads_use_slave():
+        # The row may have been written through another API worker, the
+        # taskmanager or the conductor, and not be on the slave yet.
+        found = _base_query(model, use_slave=False).filter_by(
+            **kwargs).first()
+    return found
+
+
+def find_all_in(model, field, values, **conditions):
+    """Return all the rows of model whose field is one of values.
+
+    Long lists of values are split across several queries, to stay under
+    the bind parameter limits of the database.
+    """
+    values = tuple(set(values))
+    rows = []
+    for start in range(0, len(values), IN_CLAUSE_LIMIT):
+        query = _query_by(model, **conditions)
+        rows.extend(query.filter(getattr(model, field).in_(
+            values[start:start + IN_CLAUSE_LIMIT])).all())
+    return rows
 
 
 def save(model):
+    session.mark_written()
     try:
         db_session = session.get_session()
         model = db_session.merge(model)
@@ -62,6 +92,7 @@ def save(model):
 
 
 def delete(model):
+    session.mark_written()
     db_session = session.get_session()
     model = db_session.merge(model)
     db_session.delete(model)
@@ -69,6 +100,7 @@ def delete(model):
 
 
 def delete_all(query_func, model, **conditions):
+    session.mark_written()
     query_func(model, **conditions).delete()
 
 
@@ -78,9 +110,87 @@ def update(model, **values):
 
 
 def update_all(query_func, model, conditions, values):
+    session.mark_written()
     query_func(model, **conditions).update(values)
 
 
+def bulk_update(updates, inserts=()):
+    """Apply bulk UPDATEs and INSERTs in a single transaction.
+
+    :param updates: (model, conditions, key_field, rows) or (model,
+                    conditions, key_field, rows, if_lower) tuples. rows
+                    maps the key_field of every row to update to a dict of
+                    its new column values. Each tuple is applied with a
+                    single UPDATE statement, using a CASE on key_field for
+                    every column. With if_lower, a row is only updated if
+                    its if_lower column is lower than the new value, and the
+                    whole transaction is rolled back unless all the rows of
+                    the tuple are.
+    :param inserts: new model instances to save.
+    :raises: :class:`DBConstraintError` if the transaction was rolled back.
+    """
+    session.mark_written()
+    db_session = session.get_session()
+    try:
+        with db_session.begin():
+            for update in updates:
+                model, conditions, key_field, rows = update[:4]
+                if_lower = update[4] if len(update) > 4 else None
+                if not rows:
+                    continue
+                key = getattr(model, key_field)
+                columns = set()
+                for values in rows.values():
+                    columns.update(values)
+                values = {}
+                for column in columns:
+                    whens = dict((row_key, row_values[column])
+                                 for row_key, row_values in rows.items()
+                                 if column in row_values)
+                    values[column] = sqlalchemy.case(
+                        whens, value=key, else_=getattr(model, column))
+                query = db_session.query(model).filter_by(**conditions)
+                # Not list(), which this module redefines.
+                query = query.filter(key.in_(tuple(rows)))
+                if if_lower:
+                    query = query.filter(getattr(model, if_lower) < (
+                        sqlalchemy.case(
+                            dict((row_key, row_values[if_lower])
+                                 for row_key, row_values in rows.items()),
+                            value=key)))
+                count = query.update(values, synchronize_session=False)
+                if if_lower and count != len(rows):
+                    raise exception.DBConstraintError(
+                        model_name=model.__name__,
+                        error="%d of %d rows have a %s that is not lower" % (
+                            len(rows) - count, len(rows), if_lower))
+            for model in inserts:
+                db_session.add(model)
+    except sqlalchemy.exc.IntegrityError as error:
+        raise exception.DBConstraintError(model_name='bulk_update',
+                                          error=str(error.orig))
+
+
+def update_if_lower(model, field, value, **conditions):
+    """Set field to value on the rows matching conditions where it is
+    lower, and return the number of rows updated.
+    """
+    session.mark_written()
+    query = _query_by(model, **conditions).filter(
+        getattr(model, field) < value)
+    return query.update({field: value}, synchronize_session=False)
+
+
+def increment(model, field, **conditions):
+    """Add one to field on the rows matching conditions, and return the
+    number of rows updated.
+    """
+    session.mark_written()
+    query = _query_by(model, **conditions)
+    return query.update({field: getattr(model, field) + 1},
+                        synchronize_session=False)
+
+
 def configure_db(options, *plugins):
     session.configure_db(options)
     configure_db_for_plugins(options, *plugins)
@@ -117,8 +227,57 @@ def db_reset(options, *plugins):
     configure_db(options)
 
 
-def _base_query(cls):
-    return session.get_session().query(cls)
+def paginate_by_keys(query, keys, limit, marker=None):
+    """Return a page of query and the marker of the next page.
+
+    :param keys:   (column, descending) pairs to sort by. The last column
+                   must be unique, so that every row has a distinct key.
+    :param marker: marker returned with the previous page, if any.
+
+    Rather than skipping the previous pages with an OFFSET, the page is
+    sought directly after the row the marker was made from, so it is
+    served from an index on the key columns whatever its depth. One extra
+    row is fetched to tell whether there is a next page.
+    """
+    if marker:
+        values = pagination.decode_marker(marker, len(keys))
+        try:
+            values = [_marker_value(column, value)
+                      for (column, descending), value in zip(keys, values)]
+        except ValueError:
+            raise exception.InvalidMarker(marker=marker)
+        after = []
+        for index, (column, descending) in enumerate(keys):
+            conditions = [keys[prior][0] == values[prior]
+                          for prior in range(index)]
+            conditions.append(column < values[index] if descending
+                              else column > values[index])
+            after.append(sqlalchemy.and_(*conditions))
+        query = query.filter(sqlalchemy.or_(*after))
+    query = query.order_by(*[column.desc() if descending else column.asc()
+                             for column, descending in keys])
+    rows = query.limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, pagination.encode_marker(
+        [getattr(rows[-1], column.key) for column, descending in keys])
+
+
+def _marker_value(column, value):
+    if value is not None and column.type.python_type is datetime.datetime:
+        return timeutils.normalize_time(timeutils.parse_isotime(value))
+    return value
+
+
+def route_reads_to_slave(enabled, tenant=None):
+    session.route_reads_to_slave(enabled, tenant=tenant)
+
+
+def _base_query(cls, use_slave=None):
+    if use_slave is None:
+        use_slave = session.reads_use_slave()
+    return session.get_session(use_slave=use_slave).query(cls)
 
 
 def _query_by(cls, **conditions):
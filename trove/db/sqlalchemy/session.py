@@ -15,6 +15,7 @@
 
 import contextlib
 import threading
+import time
 
 from oslo_db.sqlalchemy import session
 from oslo_log import log as logging
@@ -27,6 +28,15 @@ from trove.db.sqlalchemy import mappers
 _FACADE = None
 _LOCK = threading.Lock()
 
+# Reads are routed per request, so this is greenthread local.
+_ROUTING = threading.local()
+# When the slave database was last checked, and whether it was usable.
+_SLAVE_STATE = {'checked': 0, 'usable': False}
+# When each tenant last wrote through this process.
+_RECENT_WRITES = {}
+# Expired entries are dropped from _RECENT_WRITES beyond this size.
+_RECENT_WRITES_SIZE = 1000
+
 
 LOG = logging.getLogger(__name__)
 
@@ -122,6 +132,92 @@ def get_session(**kwargs):
     return get_facade().get_session(**kwargs)
 
 
+def route_reads_to_slave(enabled, tenant=None):
+    """Send the reads of the current request to the slave database, if
+    one is configured and usable, until the request writes. The reads of
+    a tenant that wrote recently are sent to the master.
+    """
+    _ROUTING.reads_to_slave = enabled
+    _ROUTING.tenant = tenant
+
+
+def mark_written():
+    """Send the remaining reads of the current request, and the reads of
+    the next requests of its tenant, to the master, so that they see the
+    writes of the request.
+    """
+    _ROUTING.reads_to_slave = False
+    tenant = getattr(_ROUTING, 'tenant', None)
+    if tenant:
+        now = time.time()
+        if len(_RECENT_WRITES) >= _RECENT_WRITES_SIZE:
+            for key, written in list(_RECENT_WRITES.items()):
+                if now - written >= _write_visible_after():
+                    del _RECENT_WRITES[key]
+        _RECENT_WRITES[tenant] = now
+
+
+def reads_use_slave():
+    return (getattr(_ROUTING, 'reads_to_slave', False) and
+            not _wrote_recently(getattr(_ROUTING, 'tenant', None)) and
+            slave_usable())
+
+
+def _write_visible_after():
+    # The slave was at most db_slave_max_lag seconds behind when it was
+    # last checked, and may fall further behind until the next check.
+    return CONF.db_slave_max_lag + CONF.db_slave_check_interval
+
+
+def _wrote_recently(tenant):
+    """Whether a write of tenant may not be on the slave yet."""
+    written = _RECENT_WRITES.get(tenant) if tenant else None
+    if written is None:
+        return False
+    if time.time() - written < _write_visible_after():
+        return True
+    _RECENT_WRITES.pop(tenant, None)
+    return False
+
+
+def slave_usable():
+    """Whether reads may be sent to the slave database.
+
+    It must be configured, reachable and, for MySQL, no more than
+    db_slave_max_lag seconds behind the master. The result of a check is
+    kept for db_slave_check_interval seconds.
+    """
+    if not CONF.database.slave_connection:
+        return False
+    now = time.time()
+    if now - _SLAVE_STATE['checked'] >= CONF.db_slave_check_interval:
+        # Other requests keep using the last result during the check.
+        _SLAVE_STATE['checked'] = now
+        _SLAVE_STATE['usable'] = _check_slave()
+    return _SLAVE_STATE['usable']
+
+
+def _check_slave():
+    try:
+        engine = get_engine(use_slave=True)
+        with contextlib.closing(engine.connect()) as con:
+            if engine.dialect.name != 'mysql':
+                con.execute('SELECT 1')
+                return True
+            status = con.execute('SHOW SLAVE STATUS').first()
+            lag = status['Seconds_Behind_Master'] if status else 0
+    except Exception:
+        LOG.exception(_("Could not check the slave database, reading from "
+                        "the master."))
+        return False
+    if lag is None or lag > CONF.db_slave_max_lag:
+        LOG.warning(_("The slave database is %s seconds behind, reading "
+                      "from the master."),
+                    'unknown' if lag is None else lag)
+        return False
+    return True
+
+
 def raw_query(model, **kwargs):
     return get_session(**kwargs).query(model)
 
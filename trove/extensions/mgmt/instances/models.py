@@ -17,6 +17,7 @@ from oslo_log import log as logging
 
 from trove.common import cfg
 from trove.common import exception
+from trove.common import fanout
 from trove.common.i18n import _
 from trove.common import remote
 from trove.common import utils
@@ -80,9 +81,11 @@ def load_mgmt_instance(cls, context, id, include_deleted):
 
 
 class SimpleMgmtInstance(imodels.BaseInstance):
-    def __init__(self, context, db_info, server, datastore_status):
+    def __init__(self, context, db_info, server, datastore_status,
+                 ds_version=None, ds=None):
         super(SimpleMgmtInstance, self).__init__(context, db_info, server,
-                                                 datastore_status)
+                                                 datastore_status,
+                                                 ds_version=ds_version, ds=ds)
 
     @property
     def status(self):
@@ -119,14 +122,22 @@ class DetailedMgmtInstance(SimpleMgmtInstance):
     def load(cls, context, id, include_deleted=False):
         instance = load_mgmt_instance(cls, context, id, include_deleted)
         client = remote.create_cinder_client(context)
-        try:
-            instance.volume = client.volumes.get(instance.volume_id)
-        except Exception:
-            instance.volume = None
-            # Populate the volume_used attribute from the guest agent.
-        instance_models.load_guest_info(instance, context, id)
-        instance.root_history = mysql_models.RootHistory.load(context=context,
-                                                              instance_id=id)
+        # Load the volume, the volume usage reported by the guest agent and
+        # the root history at once.
+        volume, _guest, root_history = fanout.fan_out([
+            lambda: client.volumes.get(instance.volume_id),
+            lambda: instance_models.load_guest_info(instance, context, id),
+            lambda: mysql_models.RootHistory.load(context=context,
+                                                  instance_id=id)])
+        if isinstance(volume, Exception):
+            volume = None
+        if isinstance(root_history, Exception):
+            LOG.error(_("Could not load the root history of instance "
+                        "%(id)s: %(error)s"),
+                      {'id': id, 'error': root_history})
+            root_history = None
+        instance.volume = volume
+        instance.root_history = root_history
         return instance
 
 
@@ -147,8 +158,8 @@ class MgmtInstance(imodels.Instance):
 class MgmtInstances(imodels.Instances):
     @staticmethod
     def load_status_from_existing(context, db_infos, servers):
-        def load_instance(context, db, status, server=None):
-            return SimpleMgmtInstance(context, db, server, status)
+        def load_instance(context, db, status, server=None, **kwargs):
+            return SimpleMgmtInstance(context, db, server, status, **kwargs)
 
         if context is None:
             raise TypeError("Argument context not defined.")
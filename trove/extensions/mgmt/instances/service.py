@@ -83,13 +83,11 @@ class MgmtInstanceController(InstanceController):
         include_deleted = deleted_q == 'true'
         server = models.DetailedMgmtInstance.load(context, id,
                                                   include_deleted)
-        root_history = mysql_models.RootHistory.load(context=context,
-                                                     instance_id=id)
         return wsgi.Result(
             views.MgmtInstanceDetailView(
                 server,
                 req=req,
-                root_history=root_history).data(),
+                root_history=server.root_history).data(),
             200)
 
     @admin_context
@@ -223,6 +223,13 @@ class API(object):
         return self._call("get_diagnostics", AGENT_LOW_TIMEOUT,
                           self.version_cap)
 
+    def report_status(self):
+        """Make an asynchronous call to have the guest report the status
+        of its datastore, which the control plane overwrote.
+        """
+        LOG.debug("Asking instance %s to report its status.", self.id)
+        self._cast("report_status", self.version_cap)
+
     def rpc_ping(self):
         """Make a synchronous RPC call to check if we can ping the instance."""
         LOG.debug("Check RPC ping on instance %s.", self.id)
@@ -14,6 +14,8 @@
 #    under the License.
 #
 
+import json
+
 from oslo_log import log as logging
 
 from trove.backup.state import BackupState
@@ -21,6 +23,7 @@ from trove.common import cfg
 from trove.common.i18n import _
 from trove.common.strategies.storage import get_storage_strategy
 from trove.conductor import api as conductor_api
+from trove.guestagent.backup.metering import BackupMeter
 from trove.guestagent.common import timeutils
 from trove.guestagent.dbaas import get_filesystem_volume_stats
 from trove.guestagent.strategies.backup.base import BackupError
@@ -47,6 +50,9 @@ INCREMENTAL = CONFIG_MANAGER.backup_incremental_strategy.get(
 
 INCREMENTAL_RUNNER = get_backup_strategy(INCREMENTAL, BACKUP_NAMESPACE)
 
+# The ids of the backups this agent is running.
+RUNNING_BACKUPS = set()
+
 
 class BackupAgent(object):
     def _get_restore_runner(self, backup_type):
@@ -76,46 +82,68 @@ class BackupAgent(object):
                                 **backup_state)
         LOG.debug("Updated state for %s to %s.", backup_id, backup_state)
 
-        try:
-            with runner(filename=backup_id, extra_opts=extra_opts,
-                        **parent_metadata) as bkup:
-                LOG.debug("Starting backup %s.", backup_id)
-                meta = {}
-                meta['datastore'] = backup_info['datastore']
-                meta['datastore_version'] = backup_info['datastore_version']
-                success, note, checksum, location = storage.save(
-                    bkup.manifest,
-                    bkup,
-                    metadata=meta)
-
-                backup_state.update({
-                    'checksum': checksum,
-                    'location': location,
-                    'note': note,
-                    'success': success,
-                    'backup_type': bkup.backup_type,
-                })
-
-                LOG.debug("Backup %(backup_id)s completed status: "
-                          "%(success)s.", backup_state)
-                LOG.debug("Backup %(backup_id)s file swift checksum: "
-                          "%(checksum)s.", backup_state)
-                LOG.debug("Backup %(backup_id)s location: "
-                          "%(location)s.", backup_state)
-
-                if not success:
-                    raise BackupError(note)
-
-                backup_state.update({'state': BackupState.COMPLETED})
-
-                return meta
+        def publish_progress(progress):
+            conductor.update_backup(CONF.guest_id,
+                                    backup_id=backup_id,
+                                    sent=timeutils.float_utcnow(),
+                                    progress=json.dumps(progress))
+            LOG.debug("Backup %(backup_id)s progress: %(progress)s.",
+                      {'backup_id': backup_id, 'progress': progress})
 
+        meter = None
+        manifest = None
+        attempts = CONF.backup_retries + 1
+        RUNNING_BACKUPS.add(backup_id)
+        try:
+            for attempt in range(1, attempts + 1):
+                try:
+                    with runner(filename=backup_id, extra_opts=extra_opts,
+                                **parent_metadata) as bkup:
+                        LOG.debug("Starting backup %s.", backup_id)
+                        manifest = bkup.manifest
+                        meter = BackupMeter(bkup, publish=publish_progress)
+                        meta = self._save_backup(backup_info, bkup, meter,
+                                                 storage, backup_state)
+                        backup_state.update({'state': BackupState.COMPLETED})
+                        return meta
+                except Exception:
+                    if attempt >= attempts:
+                        raise
+                    # With a segment journal, the next attempt does not
+                    # upload again the segments this one saved.
+                    LOG.exception(_("Error saving backup %(backup_id)s, "
+                                    "running it again (attempt %(attempt)s "
+                                    "of %(attempts)s).")
+                                  % {'backup_id': backup_id,
+                                     'attempt': attempt + 1,
+                                     'attempts': attempts})
         except Exception:
             LOG.exception(
                 _("Error saving backup: %(backup_id)s.") % backup_state)
             backup_state.update({'state': BackupState.FAILED})
+            if manifest:
+                # Do not leave behind what the attempts saved.
+                try:
+                    storage.discard(manifest)
+                except Exception:
+                    LOG.exception(_("Error removing the data saved for "
+                                    "backup %s.") % backup_id)
             raise
         finally:
+            RUNNING_BACKUPS.discard(backup_id)
+            if meter:
+                progress = meter.stats()
+                backup_state['progress'] = json.dumps(progress)
+                LOG.info(_("Backup %(backup_id)s streamed %(bytes)s bytes "
+                           "in %(elapsed)ss (%(throughput)s bytes/s); "
+                           "%(producer)ss waiting on the backup process, "
+                           "%(upload)ss waiting on storage.") %
+                         {'backup_id': backup_id,
+                          'bytes': progress['bytes_read'],
+                          'elapsed': progress['elapsed'],
+                          'throughput': progress['throughput'],
+                          'producer': progress['producer_wait'],
+                          'upload': progress['upload_wait']})
             LOG.info(_("Completed backup %(backup_id)s.") % backup_state)
             conductor.update_backup(CONF.guest_id,
                                     sent=timeutils.float_utcnow(),
@@ -123,6 +151,54 @@ class BackupAgent(object):
             LOG.debug("Updated state for %s to %s.",
                       backup_id, backup_state)
 
+    def _save_backup(self, backup_info, bkup, meter, storage, backup_state):
+        meta = {}
+        meta['datastore'] = backup_info['datastore']
+        meta['datastore_version'] = backup_info['datastore_version']
+        if bkup.codec:
+            meta.update(bkup.codec.metadata())
+        success, note, checksum, location = storage.save(
+            bkup.manifest,
+            meter,
+            metadata=meta)
+
+        backup_state.update({
+            'checksum': checksum,
+            'location': location,
+            'note': note,
+            'success': success,
+            'backup_type': bkup.backup_type,
+        })
+
+        LOG.debug("Backup %(backup_id)s completed status: "
+                  "%(success)s.", backup_state)
+        LOG.debug("Backup %(backup_id)s file swift checksum: "
+                  "%(checksum)s.", backup_state)
+        LOG.debug("Backup %(backup_id)s location: "
+                  "%(location)s.", backup_state)
+
+        if not success:
+            raise BackupError(note)
+        return meta
+
+    def _discard_leftovers(self, storage, backup_id):
+        """Discard what the backups that are no longer running left in
+        storage. An agent that died during a backup leaves its data behind,
+        and the backup is retried with a new id, so it is never resumed.
+        """
+        for filename in storage.leftovers():
+            leftover_id = filename.split('.')[0]
+            # A backup requested again with the same id can still resume.
+            if leftover_id == backup_id or leftover_id in RUNNING_BACKUPS:
+                continue
+            LOG.info(_("Discarding the data left by backup %s.")
+                     % leftover_id)
+            try:
+                storage.discard(filename)
+            except Exception:
+                LOG.exception(_("Error removing the data saved for "
+                                "backup %s.") % leftover_id)
+
     def execute_backup(self, context, backup_info,
                        runner=RUNNER, extra_opts=EXTRA_OPTS,
                        incremental_runner=INCREMENTAL_RUNNER):
@@ -131,6 +207,7 @@ class BackupAgent(object):
         storage = get_storage_strategy(
             CONF.storage_strategy,
             CONF.storage_namespace)(context)
+        self._discard_leftovers(storage, backup_info['id'])
 
         # Check if this is an incremental backup and grab the parent metadata
         parent_metadata = {}
@@ -166,10 +243,15 @@ class BackupAgent(object):
                 CONF.storage_strategy,
                 CONF.storage_namespace)(context)
 
+            # The metadata records how the backup stream was encoded.
+            metadata = storage.load_metadata(backup_info['location'],
+                                             backup_info['checksum'])
+
             runner = restore_runner(storage, location=backup_info['location'],
                                     checksum=backup_info['checksum'],
                                     restore_location=restore_location,
-                                    backup_id=backup_info['id'])
+                                    backup_id=backup_info['id'],
+                                    metadata=metadata)
             backup_info['restore_location'] = restore_location
             LOG.debug("Restoring instance from backup %(id)s to "
                       "%(restore_location)s.", backup_info)
@@ -0,0 +1,124 @@
+# Copyright 2016 Tesora Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+#
+
+import time
+
+from oslo_log import log as logging
+
+from trove.common import cfg
+
+LOG = logging.getLogger(__name__)
+CONF = cfg.CONF
+
+
+class BackupMeter(object):
+    """Meter the stream between a backup runner and a storage strategy.
+
+    The meter is handed to the storage strategy in place of the runner.
+    It times every read, which is time spent waiting on the backup process
+    (and any compression or encryption), and the gaps between reads, which
+    is time the backup process spends waiting on the storage strategy.
+    Storage strategies that upload in segments report each upload through
+    segment_uploaded().
+
+    Progress is passed to the 'publish' callback every 'interval' seconds,
+    and a summary is added to the backup metadata.
+    """
+
+    def __init__(self, runner, publish=None, interval=None):
+        self.runner = runner
+        self.publish = publish
+        self.interval = (CONF.backup_progress_interval
+                         if interval is None else interval)
+        self.bytes_read = 0
+        self.producer_wait = 0.0
+        self.upload_wait = 0.0
+        self.segments = 0
+        self.segment_bytes = 0
+        self.segment_time = 0.0
+        self.segment_time_max = 0.0
+        self.started = time.time()
+        self._last_read = None
+        self._last_publish = self.started
+
+    def __getattr__(self, name):
+        # Anything not metered is answered by the runner.
+        return getattr(self.runner, name)
+
+    def read(self, chunk_size):
+        start = time.time()
+        if self._last_read is not None:
+            self.upload_wait += start - self._last_read
+        chunk = self.runner.read(chunk_size)
+        self._last_read = time.time()
+        self.producer_wait += self._last_read - start
+        self.bytes_read += len(chunk)
+
+        if (self.publish and self.interval and
+                self._last_read - self._last_publish >= self.interval):
+            self._last_publish = self._last_read
+            try:
+                self.publish(self.stats())
+            except Exception:
+                # Progress reports must never fail the backup.
+                LOG.exception("Error publishing backup progress.")
+        return chunk
+
+    def segment_uploaded(self, size, seconds):
+        """Record the upload of a segment of the stream."""
+        self.segments += 1
+        self.segment_bytes += size
+        self.segment_time += seconds
+        self.segment_time_max = max(self.segment_time_max, seconds)
+
+    @property
+    def raw_bytes(self):
+        """Bytes produced by the backup process before any in-process
+        compression and encryption, or None if they are not known.
+        """
+        encoder = getattr(self.runner, 'encoder', None)
+        return encoder.bytes_in if encoder else None
+
+    def stats(self):
+        elapsed = max(time.time() - self.started, 0.001)
+        stats = {
+            'elapsed': round(elapsed, 3),
+            'bytes_read': self.bytes_read,
+            'throughput': int(self.bytes_read / elapsed),
+            'producer_wait': round(self.producer_wait, 3),
+            'upload_wait': round(self.upload_wait, 3),
+        }
+        raw_bytes = self.raw_bytes
+        if raw_bytes is not None:
+            stats['raw_bytes'] = raw_bytes
+            if self.bytes_read:
+                stats['compression_ratio'] = round(
+                    float(raw_bytes) / self.bytes_read, 3)
+        if self.segments:
+            stats.update({
+                'segments': self.segments,
+                'bytes_uploaded': self.segment_bytes,
+                'segment_upload_avg': round(
+                    self.segment_time / self.segments, 3),
+                'segment_upload_max': round(self.segment_time_max, 3),
+            })
+        return stats
+
+    def metadata(self):
+        metadata = self.runner.metadata()
+        metadata.update(('meter_%s' % key, str(value))
+                        for key, value in self.stats().items())
+        return metadata
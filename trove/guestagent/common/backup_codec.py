@@ -0,0 +1,413 @@
+# Copyright 2016 Tesora Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""In-process compression and encryption of backup streams.
+
+The encoder sits between the backup process and the storage strategy and
+replaces the 'gzip' and 'openssl enc' shell pipelines. The stream is cut into
+blocks which are compressed and encrypted in native threads (through
+eventlet's tpool), so the work is spread over all the available cores and the
+encryption key never appears on a command line.
+"""
+
+import binascii
+import collections
+import hashlib
+import os
+import struct
+import zlib
+
+from Crypto.Cipher import AES
+from Crypto.Util import Counter
+import eventlet
+from eventlet import event
+from eventlet import tpool
+from oslo_concurrency import processutils
+from oslo_utils import encodeutils
+
+from trove.common import cfg
+from trove.common.i18n import _
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:
+    lz4_frame = None
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+CONF = cfg.CONF
+
+# Backup metadata keys recording how the stream was encoded.
+COMPRESSION_KEY = 'stream_compression'
+ENCRYPTION_KEY = 'stream_encryption'
+NONE = 'none'
+
+
+class CodecError(Exception):
+    """Error encoding or decoding a backup stream."""
+
+
+class Compressor(object):
+    """Base class for block compressors.
+
+    Every block is compressed independently so blocks can be compressed
+    concurrently.
+    """
+    name = None
+    extension = None
+
+    def compress_block(self, data):
+        raise NotImplementedError()
+
+    def decompressor(self):
+        """Return an object with decompress(data) and flush() methods."""
+        raise NotImplementedError()
+
+
+class GzipCompressor(Compressor):
+    """Compress each block into its own gzip member.
+
+    This is what pigz does: concatenated gzip members are a valid gzip file,
+    so the result can still be read by 'gzip -d'.
+    """
+    name = 'gzip'
+    extension = '.gz'
+
+    def compress_block(self, data):
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        return compressor.compress(data) + compressor.flush()
+
+    def decompressor(self):
+        return GzipDecompressor()
+
+
+class GzipDecompressor(object):
+    """Streaming decompressor for a multi-member gzip stream."""
+
+    def __init__(self):
+        self._decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+    def decompress(self, data):
+        output = []
+        while data:
+            output.append(self._decompressor.decompress(data))
+            data = self._decompressor.unused_data
+            if data:
+                # The member ended; the rest belongs to the next one.
+                self._decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        return b''.join(output)
+
+    def flush(self):
+        return self._decompressor.flush()
+
+
+class FramedCompressor(Compressor):
+    """Write each compressed block as a frame prefixed by its length."""
+    frame_header = struct.Struct('>I')
+
+    def compress_block(self, data):
+        frame = self.compress_frame(data)
+        return self.frame_header.pack(len(frame)) + frame
+
+    def compress_frame(self, data):
+        raise NotImplementedError()
+
+    def decompress_frame(self, frame):
+        raise NotImplementedError()
+
+    def decompressor(self):
+        return FrameDecompressor(self)
+
+
+class FrameDecompressor(object):
+    """Streaming decompressor for a stream written by a FramedCompressor."""
+
+    def __init__(self, compressor):
+        self._compressor = compressor
+        self._buffer = b''
+
+    def decompress(self, data):
+        self._buffer += data
+        header_size = self._compressor.frame_header.size
+        output = []
+        while len(self._buffer) >= header_size:
+            length, = self._compressor.frame_header.unpack(
+                self._buffer[:header_size])
+            if len(self._buffer) < header_size + length:
+                break
+            frame = self._buffer[header_size:header_size + length]
+            self._buffer = self._buffer[header_size + length:]
+            output.append(self._compressor.decompress_frame(frame))
+        return b''.join(output)
+
+    def flush(self):
+        if self._buffer:
+            raise CodecError(_("Backup stream ended in the middle of a "
+                               "compressed frame."))
+        return b''
+
+
+class ZstdCompressor(FramedCompressor):
+    name = 'zstd'
+    extension = '.zst'
+
+    def compress_frame(self, data):
+        return zstandard.ZstdCompressor(level=3).compress(data)
+
+    def decompress_frame(self, frame):
+        return zstandard.ZstdDecompressor().decompress(frame)
+
+
+class Lz4Compressor(FramedCompressor):
+    name = 'lz4'
+    extension = '.lz4'
+
+    def compress_frame(self, data):
+        return lz4_frame.compress(data)
+
+    def decompress_frame(self, frame):
+        return lz4_frame.decompress(frame)
+
+
+COMPRESSORS = {
+    GzipCompressor.name: (GzipCompressor, zlib),
+    ZstdCompressor.name: (ZstdCompressor, zstandard),
+    Lz4Compressor.name: (Lz4Compressor, lz4_frame),
+}
+
+
+def get_compressor(name):
+    if name is None or name == NONE:
+        return None
+    if name not in COMPRESSORS:
+        raise CodecError(_("Unknown backup compression codec: %s.") % name)
+    compressor_class, module = COMPRESSORS[name]
+    if module is None:
+        raise CodecError(_("The python module required by the %s backup "
+                           "compression codec is not installed.") % name)
+    return compressor_class()
+
+
+class AesCtrCipher(object):
+    """AES-256 in counter mode.
+
+    Counter mode lets any part of the stream be encrypted on its own given
+    its offset, so blocks are encrypted concurrently. The encoded stream
+    starts with a header holding the salt used to derive the key from the
+    passphrase and the initial counter value.
+    """
+    name = 'aes-256-ctr'
+    extension = '.enc'
+    magic = b'TRVAES01'
+    salt_size = 16
+    nonce_size = 16
+    header_size = len(magic) + salt_size + nonce_size
+    kdf_iterations = 10000
+
+    def __init__(self, passphrase, salt=None, nonce=None, key=None):
+        self.salt = salt or os.urandom(self.salt_size)
+        self.nonce = nonce or os.urandom(self.nonce_size)
+        self._key = key or self.derive_key(passphrase, self.salt)
+        self._initial_value = int(binascii.hexlify(self.nonce), 16)
+
+    @classmethod
+    def derive_key(cls, passphrase, salt):
+        return hashlib.pbkdf2_hmac('sha256', encodeutils.to_utf8(passphrase),
+                                   salt, cls.kdf_iterations, 32)
+
+    @classmethod
+    def from_header(cls, passphrase, header):
+        if header[:len(cls.magic)] != cls.magic:
+            raise CodecError(_("Backup stream does not start with a valid "
+                               "encryption header."))
+        salt_end = len(cls.magic) + cls.salt_size
+        return cls(passphrase, salt=header[len(cls.magic):salt_end],
+                   nonce=header[salt_end:cls.header_size])
+
+    @property
+    def header(self):
+        return self.magic + self.salt + self.nonce
+
+    def encrypt_at(self, offset, data):
+        """Encrypt (or decrypt) data found at offset in the stream."""
+        skip = offset % AES.block_size
+        counter = Counter.new(
+            128, initial_value=(self._initial_value +
+                                offset // AES.block_size) % (1 << 128),
+            allow_wraparound=True)
+        cipher = AES.new(self._key, AES.MODE_CTR, counter=counter)
+        return cipher.encrypt(b'\0' * skip + data)[skip:]
+
+    decrypt_at = encrypt_at
+
+
+class StreamEncoder(object):
+    """Compress and encrypt the output of a backup process.
+
+    Offers the same read(chunk_size) interface as the backup runner, so the
+    storage strategies can consume it directly. Up to 'threads' blocks are
+    being encoded at any time.
+    """
+
+    def __init__(self, source, compressor, cipher, block_size, threads):
+        self.source = source
+        self.compressor = compressor
+        self.cipher = cipher
+        self.block_size = block_size
+        self.threads = threads
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self._eof = False
+        self._pending = collections.deque()
+        self._buffer = cipher.header if cipher else b''
+        # Each block needs the offset at which the previous one ended before
+        # it can be encrypted; the offsets are chained through events.
+        self._last_offset = event.Event()
+        self._last_offset.send(0)
+
+    def _encode_block(self, block, previous_offset, offset):
+        try:
+            data = block
+            if self.compressor:
+                data = tpool.execute(self.compressor.compress_block, block)
+            start = previous_offset.wait()
+        except Exception as e:
+            # The next block would otherwise wait for its offset forever.
+            offset.send_exception(e)
+            raise
+        offset.send(start + len(data))
+        if self.cipher:
+            data = tpool.execute(self.cipher.encrypt_at, start, data)
+        return data
+
+    def _start_block(self):
+        block = self.source.read(self.block_size)
+        if not block:
+            self._eof = True
+            return
+        self.bytes_in += len(block)
+        offset = event.Event()
+        self._pending.append(eventlet.spawn(
+            self._encode_block, block, self._last_offset, offset))
+        self._last_offset = offset
+
+    def _stop(self):
+        self._eof = True
+        while self._pending:
+            self._pending.popleft().kill()
+
+    def read(self, chunk_size):
+        while len(self._buffer) < chunk_size:
+            while not self._eof and len(self._pending) < self.threads:
+                self._start_block()
+            if not self._pending:
+                break
+            try:
+                self._buffer += self._pending.popleft().wait()
+            except Exception:
+                self._stop()
+                raise
+        chunk = self._buffer[:chunk_size]
+        self._buffer = self._buffer[chunk_size:]
+        self.bytes_out += len(chunk)
+        return chunk
+
+
+class StreamCodec(object):
+    """Describes how a backup stream is compressed and encrypted."""
+
+    def __init__(self, compression=None, encryption=None, key=None):
+        self.compressor = get_compressor(compression)
+        if encryption not in (None, NONE, AesCtrCipher.name):
+            raise CodecError(_("Unknown backup encryption codec: %s.")
+                             % encryption)
+        self.encrypted = encryption == AesCtrCipher.name
+        self.key = key
+
+    @classmethod
+    def from_config(cls):
+        """The codec used for new backups, or None to use the shell."""
+        if not CONF.backup_use_inprocess_codec:
+            return None
+        return cls(compression=(CONF.backup_compression_codec
+                                if CONF.backup_use_gzip_compression
+                                else None),
+                   encryption=(AesCtrCipher.name
+                               if CONF.backup_use_openssl_encryption
+                               else None),
+                   key=CONF.backup_aes_cbc_key)
+
+    @classmethod
+    def from_metadata(cls, metadata, key):
+        """The codec a backup was written with, or None if the backup was
+        compressed and encrypted by the shell.
+        """
+        if COMPRESSION_KEY not in metadata and ENCRYPTION_KEY not in metadata:
+            return None
+        return cls(compression=metadata.get(COMPRESSION_KEY),
+                   encryption=metadata.get(ENCRYPTION_KEY),
+                   key=key)
+
+    def metadata(self):
+        return {
+            COMPRESSION_KEY: (self.compressor.name
+                              if self.compressor else NONE),
+            ENCRYPTION_KEY: AesCtrCipher.name if self.encrypted else NONE,
+        }
+
+    @property
+    def extension(self):
+        return ((self.compressor.extension if self.compressor else '') +
+                (AesCtrCipher.extension if self.encrypted else ''))
+
+    def encoder(self, source):
+        threads = (CONF.backup_codec_threads or
+                   processutils.get_worker_count())
+        cipher = AesCtrCipher(self.key) if self.encrypted else None
+        return StreamEncoder(source, self.compressor, cipher,
+                             CONF.backup_codec_block_size, threads)
+
+    def decode(self, chunks):
+        """Yield the decoded contents of an iterable of encoded chunks."""
+        decompressor = (self.compressor.decompressor()
+                        if self.compressor else None)
+        cipher = None
+        header = b''
+        offset = 0
+        for chunk in chunks:
+            if self.encrypted:
+                if cipher is None:
+                    header += chunk
+                    if len(header) < AesCtrCipher.header_size:
+                        continue
+                    cipher = AesCtrCipher.from_header(self.key, header)
+                    chunk = header[AesCtrCipher.header_size:]
+                chunk, offset = (
+                    tpool.execute(cipher.decrypt_at, offset, chunk),
+                    offset + len(chunk))
+            if decompressor:
+                chunk = tpool.execute(decompressor.decompress, chunk)
+            if chunk:
+                yield chunk
+
+        if self.encrypted and cipher is None:
+            raise CodecError(_("Backup stream is too short to hold the "
+                               "encryption header."))
+        if decompressor:
+            tail = decompressor.flush()
+            if tail:
+                yield tail
@@ -14,6 +14,7 @@
 #    under the License.
 
 import abc
+import copy
 import os
 import re
 import six
@@ -78,6 +79,8 @@ class ConfigurationManager(object):
         self._codec = codec
         self._requires_root = requires_root
         self._value_cache = None
+        # The parsed base configuration file and the stat key it was read at.
+        self._base_cache = None
 
         if not override_strategy:
             # Use OneFile strategy by default. Store the revisions in a
@@ -107,15 +110,30 @@ class ConfigurationManager(object):
         :returns:        Configuration file as a Python dict.
         """
 
-        base_options = operating_system.read_file(
-            self._base_config_path, codec=self._codec,
-            as_root=self._requires_root)
+        base_options = self._read_base_configuration()
 
         updates = self._override_strategy.parse_updates()
         guestagent_utils.update_dict(updates, base_options)
 
         return base_options
 
+    def _read_base_configuration(self):
+        """Return the parsed base configuration file, reading it only if it
+        changed since it was last read.
+        """
+        key = _stat_key(self._base_config_path)
+        if key is None:
+            return operating_system.read_file(
+                self._base_config_path, codec=self._codec,
+                as_root=self._requires_root)
+
+        if self._base_cache is None or self._base_cache[0] != key:
+            self._base_cache = (key, operating_system.read_file(
+                self._base_config_path, codec=self._codec,
+                as_root=self._requires_root))
+
+        return copy.deepcopy(self._base_cache[1])
+
     def save_configuration(self, options):
         """Write given contents to the base configuration file.
         Remove all existing overrides (both system and user).
@@ -130,6 +148,7 @@ class ConfigurationManager(object):
             self._override_strategy.remove(self.USER_GROUP)
             self._override_strategy.remove(self.SYSTEM_GROUP)
 
+            self._base_cache = None
             operating_system.write_file(
                 self._base_config_path, options, as_root=self._requires_root)
             operating_system.chown(
@@ -294,6 +313,12 @@ class ImportOverrideStrategy(ConfigurationOverrideStrategy):
         """
         self._revision_dir = revision_dir
         self._revision_ext = revision_ext
+        # The revision files, mapped to their parsed contents once read, and
+        # the stat key of the revision directory they were listed at.
+        self._revision_index = None
+        self._revision_index_key = None
+        # All revisions merged, as returned by parse_updates().
+        self._updates_cache = None
 
     def configure(self, base_config_path, owner, group, codec, requires_root):
         """
@@ -338,8 +363,7 @@ class ImportOverrideStrategy(ConfigurationOverrideStrategy):
                 self._revision_ext)
         else:
             # Update the existing file.
-            current = operating_system.read_file(
-                revision_file, codec=self._codec, as_root=self._requires_root)
+            current = copy.deepcopy(self._read_revision_file(revision_file))
             options = guestagent_utils.update_dict(options, current)
 
         operating_system.write_file(
@@ -351,6 +375,11 @@ class ImportOverrideStrategy(ConfigurationOverrideStrategy):
         operating_system.chmod(
             revision_file, FileMode.ADD_READ_ALL, as_root=self._requires_root)
 
+        # Keep the contents as they would be read back from the file.
+        self._get_revision_index()[revision_file] = self._codec.deserialize(
+            self._codec.serialize(options))
+        self._revision_dir_changed()
+
     def _initialize_import_directory(self):
         """Lazy-initialize the directory for imported revision files.
         """
@@ -370,34 +399,78 @@ class ImportOverrideStrategy(ConfigurationOverrideStrategy):
             # Remove the entire group.
             removed = self._collect_revision_files(group_name)
 
+        index = self._get_revision_index()
         for path in removed:
             operating_system.remove(path, force=True,
                                     as_root=self._requires_root)
+            index.pop(path, None)
+        if removed:
+            self._revision_dir_changed()
 
     def get(self, group_name, change_id):
         revision_file = self._find_revision_file(group_name, change_id)
+        if revision_file is not None:
+            return copy.deepcopy(self._read_revision_file(revision_file))
 
         return operating_system.read_file(revision_file,
                                           codec=self._codec,
                                           as_root=self._requires_root)
 
     def parse_updates(self):
-        parsed_options = {}
-        for path in self._collect_revision_files():
-            options = operating_system.read_file(path, codec=self._codec,
-                                                 as_root=self._requires_root)
-            guestagent_utils.update_dict(options, parsed_options)
+        self._get_revision_index()
+        if self._updates_cache is None:
+            parsed_options = {}
+            for path in self._collect_revision_files():
+                options = copy.deepcopy(self._read_revision_file(path))
+                guestagent_utils.update_dict(options, parsed_options)
+            self._updates_cache = parsed_options
 
-        return parsed_options
+        return copy.deepcopy(self._updates_cache)
 
     @property
     def has_revisions(self):
         """Return True if there currently are any revision files.
         """
-        return (operating_system.exists(
-            self._revision_dir, is_directory=True,
-            as_root=self._requires_root) and
-            (len(self._collect_revision_files()) > 0))
+        return len(self._get_revision_index()) > 0
+
+    def _get_revision_index(self):
+        """Return the revision files mapped to their parsed contents (None
+        until read).
+        The directory is listed again only if its modification time or inode
+        changed since it was last listed (or changed by this strategy).
+        """
+        key = _stat_key(self._revision_dir)
+        if (self._revision_index is None or key is None or
+                key != self._revision_index_key):
+            if key is None and not operating_system.exists(
+                    self._revision_dir, is_directory=True,
+                    as_root=self._requires_root):
+                files = []
+            else:
+                files = operating_system.list_files_in_directory(
+                    self._revision_dir, recursive=True,
+                    pattern=self._build_rev_name_pattern(),
+                    as_root=self._requires_root)
+            self._revision_index = dict.fromkeys(files)
+            self._revision_index_key = key
+            self._updates_cache = None
+
+        return self._revision_index
+
+    def _revision_dir_changed(self):
+        """Account for the changes made to the revision directory by this
+        strategy, which are already reflected in the index.
+        """
+        self._revision_index_key = _stat_key(self._revision_dir)
+        self._updates_cache = None
+
+    def _read_revision_file(self, path):
+        index = self._get_revision_index()
+        if index.get(path) is None:
+            index[path] = operating_system.read_file(
+                path, codec=self._codec, as_root=self._requires_root)
+
+        return index[path]
 
     def _get_last_file_index(self, group_name):
         """Get the index of the most current file in a given group.
@@ -412,21 +485,17 @@ class ImportOverrideStrategy(ConfigurationOverrideStrategy):
 
         return 0
 
-    def _collect_revision_files(self, group_name='.+'):
+    def _collect_revision_files(self, group_name='.+', change_id='.+'):
         """Collect and return a sorted list of paths to existing revision
         files. The files should be sorted in the same order in which
         they were applied.
         """
-        name_pattern = self._build_rev_name_pattern(group_name=group_name)
-        return sorted(operating_system.list_files_in_directory(
-            self._revision_dir, recursive=True, pattern=name_pattern,
-            as_root=self._requires_root))
+        name_pattern = self._build_rev_name_pattern(group_name, change_id)
+        return sorted(path for path in self._get_revision_index()
+                      if re.match(name_pattern, os.path.basename(path)))
 
     def _find_revision_file(self, group_name, change_id):
-        name_pattern = self._build_rev_name_pattern(group_name, change_id)
-        found = operating_system.list_files_in_directory(
-            self._revision_dir, recursive=True, pattern=name_pattern,
-            as_root=self._requires_root)
+        found = self._collect_revision_files(group_name, change_id)
         return next(iter(found), None)
 
     def _build_rev_name_pattern(self, group_name='.+', change_id='.+'):
@@ -527,3 +596,16 @@ class OneFileOverrideStrategy(ConfigurationOverrideStrategy):
         operating_system.write_file(
             self._base_config_path, updated_revision, codec=self._codec,
             as_root=self._requires_root)
+
+
+def _stat_key(path):
+    """Return the inode, modification time and size of a given path, which
+    change whenever the file (or the entries of the directory) change,
+    or None if the path cannot be stat'ed.
+    """
+    try:
+        stats = os.stat(path)
+    except OSError:
+        return None
+
+    return stats.st_ino, stats.st_mtime, stats.st_size
@@ -33,11 +33,17 @@ except ImportError:
 
 from functools import reduce
 from oslo_concurrency.processutils import UnknownArgumentError
+from oslo_log import log as logging
 
+from trove.common import cfg
 from trove.common import exception
 from trove.common.i18n import _
 from trove.common.stream_codecs import IdentityCodec
 from trove.common import utils
+from trove.guestagent.common import root_helper
+
+CONF = cfg.CONF
+LOG = logging.getLogger(__name__)
 
 REDHAT = 'redhat'
 DEBIAN = 'debian'
@@ -105,6 +111,10 @@ def exists(path, is_directory=False, as_root=False):
     # Only check as root if we can't see it as the regular user, since
     # this is more expensive
     if not found and as_root:
+        done, found = _call_root_helper('exists', path=path,
+                                        is_directory=is_directory)
+        if done:
+            return found
         test_flag = '-d' if is_directory else '-f'
         cmd = 'test %s %s && echo 1 || echo 0' % (test_flag, path)
         stdout, _ = utils.execute_with_timeout(
@@ -127,6 +137,13 @@ def _read_file_as_root(path, codec, decode=True):
     :param decode:             Should the codec decode the data.
     :type decode:              boolean
     """
+    done, data = _call_root_helper('read_file', path=path)
+    if done:
+        data = root_helper.decode(data)
+        if decode:
+            return codec.deserialize(data)
+        return codec.serialize(data)
+
     with tempfile.NamedTemporaryFile() as fp:
         copy(path, fp.name, force=True, dereference=True, as_root=True)
         chmod(fp.name, FileMode.ADD_READ_ALL(), as_root=True)
@@ -187,6 +204,14 @@ def _write_file_as_root(path, data, codec, encode=True):
     :param encode:             Should the codec encode the data.
     :type encode:              boolean
     """
+    if CONF.root_helper_daemon:
+        contents = (codec.serialize(data) if encode
+                    else codec.deserialize(data))
+        done, _result = _call_root_helper(
+            'write_file', path=path, data=root_helper.encode(contents))
+        if done:
+            return
+
     # The files gets removed automatically once the managing object goes
     # out of scope.
     with tempfile.NamedTemporaryFile('w', delete=False) as fp:
@@ -548,6 +573,12 @@ def chown(path, user, group, recursive=True, force=False, **kwargs):
         raise exception.UnprocessableEntity(
             _("Please specify owner or group, or both."))
 
+    done, _result = _call_root_helper(
+        'chown', kwargs, path=path, user=user, group=group,
+        recursive=recursive, force=force)
+    if done:
+        return
+
     owner_group_modifier = _build_user_group_pair(user, group)
     options = (('f', force), ('R', recursive))
     _execute_shell_cmd('chown', options, owner_group_modifier, path, **kwargs)
@@ -597,8 +628,18 @@ def chmod(path, mode, recursive=True, force=False, **kwargs):
     """
 
     if path:
-        options = (('f', force), ('R', recursive))
         shell_modes = _build_shell_chmod_mode(mode)
+        if inspect.ismethod(mode):
+            mode = mode()
+        done, _result = _call_root_helper(
+            'chmod', kwargs, path=path, reset=mode.get_reset_mode() or 0,
+            add=mode.get_add_mode() or 0,
+            remove=mode.get_remove_mode() or 0,
+            recursive=recursive, force=force)
+        if done:
+            return
+
+        options = (('f', force), ('R', recursive))
         _execute_shell_cmd('chmod', options, shell_modes, path, **kwargs)
     else:
         raise exception.UnprocessableEntity(
@@ -791,6 +832,12 @@ def list_files_in_directory(root_dir, recursive=False, pattern=None,
     :type include_dirs         boolean
     """
     if as_root:
+        done, files = _call_root_helper(
+            'list_files', root_dir=root_dir, recursive=recursive,
+            pattern=pattern, include_dirs=include_dirs)
+        if done:
+            return set(files)
+
         cmd_args = [root_dir, '-noleaf']
         if not recursive:
             cmd_args.extend(['-maxdepth', '0'])
@@ -809,6 +856,32 @@ def list_files_in_directory(root_dir, recursive=False, pattern=None,
             if not pattern or re.match(pattern, name)}
 
 
+def _call_root_helper(op, kwargs=None, **args):
+    """Run an operation in the root helper instead of a command with sudo.
+
+    :param kwargs:         The optional keyword arguments of the command
+                           (seealso:: _execute_shell_cmd), or None for
+                           an operation always run as root.
+    :type kwargs:          dict
+
+    :returns:              A pair (done, result). done is False if the
+                           command must be run with sudo instead.
+    """
+    if not CONF.root_helper_daemon:
+        return False, None
+    timeout = 30
+    if kwargs is not None:
+        if not kwargs.get('as_root') or set(kwargs) - {'as_root', 'timeout'}:
+            return False, None
+        timeout = kwargs.get('timeout', timeout)
+    try:
+        return True, root_helper.call(op, timeout=timeout, **args)
+    except exception.RootHelperError as e:
+        LOG.debug("Running %(op)s with sudo: %(error)s" %
+                  {'op': op, 'error': e})
+        return False, None
+
+
 def _execute_shell_cmd(cmd, options, *args, **kwargs):
     """Execute a given shell command passing it
     given options (flags) and arguments.
@@ -0,0 +1,348 @@
+# Copyright 2016 Tesora Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""A helper process running as root, which the guest agent asks over a unix
+socket to run the file operations it needs root for, instead of running a
+command with sudo for each of them.
+
+The agent starts the helper with sudo the first time it needs it:
+
+    sudo python -m trove.guestagent.common.root_helper --socket PATH --uid UID
+
+The helper only accepts connections from the given user (and root), and
+only runs the operations below. Requests and replies are JSON objects, one
+per line.
+"""
+
+import argparse
+import base64
+import grp
+import json
+import os
+import pwd
+import re
+import socket
+import stat
+import struct
+import sys
+import time
+
+from eventlet import pools
+from eventlet import semaphore
+from oslo_log import log as logging
+import six
+from six.moves import socketserver
+
+from trove.common import cfg
+from trove.common import exception
+from trove.common import utils
+
+LOG = logging.getLogger(__name__)
+CONF = cfg.CONF
+
+# Seconds to wait before trying to start a helper that failed to start.
+RETRY_INTERVAL = 60
+
+# Missing from the socket module of Python 2.
+SO_PEERCRED = getattr(socket, 'SO_PEERCRED', 17)
+
+OPERATIONS = {}
+
+
+def operation(func):
+    OPERATIONS[func.__name__] = func
+    return func
+
+
+@operation
+def exists(path, is_directory=False):
+    if is_directory:
+        return os.path.isdir(path)
+    return os.path.isfile(path)
+
+
+@operation
+def read_file(path):
+    with open(path, 'rb') as fp:
+        return base64.b64encode(fp.read()).decode('ascii')
+
+
+@operation
+def write_file(path, data):
+    # New files get the mode of the temporary files the agent used to copy
+    # into place as root.
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'wb') as fp:
+        fp.write(base64.b64decode(data))
+
+
+def _walk(path):
+    """Yield the paths in the tree of path, without following links, like
+    'chown -R' and 'chmod -R'.
+    """
+    if os.path.isdir(path):
+        for root, dirs, files in os.walk(path):
+            for name in dirs + files:
+                yield os.path.join(root, name)
+
+
+def _apply(func, path, recursive, force):
+    try:
+        func(path, True)
+        if recursive:
+            for child in _walk(path):
+                func(child, False)
+    except OSError:
+        if not force:
+            raise
+
+
+@operation
+def chown(path, user, group, recursive=True, force=False):
+    uid = gid = -1
+    if user:
+        # Like 'chown user: path', which also sets the login group of the
+        # user.
+        entry = pwd.getpwnam(user)
+        uid, gid = entry.pw_uid, entry.pw_gid
+    if group:
+        gid = grp.getgrnam(group).gr_gid
+
+    def change(path, top):
+        if top:
+            os.chown(path, uid, gid)
+        else:
+            os.lchown(path, uid, gid)
+    _apply(change, path, recursive, force)
+
+
+@operation
+def chmod(path, reset=0, add=0, remove=0, recursive=True, force=False):
+    def change(path, top):
+        if not top and os.path.islink(path):
+            return
+        mode = reset or stat.S_IMODE(os.stat(path).st_mode)
+        os.chmod(path, (mode | add) & ~remove)
+    _apply(change, path, recursive, force)
+
+
+@operation
+def list_files(root_dir, recursive=False, pattern=None, include_dirs=False):
+    # The same paths as the 'find' command the agent used to run.
+    paths = [root_dir]
+    if recursive:
+        paths.extend(_walk(root_dir))
+    if not include_dirs:
+        paths = [path for path in paths
+                 if stat.S_ISREG(os.lstat(path).st_mode)]
+    if pattern:
+        regex = re.compile(os.path.join('.*', pattern) + '$')
+        paths = [path for path in paths if regex.match(path)]
+    return paths
+
+
+class RootHelperHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        for line in iter(self.rfile.readline, b''):
+            try:
+                request = json.loads(line.decode('utf-8'))
+                if request.get('op') not in OPERATIONS:
+                    raise ValueError("Unknown operation %s." %
+                                     request.get('op'))
+                func = OPERATIONS[request['op']]
+                reply = {'result': func(**request.get('args', {}))}
+            except Exception as e:
+                reply = {'error': '%s: %s' % (type(e).__name__, e)}
+            self.wfile.write(json.dumps(reply).encode('utf-8') + b'\n')
+            self.wfile.flush()
+
+
+class RootHelperServer(socketserver.ThreadingUnixStreamServer):
+
+    daemon_threads = True
+
+    def __init__(self, socket_path, uid):
+        socketserver.ThreadingUnixStreamServer.__init__(
+            self, socket_path, RootHelperHandler)
+        self.uid = uid
+
+    def verify_request(self, request, client_address):
+        credentials = request.getsockopt(socket.SOL_SOCKET,
+                                         SO_PEERCRED,
+                                         struct.calcsize('3i'))
+        pid, uid, gid = struct.unpack('3i', credentials)
+        return uid in (self.uid, 0)
+
+
+def _daemonize():
+    if os.fork() > 0:
+        # Let sudo return once the socket is ready.
+        os._exit(0)
+    os.setsid()
+    devnull = os.open(os.devnull, os.O_RDWR)
+    for fd in (0, 1, 2):
+        os.dup2(devnull, fd)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--socket', required=True)
+    parser.add_argument('--uid', type=int, required=True)
+    args = parser.parse_args(argv)
+
+    directory = os.path.dirname(args.socket)
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    os.chown(directory, args.uid, -1)
+    os.chmod(directory, 0o700)
+    if os.path.exists(args.socket):
+        os.unlink(args.socket)
+    server = RootHelperServer(args.socket, args.uid)
+    os.chown(args.socket, args.uid, -1)
+    os.chmod(args.socket, 0o600)
+
+    _daemonize()
+    server.serve_forever()
+
+
+class _Connection(object):
+    """A connection to the root helper, opened when it is first used."""
+
+    def __init__(self):
+        self.socket = None
+        self.file = None
+
+    def open(self, sock):
+        self.socket = sock
+        self.file = sock.makefile('rwb')
+
+    def close(self):
+        if self.socket is not None:
+            for resource in (self.file, self.socket):
+                try:
+                    resource.close()
+                except Exception:
+                    pass
+            self.socket = None
+            self.file = None
+
+
+class RootHelperClient(object):
+    """Sends operations to the root helper over a pool of connections,
+    starting the helper if it is not running.
+
+    The helper serves each connection in its own thread, so greenthreads
+    holding different connections have their operations run concurrently.
+    """
+
+    def __init__(self, socket_path, size=None):
+        self.socket_path = socket_path
+        self._connections = pools.Pool(
+            max_size=size or CONF.root_helper_connections,
+            create=_Connection)
+        self._start_lock = semaphore.Semaphore()
+        self._retry_at = 0
+
+    def call(self, op, timeout=30, **args):
+        with self._connections.item() as connection:
+            try:
+                if connection.socket is None:
+                    connection.open(self._connect())
+                connection.socket.settimeout(timeout)
+                connection.file.write(json.dumps({'op': op, 'args': args})
+                                      .encode('utf-8') + b'\n')
+                connection.file.flush()
+                line = connection.file.readline()
+                if not line:
+                    raise IOError("Connection closed.")
+                reply = json.loads(line.decode('utf-8'))
+            except exception.RootHelperError:
+                raise
+            except Exception as e:
+                connection.close()
+                raise exception.RootHelperError(reason=e)
+        if 'error' in reply:
+            raise exception.RootHelperError(reason=reply['error'])
+        return reply['result']
+
+    def _connect(self):
+        try:
+            return self._open()
+        except socket.error:
+            pass
+        with self._start_lock:
+            try:
+                # Another greenthread may have started it in the meantime.
+                return self._open()
+            except socket.error:
+                if time.time() < self._retry_at:
+                    raise exception.RootHelperError(reason="Not running.")
+            self._retry_at = time.time() + RETRY_INTERVAL
+            LOG.info("Starting the root helper on %s." % self.socket_path)
+            utils.execute_with_timeout(
+                sys.executable, '-m', __name__, '--socket', self.socket_path,
+                '--uid', str(os.getuid()), run_as_root=True,
+                root_helper='sudo')
+            return self._open()
+
+    def _open(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(self.socket_path)
+        except socket.error:
+            sock.close()
+            raise
+        return sock
+
+    def close(self):
+        """Close the connections that are not in use."""
+        for connection in self._connections.free_items:
+            connection.close()
+
+
+_client = None
+
+
+def call(op, **args):
+    """Run an operation in the root helper and return its result.
+
+    :raises: :class:`RootHelperError` if the helper is disabled, cannot be
+             started, or the operation fails. Callers then run the command
+             they would have run with sudo.
+    """
+    global _client
+    if not CONF.root_helper_daemon:
+        raise exception.RootHelperError(reason="Disabled.")
+    if _client is None:
+        _client = RootHelperClient(CONF.root_helper_socket)
+    return _client.call(op, **args)
+
+
+def decode(data):
+    """Return the contents of a file read by the helper as a string."""
+    data = base64.b64decode(data)
+    return data.decode('utf-8') if six.PY3 else data
+
+
+def encode(data):
+    """Encode the contents of a file to be written by the helper."""
+    if isinstance(data, six.text_type):
+        data = data.encode('utf-8')
+    return base64.b64encode(data).decode('ascii')
+
+
+if __name__ == '__main__':
+    main()
@@ -565,6 +565,25 @@ class PgSqlApp(object):
                                     as_root=True)
 
 
+class PgSqlProbe(service.ConnectionProbe):
+    """Pings PostgreSQL over its local socket as the administrative user."""
+
+    def _connect(self):
+        timeout = CONF.status_probe_timeout
+        connection = psycopg2.connect(
+            user=PgSqlApp.ADMIN_USER, database=PgSqlApp.ADMIN_USER,
+            port=cfg.get_configuration_property('postgresql_port'),
+            # libpq waits at least 2 seconds.
+            connect_timeout=max(timeout, 2),
+            options='-c statement_timeout=%d' % (timeout * 1000))
+        connection.autocommit = True
+        return connection
+
+    def _ping(self, connection):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+
+
 class PgSqlAppStatus(service.BaseDbStatus):
 
     HOST = 'localhost'
@@ -572,8 +591,13 @@ class PgSqlAppStatus(service.BaseDbStatus):
     def __init__(self, tools_dir):
         super(PgSqlAppStatus, self).__init__()
         self._cmd = guestagent_utils.build_file_path(tools_dir, 'pg_isready')
+        self.probe = PgSqlProbe()
 
     def _get_actual_db_status(self):
+        if self.probe.ping():
+            return instance.ServiceStatuses.RUNNING
+        # The server could not be pinged over a connection, check it with
+        # pg_isready.
         try:
             utils.execute_with_timeout(
                 self._cmd, '-h', self.HOST, log_output_on_error=True)
@@ -249,6 +249,13 @@ class Manager(periodic_task.PeriodicTasks):
         LOG.debug("Update status called.")
         self.status.update()
 
+    def report_status(self, context):
+        """Report the status of the trove instance right away, after the
+        control plane changed it.
+        """
+        LOG.debug("Report status called.")
+        self.status.report_status()
+
     def rpc_ping(self, context):
         LOG.debug("Responding to RPC ping.")
         return True
@@ -25,6 +25,7 @@ import uuid
 
 from oslo_log import log as logging
 from oslo_utils import encodeutils
+import pymysql
 from six.moves import urllib
 import sqlalchemy
 from sqlalchemy import exc
@@ -135,8 +136,36 @@ def load_mysqld_options():
         return {}
 
 
+class MySqlProbe(service.ConnectionProbe):
+    """Pings MySQL over its local socket as the administrative user."""
+
+    DEFAULT_SOCKET = '/var/run/mysqld/mysqld.sock'
+
+    def __init__(self):
+        super(MySqlProbe, self).__init__()
+        self._socket = None
+
+    def _connect(self):
+        if self._socket is None:
+            self._socket = load_mysqld_options().get(
+                'socket', [self.DEFAULT_SOCKET])[0]
+        timeout = CONF.status_probe_timeout
+        return pymysql.connect(
+            unix_socket=self._socket, user=ADMIN_USER_NAME,
+            password=BaseMySqlApp.get_auth_password().strip(),
+            connect_timeout=timeout, read_timeout=timeout,
+            write_timeout=timeout)
+
+    def _ping(self, connection):
+        connection.ping(reconnect=False)
+
+
 class BaseMySqlAppStatus(service.BaseDbStatus):
 
+    def __init__(self):
+        super(BaseMySqlAppStatus, self).__init__()
+        self.probe = MySqlProbe()
+
     @classmethod
     def get(cls):
         if not cls._instance:
@@ -144,6 +173,11 @@ class BaseMySqlAppStatus(service.BaseDbStatus):
         return cls._instance
 
     def _get_actual_db_status(self):
+        if self.probe.ping():
+            LOG.info(_("MySQL Service Status is RUNNING."))
+            return rd_instance.ServiceStatuses.RUNNING
+        # The server could not be pinged over a connection, check it with
+        # the client and its processes.
         try:
             out, err = utils.execute_with_timeout(
                 "/usr/bin/mysqladmin",
@@ -228,23 +262,39 @@ class BaseMySqlAdmin(object):
     def mysql_app(self):
         return self._mysql_app
 
-    def _associate_dbs(self, user):
-        """Internal. Given a MySQLUser, populate its databases attribute."""
-        LOG.debug("Associating dbs to user %s at %s." %
-                  (user.name, user.host))
+    def _associate_dbs(self, *users):
+        """Internal. Given MySQLUsers, populate their databases attributes.
+        The database privileges of all the users are fetched in a single
+        query on mysql.db, through its index on User, rather than on
+        information_schema.SCHEMA_PRIVILEGES, which MySQL builds from all
+        the grants of the server for every query.
+        """
+        if not users:
+            return
+        grantees = {}
+        for user in users:
+            LOG.debug("Associating dbs to user %s at %s." %
+                      (user.name, user.host))
+            grantees[(user.name, user.host)] = user
+        params = dict(('user%d' % index, name) for index, name in
+                      enumerate(sorted(set(name for name, host in grantees))))
         with self.local_sql_client(self.mysql_app.get_engine()) as client:
             q = sql_query.Query()
-            q.columns = ["grantee", "table_schema"]
-            q.tables = ["information_schema.SCHEMA_PRIVILEGES"]
-            q.group = ["grantee", "table_schema"]
-            q.where = ["privilege_type != 'USAGE'"]
+            q.columns = ["User", "Host", "Db"]
+            q.tables = ["mysql.db"]
+            q.where = ["User IN (%s)" % ", ".join(
+                ":%s" % name for name in sorted(params))]
+            q.order = ["Db"]
             t = text(str(q))
-            db_result = client.execute(t)
+            db_result = client.execute(t, **params)
             for db in db_result:
                 LOG.debug("\t db: %s." % db)
-                if db['grantee'] == "'%s'@'%s'" % (user.name, user.host):
+                # The users of the page only share their names with users
+                # of other hosts.
+                user = grantees.get((db['User'], db['Host']))
+                if user is not None:
                     mysql_db = models.MySQLDatabase()
-                    mysql_db.name = db['table_schema']
+                    mysql_db.name = db['Db']
                     user.databases.append(mysql_db.serialize())
 
     def change_passwords(self, users):
@@ -523,9 +573,11 @@ class BaseMySqlAdmin(object):
                 mysql_user = models.MySQLUser()
                 mysql_user.name = row['User']
                 mysql_user.host = row['Host']
-                self._associate_dbs(mysql_user)
                 next_marker = row['Marker']
-                users.append(mysql_user.serialize())
+                users.append(mysql_user)
+            # Fetch the databases of the whole page at once.
+            self._associate_dbs(*users)
+            users = [user.serialize() for user in users]
         if limit is not None and result.rowcount <= limit:
             next_marker = None
         LOG.debug("users = " + str(users))
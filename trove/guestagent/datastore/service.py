@@ -17,6 +17,8 @@
 import os
 import time
 
+import eventlet
+from eventlet import semaphore
 from oslo_log import log as logging
 
 from trove.common import cfg
@@ -57,6 +59,15 @@ class BaseDbStatus(object):
 
     _instance = None
 
+    # Statuses the DB app is expected to leave soon, while it is starting,
+    # stopping or recovering. They are checked every
+    # status_transition_interval seconds instead of every report_interval.
+    TRANSITIONAL_STATUSES = [instance.ServiceStatuses.NEW,
+                             instance.ServiceStatuses.BUILDING,
+                             instance.ServiceStatuses.BLOCKED,
+                             instance.ServiceStatuses.PAUSED,
+                             instance.ServiceStatuses.CRASHED]
+
     GUESTAGENT_DIR = '~'
     PREPARE_START_FILENAME = '.guestagent.prepare.start'
     PREPARE_END_FILENAME = '.guestagent.prepare.end'
@@ -66,6 +77,10 @@ class BaseDbStatus(object):
             raise RuntimeError("Cannot instantiate twice.")
         self.status = None
         self.restart_mode = False
+        self.last_heartbeat = 0
+        self._report_due = False
+        self._next_update = None
+        self._transition = None
 
         self.__prepare_completed = None
 
@@ -167,6 +182,8 @@ class BaseDbStatus(object):
                 CONF.guest_id, heartbeat, sent=timeutils.float_utcnow())
             LOG.debug("Successfully cast set_status.")
             self.status = status
+            self.last_heartbeat = time.time()
+            self._report_due = False
         else:
             LOG.debug("Prepare has not completed yet, skipping heartbeat.")
 
@@ -177,12 +194,57 @@ class BaseDbStatus(object):
         if self.is_installed and not self._is_restarting:
             LOG.debug("Determining status of DB server.")
             status = self._get_actual_db_status()
-            self.set_status(status)
+            if (status == self.status and not self._report_due and
+                    not self._keepalive_due()):
+                LOG.debug("DB server status is still '%s', skipping "
+                          "heartbeat." % status.description)
+            else:
+                self.set_status(status)
+            if status in self.TRANSITIONAL_STATUSES:
+                if self._transition is None or self._transition[0] != status:
+                    self._transition = (status, time.time())
+                # Stop checking often a status the DB app does not leave,
+                # like a crashed server.
+                if (time.time() - self._transition[1] <
+                        CONF.state_change_wait_time):
+                    self._schedule_update()
+            else:
+                self._transition = None
         else:
             LOG.info(_("DB server is not installed or is in restart mode, so "
                        "for now we'll skip determining the status of DB on "
                        "this instance."))
 
+    def report_status(self):
+        """Send a heartbeat with the status of the DB app even if it did
+        not change, because the control plane overwrote the status it had
+        from the guest.
+        """
+        self._report_due = True
+        self.update()
+
+    def _keepalive_due(self):
+        """True if the conductor would not hear from the guest for more
+        than status_keepalive_interval seconds without a heartbeat now.
+        """
+        elapsed = time.time() - self.last_heartbeat
+        return (elapsed + CONF.report_interval >
+                CONF.status_keepalive_interval)
+
+    def _schedule_update(self):
+        interval = CONF.status_transition_interval
+        if (self._next_update is None and
+                0 < interval < CONF.report_interval):
+            self._next_update = eventlet.spawn_after(interval,
+                                                     self._scheduled_update)
+
+    def _scheduled_update(self):
+        self._next_update = None
+        try:
+            self.update()
+        except Exception:
+            LOG.exception(_("Error updating the status of the DB server."))
+
     def restart_db_service(self, service_candidates, timeout):
         """Restart the database.
         Do not change the service auto-start setting.
@@ -379,3 +441,72 @@ class BaseDbStatus(object):
         LOG.debug("Casting report_root message to conductor.")
         conductor_api.API(context).report_root(CONF.guest_id, user)
         LOG.debug("Successfully cast report_root.")
+
+
+class ConnectionProbe(object):
+    """Pings a local datastore over a connection kept open from one status
+    check to the next, instead of spawning a client for every check.
+
+    Subclasses open the connection, using status_probe_timeout as their
+    timeouts, and ping the datastore over it. The latency of the pings is
+    kept for stats().
+    """
+
+    def __init__(self):
+        self._connection = None
+        self._lock = semaphore.Semaphore()
+        self.pings = 0
+        self.failures = 0
+        self.last_latency = 0.0
+        self.max_latency = 0.0
+
+    def _connect(self):
+        raise NotImplementedError()
+
+    def _ping(self, connection):
+        raise NotImplementedError()
+
+    def ping(self):
+        """Return True if the datastore answered, or False if it could not
+        be pinged over a connection.
+        """
+        with self._lock:
+            started = time.time()
+            try:
+                if self._connection is not None:
+                    try:
+                        self._ping(self._connection)
+                    except Exception:
+                        # The datastore may have restarted since the last
+                        # ping, try again over a new connection.
+                        self.close()
+                if self._connection is None:
+                    self._connection = self._connect()
+                    self._ping(self._connection)
+            except Exception as e:
+                self.close()
+                self.failures += 1
+                LOG.debug("Could not ping the datastore: %s" % e)
+                return False
+            latency = time.time() - started
+            self.pings += 1
+            self.last_latency = latency
+            self.max_latency = max(self.max_latency, latency)
+            LOG.debug("Pinged the datastore in %.3fs." % latency)
+            return True
+
+    def close(self):
+        if self._connection is not None:
+            try:
+                self._connection.close()
+            except Exception:
+                pass
+            self._connection = None
+
+    def stats(self):
+        return {
+            'pings': self.pings,
+            'failures': self.failures,
+            'last_latency': round(self.last_latency, 3),
+            'max_latency': round(self.max_latency, 3),
+        }
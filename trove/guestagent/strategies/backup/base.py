@@ -21,6 +21,7 @@ from oslo_log import log as logging
 from eventlet.green import subprocess
 from trove.common import cfg, utils
 from trove.common.strategies.strategy import Strategy
+from trove.guestagent.common import backup_codec
 
 CONF = cfg.CONF
 
@@ -50,6 +51,12 @@ class BackupRunner(Strategy):
         self.base_filename = filename
         self.process = None
         self.pid = None
+        self.codec = backup_codec.StreamCodec.from_config()
+        self.encoder = None
+        if self.codec:
+            # The stream is compressed and encrypted in-process instead.
+            self.is_zipped = False
+            self.is_encrypted = False
         kwargs.update({'filename': filename})
         self.command = self.cmd % kwargs
         super(BackupRunner, self).__init__()
@@ -65,6 +72,8 @@ class BackupRunner(Strategy):
                                         stderr=subprocess.PIPE,
                                         preexec_fn=os.setsid)
         self.pid = self.process.pid
+        if self.codec:
+            self.encoder = self.codec.encoder(self.process.stdout)
 
     def __enter__(self):
         """Start up the process."""
@@ -107,6 +116,8 @@ class BackupRunner(Strategy):
 
     @property
     def manifest(self):
+        if self.codec:
+            return "%s%s" % (self.filename, self.codec.extension)
         return "%s%s%s" % (self.filename,
                            self.zip_manifest,
                            self.encrypt_manifest)
@@ -133,6 +144,8 @@ class BackupRunner(Strategy):
         return True
 
     def read(self, chunk_size):
+        if self.encoder:
+            return self.encoder.read(chunk_size)
         return self.process.stdout.read(chunk_size)
 
     def _run_pre_backup(self):
@@ -14,12 +14,21 @@
 #    under the License.
 #
 
+import sys
+import time
+
+import eventlet
+from eventlet import event
 from eventlet.green import subprocess
+from eventlet import queue
 from oslo_log import log as logging
+import six
 
 from trove.common import cfg
+from trove.common.i18n import _
 from trove.common.strategies.strategy import Strategy
 from trove.common import utils
+from trove.guestagent.common import backup_codec
 
 LOG = logging.getLogger(__name__)
 CONF = cfg.CONF
@@ -33,6 +42,123 @@ class RestoreError(Exception):
     """Error running the Backup Command."""
 
 
+class RestorePipeline(object):
+    """Feed a backup stream to a restore process.
+
+    A greenthread downloads the stream into a queue while the chunks are
+    written to the restore process, so reading from storage overlaps with
+    the restore process writing to disk, and at most restore_buffer_size
+    bytes (or a single larger chunk) are held in memory. Writes are
+    throttled to restore_rate_limit bytes per second and progress is logged
+    every backup_progress_interval seconds.
+    """
+
+    def __init__(self, stream, buffer_size=None, rate_limit=None,
+                 interval=None):
+        self.stream = stream
+        self.buffer_size = (CONF.restore_buffer_size
+                            if buffer_size is None else buffer_size)
+        self.rate_limit = (CONF.restore_rate_limit
+                           if rate_limit is None else rate_limit)
+        self.interval = (CONF.backup_progress_interval
+                         if interval is None else interval)
+        # The download blocks on the bytes in the queue rather than on the
+        # number of chunks, which the storage may return in any size.
+        self.queue = queue.Queue()
+        self.queued_bytes = 0
+        self._drained = None
+        self.bytes_read = 0
+        self.bytes_written = 0
+        # Time the download spent waiting for the restore process, and the
+        # restore process spent waiting for the download.
+        self.download_wait = 0.0
+        self.write_wait = 0.0
+        self._exc_info = None
+
+    def _download(self):
+        try:
+            for chunk in self.stream:
+                self.bytes_read += len(chunk)
+                started = time.time()
+                # Blocks while the queued chunks would exceed the buffer.
+                # A chunk larger than the buffer is queued on its own.
+                while (self.queued_bytes and self.queued_bytes + len(chunk) >
+                       self.buffer_size):
+                    self._drained = event.Event()
+                    self._drained.wait()
+                self.download_wait += time.time() - started
+                self.queued_bytes += len(chunk)
+                self.queue.put(chunk)
+        except Exception:
+            self._exc_info = sys.exc_info()
+        finally:
+            # The queue is not bounded, so this does not block even when
+            # the download is killed.
+            self.queue.put(None)
+
+    def _get(self):
+        chunk = self.queue.get()
+        if chunk is not None:
+            self.queued_bytes -= len(chunk)
+            if self._drained is not None:
+                drained, self._drained = self._drained, None
+                drained.send()
+        return chunk
+
+    def _throttle(self, started):
+        if self.rate_limit:
+            delay = (started + float(self.bytes_written) / self.rate_limit -
+                     time.time())
+            if delay > 0:
+                eventlet.sleep(delay)
+
+    def _report(self, started, now):
+        elapsed = max(now - started, 0.001)
+        LOG.info(_("Restored %(bytes)s bytes in %(elapsed).1fs "
+                   "(%(rate)d bytes/s); %(download_wait).1fs waiting on "
+                   "the restore process, %(write_wait).1fs waiting on "
+                   "storage.")
+                 % {'bytes': self.bytes_written, 'elapsed': elapsed,
+                    'rate': self.bytes_written / elapsed,
+                    'download_wait': self.download_wait,
+                    'write_wait': self.write_wait})
+
+    def feed(self, output):
+        """Write the stream to output and return the number of bytes."""
+        started = last_report = time.time()
+        downloader = eventlet.spawn(self._download)
+        try:
+            while True:
+                waiting = time.time()
+                chunk = self._get()
+                self.write_wait += time.time() - waiting
+                if chunk is None:
+                    break
+                output.write(chunk)
+                self.bytes_written += len(chunk)
+                self._throttle(started)
+                now = time.time()
+                if self.interval and now - last_report >= self.interval:
+                    last_report = now
+                    self._report(started, now)
+        finally:
+            # Stop downloading if the restore process failed.
+            downloader.kill()
+            self._close()
+        if self._exc_info:
+            six.reraise(*self._exc_info)
+        self._report(started, time.time())
+        return self.bytes_written
+
+    def _close(self):
+        close = getattr(self.stream, 'close', None)
+        if close is not None:
+            try:
+                close()
+            except Exception:
+                LOG.exception(_("Error closing the backup stream."))
+
+
 class RestoreRunner(Strategy):
     """Base class for Restore Strategy implementations."""
     """Restore a database from a previous backup."""
@@ -56,11 +182,34 @@ class RestoreRunner(Strategy):
         self.location = kwargs.pop('location')
         self.checksum = kwargs.pop('checksum')
         self.restore_location = kwargs.get('restore_location')
-        self.restore_cmd = (self.decrypt_cmd +
-                            self.unzip_cmd +
-                            (self.base_restore_cmd % kwargs))
+        # The codec of the backup to restore. The parents of an incremental
+        # backup may have been written with another codec, or none.
+        self.codec = self.stream_codec(kwargs.pop('metadata', None))
+        self._restore_args = kwargs
+        self.restore_cmd = self._build_restore_cmd(self.codec)
         super(RestoreRunner, self).__init__()
 
+    def stream_codec(self, metadata):
+        """Return the codec a backup was written with, according to its
+        metadata, or None if it was compressed and encrypted by the shell.
+        """
+        return backup_codec.StreamCodec.from_metadata(metadata or {},
+                                                      self.decrypt_key)
+
+    def _build_restore_cmd(self, codec):
+        """Return the restore command for a backup written with codec."""
+        return self._decode_cmd(codec) + (self.base_restore_cmd %
+                                          self._restore_args)
+
+    def _decode_cmd(self, codec):
+        """Return the shell stages decoding a backup. There are none if the
+        backup was written with a codec, which decodes it in-process before
+        it is fed to the restore command.
+        """
+        if codec:
+            return ''
+        return self.decrypt_cmd + self.unzip_cmd
+
     def pre_restore(self):
         """Hook that is called before the restore command."""
         pass
@@ -80,17 +229,21 @@ class RestoreRunner(Strategy):
         return content_length
 
     def _run_restore(self):
-        return self._unpack(self.location, self.checksum, self.restore_cmd)
+        return self._unpack(self.location, self.checksum, self.restore_cmd,
+                            self.codec)
 
-    def _unpack(self, location, checksum, command):
+    def _load_stream(self, location, checksum, codec):
         stream = self.storage.load(location, checksum)
+        if codec:
+            stream = codec.decode(stream)
+        return stream
+
+    def _unpack(self, location, checksum, command, codec):
+        stream = self._load_stream(location, checksum, codec)
         process = subprocess.Popen(command, shell=True,
                                    stdin=subprocess.PIPE,
                                    stderr=subprocess.PIPE)
-        content_length = 0
-        for chunk in stream:
-            process.stdin.write(chunk)
-            content_length += len(chunk)
+        content_length = RestorePipeline(stream).feed(process.stdin)
         process.stdin.close()
         utils.raise_if_process_errored(process, RestoreError)
         if not self.check_process():
@@ -59,14 +59,11 @@ class PgDump(base.RestoreRunner):
         # Message 'ERROR:  role "postgres" already exists'
         # is expected and does not pose any problems to the restore operation.
 
-        stream = self.storage.load(self.location, self.checksum)
+        stream = self._load_stream(self.location, self.checksum, self.codec)
         process = subprocess.Popen(self.restore_cmd, shell=True,
                                    stdin=subprocess.PIPE,
                                    stderr=subprocess.PIPE)
-        content_length = 0
-        for chunk in stream:
-            process.stdin.write(chunk)
-            content_length += len(chunk)
+        content_length = base.RestorePipeline(stream).feed(process.stdin)
         process.stdin.close()
         self._handle_errors(process)
         LOG.info(_("Restored %s bytes from stream.") % content_length)
@@ -167,12 +164,12 @@ class PgBaseBackupIncremental(PgBaseBackup):
     def post_restore(self):
         self.write_recovery_file(restore=True)
 
-    def _incremental_restore_cmd(self, incr=False):
+    def _incremental_restore_cmd(self, incr=False, codec=None):
         args = {'restore_location': self.restore_location}
         cmd = self.base_restore_cmd
         if incr:
             cmd = self.incr_restore_cmd
-        return self.decrypt_cmd + self.unzip_cmd + (cmd % args)
+        return self._decode_cmd(codec) + (cmd % args)
 
     def _incremental_restore(self, location, checksum):
 
@@ -182,16 +179,20 @@ class PgBaseBackupIncremental(PgBaseBackup):
             parent_location = metadata['parent_location']
             parent_checksum = metadata['parent_checksum']
             self._incremental_restore(parent_location, parent_checksum)
-            cmd = self._incremental_restore_cmd(incr=True)
-            self.content_length += self._unpack(location, checksum, cmd)
+            codec = self.stream_codec(metadata)
+            cmd = self._incremental_restore_cmd(incr=True, codec=codec)
+            self.content_length += self._unpack(location, checksum, cmd,
+                                                codec)
 
         else:
             # For the parent base backup, revert to the default restore cmd
             LOG.info(_("Recursed back to full backup."))
 
             super(PgBaseBackupIncremental, self).pre_restore()
-            cmd = self._incremental_restore_cmd(incr=False)
-            self.content_length += self._unpack(location, checksum, cmd)
+            codec = self.stream_codec(metadata)
+            cmd = self._incremental_restore_cmd(incr=False, codec=codec)
+            self.content_length += self._unpack(location, checksum, cmd,
+                                                codec)
 
             operating_system.chmod(self.app.pgsql_data_dir,
                                    FileMode.SET_USR_RWX(),
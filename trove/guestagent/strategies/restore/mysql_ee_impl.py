@@ -76,19 +76,25 @@ class MySqlBackup(mysql_restore.InnoBackupEx):
     def __init__(self, *args, **kwargs):
         self._app = None
         super(MySqlBackup, self).__init__(*args, **kwargs)
-        self.decrypt_param = (' --decrypt --key=%s' % BACKUP_KEY
-                              if self.is_encrypted else '')
-        self.uncompress_param = (' --uncompress' if self.is_zipped else '')
-        self.restore_cmd = (('sudo mysqlbackup --backup-image=-'
-                             ' --backup-dir=%(bkp_dir)s'
-                             ' --datadir=%(data_dir)s' +
-                             self.uncompress_param +
-                             self.decrypt_param +
-                             ' copy-back-and-apply-log'
-                             ' 2>%(restore_log)s') %
-                            {'bkp_dir': MYSQL_BACKUP_DIR,
-                             'data_dir': MYSQL_DATA_DIR,
-                             'restore_log': RESTORE_LOG})
+
+    def _decrypt_param(self, codec):
+        # A backup written with a codec is decrypted in-process.
+        return (' --decrypt --key=%s' % BACKUP_KEY
+                if self.is_encrypted and not codec else '')
+
+    def _build_restore_cmd(self, codec):
+        uncompress_param = (' --uncompress'
+                            if self.is_zipped and not codec else '')
+        return (('sudo mysqlbackup --backup-image=-'
+                 ' --backup-dir=%(bkp_dir)s'
+                 ' --datadir=%(data_dir)s' +
+                 uncompress_param +
+                 self._decrypt_param(codec) +
+                 ' copy-back-and-apply-log'
+                 ' 2>%(restore_log)s') %
+                {'bkp_dir': MYSQL_BACKUP_DIR,
+                 'data_dir': MYSQL_DATA_DIR,
+                 'restore_log': RESTORE_LOG})
 
     def check_process(self):
         """Check the output from mysqlbackup for 'completed OK!'."""
@@ -123,18 +129,18 @@ class MySqlBackupIncremental(mysql_restore.InnoBackupExIncremental,
     def __init__(self, *args, **kwargs):
         super(MySqlBackupIncremental, self).__init__(*args, **kwargs)
 
-    def _incremental_restore_cmd(self, incremental_dir):
+    def _incremental_restore_cmd(self, incremental_dir, codec=None):
         """Return a command for a restore with a incremental location."""
         cmd = (('sudo mysqlbackup --backup-image=-'
                 ' --incremental --incremental-backup-dir=%(bkp_dir)s'
                 ' --datadir=%(data_dir)s' +
-                self.decrypt_param +
+                self._decrypt_param(codec) +
                 ' copy-back-and-apply-log'
                 ' 2>%(restore_log)s') %
                {'bkp_dir': incremental_dir,
                 'data_dir': MYSQL_DATA_DIR,
                 'restore_log': RESTORE_LOG})
-        return self.unzip_cmd + cmd
+        return ('' if codec else self.unzip_cmd) + cmd
 
     def _incremental_prepare(self, incremental_dir):
         pass
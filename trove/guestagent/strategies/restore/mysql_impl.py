@@ -20,6 +20,7 @@ import os
 import re
 import tempfile
 
+import eventlet
 from oslo_log import log as logging
 import pexpect
 
@@ -32,6 +33,7 @@ from trove.guestagent.common.operating_system import FileMode
 import trove.guestagent.datastore.mysql.service as dbaas
 from trove.guestagent.strategies.restore import base
 
+CONF = cfg.CONF
 LOG = logging.getLogger(__name__)
 
 
@@ -258,11 +260,10 @@ class InnoBackupExIncremental(InnoBackupEx):
         self.restore_location = kwargs.get('restore_location')
         self.content_length = 0
 
-    def _incremental_restore_cmd(self, incremental_dir):
+    def _incremental_restore_cmd(self, incremental_dir, codec=None):
         """Return a command for a restore with a incremental location."""
         args = {'restore_location': incremental_dir}
-        return (self.decrypt_cmd +
-                self.unzip_cmd +
+        return (self._decode_cmd(codec) +
                 (self.base_restore_cmd % args))
 
     def _incremental_prepare_cmd(self, incremental_dir):
@@ -284,43 +285,76 @@ class InnoBackupExIncremental(InnoBackupEx):
         utils.execute(prepare_cmd, shell=True)
         LOG.info(_("Innobackupex prepare finished successfully."))
 
-    def _incremental_restore(self, location, checksum):
-        """Recursively apply backups from all parents.
-
-        If we are the parent then we restore to the restore_location and
-        we apply the logs to the restore_location only.
+    def _backup_chain(self, location, checksum):
+        """Return the backups to restore, starting with the full backup.
 
-        Otherwise if we are an incremental we restore to a subfolder to
-        prevent stomping on the full restore data. Then we run apply log
-        with the '--incremental-dir' flag
+        Each incremental backup only records its parent, so the chain is
+        resolved with one metadata request per backup, before anything is
+        downloaded.
         """
-        metadata = self.storage.load_metadata(location, checksum)
-        incremental_dir = None
-        if 'parent_location' in metadata:
-            LOG.info(_("Restoring parent: %(parent_location)s"
+        chain = []
+        while True:
+            metadata = self.storage.load_metadata(location, checksum)
+            chain.append((location, checksum, metadata))
+            if 'parent_location' not in metadata:
+                break
+            LOG.info(_("Found parent: %(parent_location)s"
                        " checksum: %(parent_checksum)s.") % metadata)
-            parent_location = metadata['parent_location']
-            parent_checksum = metadata['parent_checksum']
-            # Restore parents recursively so backup are applied sequentially
-            self._incremental_restore(parent_location, parent_checksum)
-            # for *this* backup set the incremental_dir
-            # just use the checksum for the incremental path as it is
-            # sufficiently unique /var/lib/mysql/<checksum>
-            incremental_dir = os.path.join(
-                cfg.get_configuration_property('mount_point'), checksum)
+            location = metadata['parent_location']
+            checksum = metadata['parent_checksum']
+        chain.reverse()
+        return chain
+
+    def _unpack_backup(self, backup):
+        """Download and extract one backup of the chain."""
+        location, checksum, incremental_dir, codec = backup
+        # Each backup of the chain is decoded according to its own metadata,
+        # as the codec may have been changed between backups.
+        if incremental_dir:
             operating_system.create_directory(incremental_dir, as_root=True)
-            command = self._incremental_restore_cmd(incremental_dir)
+            command = self._incremental_restore_cmd(incremental_dir, codec)
         else:
             # The parent (full backup) use the same command from InnobackupEx
             # super class and do not set an incremental_dir.
-            command = self.restore_cmd
-
-        self.content_length += self._unpack(location, checksum, command)
-        self._incremental_prepare(incremental_dir)
+            command = self._build_restore_cmd(codec)
+        # Other backups are extracted concurrently, so only update the
+        # total once the download has finished.
+        content_length = self._unpack(location, checksum, command, codec)
+        self.content_length += content_length
+        return incremental_dir
 
-        # Delete unpacked incremental backup metadata
-        if incremental_dir:
-            operating_system.remove(incremental_dir, force=True, as_root=True)
+    def _incremental_restore(self, location, checksum):
+        """Restore the full backup and apply all the incremental backups.
+
+        The full backup is restored to the restore_location and every
+        incremental to a subfolder, to prevent stomping on the full restore
+        data. Up to restore_incremental_concurrency backups are downloaded
+        and extracted at the same time, while the logs are applied strictly
+        in order: to the restore_location for the full backup, then with
+        the '--incremental-dir' flag for each incremental.
+        """
+        backups = []
+        for location, checksum, metadata in self._backup_chain(location,
+                                                               checksum):
+            incremental_dir = None
+            if 'parent_location' in metadata:
+                # just use the checksum for the incremental path as it is
+                # sufficiently unique /var/lib/mysql/<checksum>
+                incremental_dir = os.path.join(
+                    cfg.get_configuration_property('mount_point'), checksum)
+            backups.append((location, checksum, incremental_dir,
+                            self.stream_codec(metadata)))
+
+        pool = eventlet.GreenPool(CONF.restore_incremental_concurrency)
+        # imap returns the backups in order as soon as they are extracted,
+        # while the following ones are still downloading.
+        for incremental_dir in pool.imap(self._unpack_backup, backups):
+            self._incremental_prepare(incremental_dir)
+
+            # Delete unpacked incremental backup metadata
+            if incremental_dir:
+                operating_system.remove(incremental_dir, force=True,
+                                        as_root=True)
 
     def _run_restore(self):
         """Run incremental restore.
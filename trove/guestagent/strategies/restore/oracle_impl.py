@@ -122,7 +122,8 @@ class RmanBackup(base.RestoreRunner):
 
     def _unpack_backup_files(self, location, checksum):
         LOG.debug("Restoring full backup files.")
-        self.content_length = self._unpack(location, checksum, self.restore_cmd)
+        self.content_length = self._unpack(location, checksum,
+                                           self.restore_cmd, self.codec)
 
     def _run_restore(self):
         metadata = self.storage.load_metadata(self.location, self.checksum)
@@ -194,5 +195,7 @@ class RmanBackupIncremental(RmanBackup):
             parent_checksum = metadata['parent_checksum']
             self._unpack_backup_files(parent_location, parent_checksum)
 
+        codec = self.stream_codec(metadata)
         self.content_length += self._unpack(location, checksum,
-                                            self.restore_cmd)
+                                            self._build_restore_cmd(codec),
+                                            codec)
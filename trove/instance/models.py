@@ -15,18 +15,23 @@
 #    under the License.
 
 """Model classes that form the core of instances functionality."""
+import collections
 from datetime import datetime
 from datetime import timedelta
+import functools
 import os.path
 import re
 
+import eventlet
 from novaclient import exceptions as nova_exceptions
 from oslo_config.cfg import NoSuchOptError
 from oslo_log import log as logging
 
 from trove.backup.models import Backup
+from trove.common import cache
 from trove.common import cfg
 from trove.common import exception
+from trove.common import fanout
 from trove.common.i18n import _, _LE, _LI, _LW
 import trove.common.instance as tr_instance
 from trove.common.notification import StartNotification
@@ -90,6 +95,36 @@ def load_server(context, instance_id, server_id, region_name):
     return server
 
 
+# The parts of a Nova server shown by the API, as kept in server_cache.
+CachedServer = collections.namedtuple('CachedServer',
+                                      ['id', 'status', 'addresses'])
+
+# Nova servers by compute instance id, and guest volume usage by instance
+# id, for the API to show.
+server_cache = cache.StaleWhileRevalidateCache()
+volume_info_cache = cache.StaleWhileRevalidateCache()
+
+
+def load_cached_server(context, server_id, region_name=None):
+    """Return the status and addresses of a Nova server, served from
+    server_cache if the context allows it.
+
+    Raises novaclient NotFound if there is no such server.
+    """
+    def load():
+        client = create_nova_client(context, region_name=region_name)
+        server = client.servers.get(server_id)
+        return CachedServer(server.id, server.status, server.addresses)
+
+    return server_cache.get(server_id, load, use_cache=context.use_cache)
+
+
+def invalidate_cached_info(db_info):
+    """Forget what the API caches of an instance, as it is being acted on."""
+    server_cache.invalidate(db_info.compute_instance_id)
+    volume_info_cache.invalidate(db_info.id)
+
+
 class InstanceStatus(object):
     ACTIVE = "ACTIVE"
     BLOCKED = "BLOCKED"
@@ -124,9 +159,9 @@ def load_simple_instance_server_status(context, db_info):
         db_info.server_status = "BUILD"
         db_info.addresses = {}
     else:
-        client = create_nova_client(context, db_info.region_id)
         try:
-            server = client.servers.get(db_info.compute_instance_id)
+            server = load_cached_server(context, db_info.compute_instance_id,
+                                        region_name=db_info.region_id)
             db_info.server_status = server.status
             db_info.addresses = server.addresses
         except nova_exceptions.NotFound:
@@ -172,10 +207,12 @@ class SimpleInstance(object):
         self.root_pass = root_password
         self._fault = None
         self._fault_loaded = False
-        if ds_version is None:
+        self.ds_version = ds_version
+        if self.ds_version is None:
             self.ds_version = (datastore_models.DatastoreVersion.
                                load_by_uuid(self.db_info.datastore_version_id))
-        if ds is None:
+        self.ds = ds
+        if self.ds is None:
             self.ds = (datastore_models.Datastore.
                        load(self.ds_version.datastore_id))
         self.locality = locality
@@ -451,9 +488,9 @@ class DetailInstance(SimpleInstance):
     instance from the guest.
     """
 
-    def __init__(self, context, db_info, datastore_status):
+    def __init__(self, context, db_info, datastore_status, **kwargs):
         super(DetailInstance, self).__init__(context, db_info,
-                                             datastore_status)
+                                             datastore_status, **kwargs)
         self._volume_used = None
         self._volume_total = None
 
@@ -558,9 +595,12 @@ def load_instance_with_info(cls, context, id, cluster_id=None):
 
 def load_guest_info(instance, context, id):
     if instance.status not in AGENT_INVALID_STATUSES:
-        guest = create_guest_client(context, id)
+        def load():
+            return create_guest_client(context, id).get_volume_info()
+
         try:
-            volume_info = guest.get_volume_info()
+            volume_info = volume_info_cache.get(id, load,
+                                                use_cache=context.use_cache)
             instance.volume_used = volume_info['used']
             instance.volume_total = volume_info['total']
         except Exception as e:
@@ -574,6 +614,35 @@ def load_server_group_info(instance, context, compute_id):
         instance.locality = srv_grp.ServerGroup.get_locality(server_group)
 
 
+def get_etag_data(db_info, service_status=None):
+    """Return the database records the API shows of an instance, from
+    which its ETag is built.
+    """
+    data = db_info.data()
+    data.update(updated=db_info.updated, flavor_id=db_info.flavor_id,
+                volume_size=db_info.volume_size, hostname=db_info.hostname)
+    if service_status is None:
+        service_status = InstanceServiceStatus.get_by(instance_id=db_info.id)
+    if service_status is not None:
+        data['service_status'] = service_status.data()
+    return data
+
+
+def get_detail_etag_data(db_info):
+    """Return get_etag_data, plus the fault and the replicas of the
+    instance, which only its detailed view shows.
+    """
+    data = get_etag_data(db_info)
+    fault = DBInstanceFault.get_by(instance_id=db_info.id)
+    if fault is not None:
+        data['fault'] = fault.data()
+    data['replicas'] = sorted(
+        replica.id for replica in DBInstance.find_all(
+            tenant_id=db_info.tenant_id, slave_of_id=db_info.id,
+            deleted=False))
+    return data
+
+
 class BaseInstance(SimpleInstance):
     """Represents an instance.
     -----------
@@ -590,7 +659,8 @@ class BaseInstance(SimpleInstance):
     -----------
     """
 
-    def __init__(self, context, db_info, server, datastore_status):
+    def __init__(self, context, db_info, server, datastore_status,
+                 ds_version=None, ds=None):
         """
         Creates a new initialized representation of an instance composed of its
         state in the database and its state from Nova
@@ -608,7 +678,8 @@ class BaseInstance(SimpleInstance):
         :type server: novaclient.v2.servers.Server
         :typdatastore_statusus: trove.instance.models.InstanceServiceStatus
         """
-        super(BaseInstance, self).__init__(context, db_info, datastore_status)
+        super(BaseInstance, self).__init__(context, db_info, datastore_status,
+                                           ds_version=ds_version, ds=ds)
         self.server = server
         self._guest = None
         self._nova_client = None
@@ -679,6 +750,7 @@ class BaseInstance(SimpleInstance):
         return self._nova_client
 
     def update_db(self, **values):
+        invalidate_cached_info(self.db_info)
         self.db_info = DBInstance.find_by(id=self.id, deleted=False)
         for key in values:
             setattr(self.db_info, key, values[key])
@@ -755,6 +827,12 @@ class BaseInstance(SimpleInstance):
             reset_instance = InstanceServiceStatus.find_by(instance_id=self.id)
             reset_instance.set_status(tr_instance.ServiceStatuses.UNKNOWN)
             reset_instance.save()
+            # A running guest reports its actual status again.
+            try:
+                self.get_guest().report_status()
+            except exception.GuestError:
+                LOG.warning(_LW("Failed to ask instance %s to report its "
+                                "status."), self.id)
         else:
             raise exception.UnprocessableEntity(
                 "Instance %s status can only be reset in BUILD or ERROR "
@@ -767,6 +845,21 @@ class FreshInstance(BaseInstance):
         return load_instance(cls, context, id, needs_server=False)
 
 
+class UnavailableInstance(FreshInstance):
+    """A cluster member that could not be loaded, shown as the database
+    knows it, with an ERROR status and the reason in load_error.
+    """
+
+    def __init__(self, context, db_info, datastore_status, load_error):
+        super(UnavailableInstance, self).__init__(context, db_info, None,
+                                                  datastore_status)
+        self.load_error = load_error
+
+    @property
+    def status(self):
+        return InstanceStatus.ERROR
+
+
 class BuiltInstance(BaseInstance):
     @classmethod
     def load(cls, context, id):
@@ -1263,9 +1356,7 @@ class Instance(BuiltInstance):
             raise exception.BadRequest(_("Instance %s is not a replica"
                                        " source.") % self.id)
         service = InstanceServiceStatus.find_by(instance_id=self.id)
-        last_heartbeat_delta = datetime.utcnow() - service.updated_at
-        agent_expiry_interval = timedelta(seconds=CONF.agent_heartbeat_expiry)
-        if last_heartbeat_delta < agent_expiry_interval:
+        if not service.is_stale():
             raise exception.BadRequest(_("Replica Source %s cannot be ejected"
                                          " as it has a current heartbeat")
                                        % self.id)
@@ -1426,8 +1517,12 @@ class Instance(BuiltInstance):
 
 def create_server_list_matcher(server_list):
     # Returns a method which finds a server from the given list.
+    servers_by_id = {}
+    for server in server_list:
+        servers_by_id.setdefault(server.id, []).append(server)
+
     def find_server(instance_id, server_id):
-        matches = [server for server in server_list if server.id == server_id]
+        matches = servers_by_id.get(server_id, [])
         if len(matches) == 1:
             return matches[0]
         elif len(matches) < 1:
@@ -1446,19 +1541,47 @@ def create_server_list_matcher(server_list):
     return find_server
 
 
+def load_server_list(context, server_ids):
+    """Return the Nova servers with the given ids.
+
+    Up to nova_server_lookup_limit servers are fetched one by one,
+    concurrently (or served from server_cache), rather than listing every
+    server of the tenant. Larger sets are listed. Servers which no longer
+    exist are left out.
+    """
+    server_ids = set(server_ids)
+    if not server_ids:
+        return []
+    if len(server_ids) > CONF.nova_server_lookup_limit:
+        servers = create_nova_client(context).servers.list()
+        for server in servers:
+            server_cache.set(server.id, CachedServer(
+                server.id, server.status, server.addresses))
+        return servers
+
+    def get_server(server_id):
+        try:
+            return load_cached_server(context, server_id)
+        except nova_exceptions.NotFound:
+            return None
+
+    pool = eventlet.GreenPool(len(server_ids))
+    return [server for server in pool.imap(get_server, server_ids)
+            if server is not None]
+
+
 class Instances(object):
     DEFAULT_LIMIT = CONF.instances_page_size
 
     @staticmethod
     def load(context, include_clustered, instance_ids=None):
 
-        def load_simple_instance(context, db_info, status, **kwargs):
-            return SimpleInstance(context, db_info, status)
+        def load_simple_instance(context, db_info, status, server=None,
+                                 **kwargs):
+            return SimpleInstance(context, db_info, status, **kwargs)
 
         if context is None:
             raise TypeError("Argument context not defined.")
-        client = create_nova_client(context)
-        servers = client.servers.list()
         query_opts = {'tenant_id': context.tenant,
                       'deleted': False}
         if not include_clustered:
@@ -1475,8 +1598,14 @@ class Instances(object):
                                                   marker=context.marker)
         next_marker = data_view.next_page_marker
 
+        # Only look up the servers of the instances on this page.
+        server_ids = [db.compute_instance_id for db in data_view.collection
+                      if (InstanceTasks.BUILDING != db.task_status and
+                          (not db.region_id or
+                           db.region_id == CONF.os_region_name))]
+        servers = load_server_list(context, server_ids)
         find_server = create_server_list_matcher(servers)
-        for db in db_infos:
+        for db in data_view.collection:
             LOG.debug("Checking for db [id=%(db_id)s, "
                       "compute_instance_id=%(instance_id)s].",
                       {'db_id': db.id, 'instance_id': db.compute_instance_id})
@@ -1485,17 +1614,126 @@ class Instances(object):
                                              find_server)
         return ret, next_marker
 
+    @staticmethod
+    def load_details(context, instance_ids):
+        """Load the DetailInstances of instance_ids as load_instance_with_info
+        does, but with one query per table and one Nova server lookup for
+        all of them, and with the guests asked for their volume usage
+        concurrently.
+
+        :returns: a dict of the DetailInstance by instance id, with a
+                  NotFound error for the instances that were not found.
+        """
+        def load_detail_instance(context, db_info, status, server=None,
+                                 **kwargs):
+            return DetailInstance(context, db_info, status, **kwargs)
+
+        # Admins may see the instances of any tenant, as with get_db_info.
+        db_infos = [db for db in DBInstance.find_all_in(
+                    'id', instance_ids, deleted=False)
+                    if context.is_admin or db.tenant_id == context.tenant]
+        server_ids = [db.compute_instance_id for db in db_infos
+                      if (InstanceTasks.BUILDING != db.task_status and
+                          (not db.region_id or
+                           db.region_id == CONF.os_region_name))]
+        find_server = create_server_list_matcher(
+            load_server_list(context, server_ids))
+        instances = Instances._load_servers_status(
+            load_detail_instance, context, db_infos, find_server)
+
+        loaded_ids = [instance.id for instance in instances]
+        faults = {}
+        for fault in DBInstanceFault.find_all_in('instance_id', loaded_ids):
+            faults.setdefault(fault.instance_id, fault)
+        replicas = {}
+        for replica in DBInstance.find_all_in('slave_of_id', loaded_ids,
+                                              deleted=False):
+            replicas.setdefault(replica.slave_of_id, []).append(replica)
+        server_groups = (srv_grp.ServerGroup.load_by_member(context)
+                         if instances else {})
+        for instance in instances:
+            instance._fault = faults.get(instance.id)
+            if instance._fault is not None and not context.is_admin:
+                instance._fault.details = None
+            instance._fault_loaded = True
+            instance.slave_list = [
+                replica for replica in replicas.get(instance.id, [])
+                if replica.tenant_id == instance.tenant_id]
+            server_group = server_groups.get(instance.server_id)
+            if server_group:
+                instance.locality = srv_grp.ServerGroup.get_locality(
+                    server_group)
+
+        results = dict((instance_id, exception.NotFound(uuid=instance_id))
+                       for instance_id in instance_ids)
+        if instances:
+            pool = eventlet.GreenPool(len(instances))
+            for instance in pool.imap(
+                    lambda instance: load_guest_info(instance, context,
+                                                     instance.id),
+                    instances):
+                results[instance.id] = instance
+        return results
+
     @staticmethod
     def load_all_by_cluster_id(context, cluster_id, load_servers=True):
         db_instances = DBInstance.find_all(cluster_id=cluster_id,
-                                           deleted=False)
-        return [load_any_instance(context, db_inst.id,
-                                  load_server=load_servers)
-                for db_inst in db_instances]
+                                           deleted=False).all()
+        results = fanout.fan_out(
+            functools.partial(load_any_instance, context, db_inst.id,
+                              load_server=load_servers)
+            for db_inst in db_instances)
+        instances = []
+        for db_inst, result in zip(db_instances, results):
+            if isinstance(result, Exception):
+                # Show the member as the database knows it, marked as
+                # failed, rather than failing the whole cluster.
+                LOG.error(_LE("Could not load cluster member %(id)s: "
+                              "%(error)s"),
+                          {'id': db_inst.id, 'error': result})
+                db_inst.server_status = None
+                db_inst.addresses = {}
+                try:
+                    datastore_status = InstanceServiceStatus.find_by(
+                        instance_id=db_inst.id)
+                except exception.NotFound:
+                    datastore_status = InstanceServiceStatus(
+                        tr_instance.ServiceStatuses.UNKNOWN,
+                        instance_id=db_inst.id)
+                result = UnavailableInstance(
+                    context, db_inst, datastore_status,
+                    _("The instance could not be loaded."))
+            instances.append(result)
+        return instances
+
+    @staticmethod
+    def _load_datastores(db_items):
+        """Load the datastore versions and datastores of db_items with one
+        query each, keyed by datastore version id.
+        """
+        versions = datastore_models.DBDatastoreVersion.find_all_in(
+            'id', [db.datastore_version_id for db in db_items
+                   if db.datastore_version_id])
+        datastores = dict(
+            (datastore.id, datastore_models.Datastore(datastore))
+            for datastore in datastore_models.DBDatastore.find_all_in(
+                'id', [version.datastore_id for version in versions]))
+        return dict(
+            (version.id, (datastore_models.DatastoreVersion(version),
+                          datastores.get(version.datastore_id)))
+            for version in versions)
 
     @staticmethod
     def _load_servers_status(load_instance, context, db_items, find_server):
         ret = []
+        db_items = list(db_items)
+        # Load the related rows of all the instances up front, rather than
+        # one instance at a time.
+        statuses = dict(
+            (status.instance_id, status)
+            for status in InstanceServiceStatus.find_all_in(
+                'instance_id', [db.id for db in db_items]))
+        datastores = Instances._load_datastores(db_items)
         for db in db_items:
             server = None
             try:
@@ -1521,8 +1759,10 @@ class Instances(object):
                 # TODO(tim.simpson): End of hack.
 
                 # volumes = find_volumes(server.id)
-                datastore_status = InstanceServiceStatus.find_by(
-                    instance_id=db.id)
+                datastore_status = statuses.get(db.id)
+                if datastore_status is None:
+                    raise exception.ModelNotFoundError(
+                        _("InstanceServiceStatus Not Found"))
                 if not datastore_status.status:  # This should never happen.
                     LOG.error(_LE("Server status could not be read for "
                                   "instance id(%s)."), db.id)
@@ -1533,8 +1773,11 @@ class Instances(object):
                 LOG.error(_LE("Server status could not be read for "
                               "instance id(%s)."), db.id)
                 continue
+            ds_version, ds = datastores.get(db.datastore_version_id,
+                                            (None, None))
             ret.append(load_instance(context, db, datastore_status,
-                                     server=server))
+                                     server=server, ds_version=ds_version,
+                                     ds=ds))
         return ret
 
 
@@ -1663,6 +1906,15 @@ class InstanceServiceStatus(dbmodels.DatabaseModelBase):
         self['updated_at'] = utils.utcnow()
         return get_db_api().save(self)
 
+    def is_stale(self):
+        """True if the guest is considered unreachable: it has not sent a
+        heartbeat for agent_heartbeat_expiry seconds after its last
+        keep-alive was due.
+        """
+        expiry = timedelta(seconds=CONF.status_keepalive_interval +
+                           CONF.agent_heartbeat_expiry)
+        return datetime.utcnow() - self.updated_at >= expiry
+
     status = property(get_status, set_status)
 
 
@@ -229,11 +229,67 @@ class InstanceController(wsgi.Controller):
         LOG.debug("req : '%s'\n\n", req)
 
         context = req.environ[wsgi.CONTEXT_KEY]
+        etag = None
+        if CONF.api_etag_max_age:
+            # Answer polling clients before asking Nova and the guest.
+            db_info = models.get_db_info(context, id)
+            self.authorize_instance_action(context, 'show', db_info)
+            etag = wsgi.etag(req, [context.is_admin,
+                                   models.get_detail_etag_data(db_info)],
+                             max_age=CONF.api_etag_max_age)
+            wsgi.check_etag(req, etag)
         server = models.load_instance_with_info(models.DetailInstance,
                                                 context, id)
         self.authorize_instance_action(context, 'show', server)
         return wsgi.Result(views.InstanceDetailView(server,
-                                                    req=req).data(), 200)
+                                                    req=req).data(), 200,
+                           etag=etag)
+
+    def detail(self, req, tenant_id):
+        """Return the instances given by the id parameters of the request.
+
+        Instances that cannot be shown are listed in 'errors' rather than
+        failing the whole request.
+        """
+        context = req.environ[wsgi.CONTEXT_KEY]
+        ids = []
+        for instance_id in req.GET.getall('id'):
+            if instance_id not in ids:
+                ids.append(instance_id)
+        LOG.info(_LI("Showing database instances %(instance_ids)s for "
+                     "tenant '%(tenant_id)s'"),
+                 {'instance_ids': ids, 'tenant_id': tenant_id})
+        if not ids:
+            raise exception.BadRequest(_("Specify the instances to show "
+                                         "with id parameters."))
+        if len(ids) > CONF.instances_page_size:
+            raise exception.BadRequest(
+                _("Cannot show more than %d instances at once.")
+                % CONF.instances_page_size)
+
+        loaded = models.Instances.load_details(context, ids)
+        instances = []
+        errors = []
+        for instance_id in ids:
+            try:
+                instance = loaded[instance_id]
+                if isinstance(instance, Exception):
+                    raise instance
+                self.authorize_instance_action(context, 'show', instance)
+                instances.append(views.InstanceDetailView(
+                    instance, req=req).data()['instance'])
+            except exception.TroveError as error:
+                errors.append(self._detail_error(instance_id, error))
+        return wsgi.Result({'instances': instances, 'errors': errors}, 200)
+
+    def _detail_error(self, instance_id, error):
+        http_error = webob.exc.HTTPBadRequest
+        for error_class, errors in self.exception_map.items():
+            if isinstance(error, tuple(errors)):
+                http_error = error_class
+                break
+        return {'id': instance_id, 'code': http_error.code,
+                'message': str(error)}
 
     def delete(self, req, tenant_id, id):
         """Delete a single instance."""
@@ -56,6 +56,7 @@ from trove.common.remote import create_dns_client
 from trove.common.remote import create_heat_client
 from trove.common import server_group as srv_grp
 from trove.common.strategies.cluster import strategy
+from trove.common.strategies.storage import dedup
 from trove.common.strategies.storage import get_storage_strategy
 from trove.common import template
 from trove.common import utils
@@ -1477,6 +1478,13 @@ class BuiltInstanceTasks(BuiltInstance, NotifyMixin, ConfigurationMixin):
         datastore_status = InstanceServiceStatus.find_by(instance_id=self.id)
         datastore_status.status = rd_instance.ServiceStatuses.PAUSED
         datastore_status.save()
+        # A guest that sends heartbeats only when its status changes would
+        # not report a status that did not change otherwise.
+        try:
+            self.guest.report_status()
+        except GuestError:
+            LOG.warning(_("Failed to ask instance %s to report its "
+                          "status.") % self.id)
 
     def upgrade(self, datastore_version):
         LOG.debug("Upgrading instance %s to new datastore version %s",
@@ -1553,7 +1561,10 @@ class BackupTasks(object):
         container = storage.get_container_name()
         client = remote.create_swift_client(context)
         obj = client.head_object(container, filename)
-        if 'x-static-large-object' in obj:
+        if dedup.MANIFEST_HEADER in obj:
+            # Deduplicated backup, its chunks may be shared
+            dedup.DedupStorage(context).delete(filename)
+        elif 'x-static-large-object' in obj:
             # Static large object
             LOG.debug("Deleting large object file: %(cont)s/%(filename)s" %
                       {'cont': container, 'filename': filename})
@@ -50,6 +50,9 @@ class FakeGuest(object):
     def get_hwinfo(self):
         return {'mem_total': 524288, 'num_cpus': 1}
 
+    def report_status(self):
+        pass
+
     def get_diagnostics(self):
         return {
             'version': str(self.version),
@@ -53,6 +53,7 @@ class FakeSwiftConnection(object):
     def __init__(self, *args, **kwargs):
         self.manifest_prefix = None
         self.manifest_name = None
+        self.manifest_data = None
         self.container_objects = {}
 
     def get_auth(self):
@@ -116,6 +117,8 @@ class FakeSwiftConnection(object):
             # this is included to test bad swift segment etags
             if name.startswith("bad_manifest_etag_"):
                 return {'etag': '"this_is_an_intentional_bad_manifest_etag"'}
+            return {'etag': '"%s"' % checksum.hexdigest(),
+                    'x-static-large-object': 'true'}
         else:
             if name in self.container_objects:
                 checksum.update(self.container_objects[name])
@@ -123,13 +126,40 @@ class FakeSwiftConnection(object):
                 return {'etag': 'fake-md5-sum'}
 
         # Currently a swift HEAD object returns etag with double quotes
-        return {'etag': '"%s"' % checksum.hexdigest()}
+        return {'etag': '"%s"' % checksum.hexdigest(),
+                'content-length': str(len(self.container_objects[name]))}
+
+    def _get_stored_object(self, name, resp_chunk_size=None, headers=None):
+        content = self.container_objects[name]
+        etag = md5(content).hexdigest()
+        byte_range = (headers or {}).get('Range')
+        if byte_range:
+            start, end = byte_range.split('=')[1].split('-')
+            content = content[int(start):int(end) + 1]
+        if resp_chunk_size:
+            def _object_info():
+                for start in range(0, len(content), resp_chunk_size):
+                    yield content[start:start + resp_chunk_size]
+            return {'etag': '"%s"' % etag}, _object_info()
+        return {'etag': '"%s"' % etag}, content
 
-    def get_object(self, container, name, resp_chunk_size=None):
+    def get_object(self, container, name, resp_chunk_size=None,
+                   query_string=None, headers=None):
         LOG.debug("fake get_object(%(container)s, %(name)s)" %
                   {'container': container, 'name': name})
         if container == 'socket_error_on_get':
             raise socket.error(111, 'ECONNREFUSED')
+        if (query_string == 'multipart-manifest=get' and
+                name == self.manifest_name):
+            # Swift returns the stored form of the manifest, which uses
+            # different keys from the one that was uploaded.
+            segments = [{'name': '/' + segment['path'],
+                         'hash': segment['etag'],
+                         'bytes': segment['size_bytes']}
+                        for segment in json.loads(self.manifest_data)]
+            return {}, json.dumps(segments)
+        if name in self.container_objects:
+            return self._get_stored_object(name, resp_chunk_size, headers)
         if 'metadata' in name:
             fake_object_header = None
             metadata = {}
@@ -176,6 +206,7 @@ class FakeSwiftConnection(object):
             # container is where the object segments are in and prefix is the
             # common prefix for all segments.
             self.manifest_name = name
+            self.manifest_data = contents
             if isinstance(contents, six.text_type):
                 object_checksum.update(contents.encode('utf-8'))
             else:
@@ -466,39 +466,48 @@ class PaginationTests(trove_testtools.TestCase):
         query = models.DBBackup.query()
         query.filter_by(instance_id=self.instance_id).delete()
 
+    def _list_pages(self, list_func, *args):
+        pages = []
+        marker = None
+        while True:
+            self.context.marker = marker
+            backups, marker = list_func(self.context, *args)
+            pages.append(backups)
+            if marker is None:
+                return pages
+
+    def _assert_pages(self, pages):
+        self.assertEqual([20, 20, 10], [len(page) for page in pages])
+        backups = [backup for page in pages for backup in page]
+        # Every backup is listed once, most recent first.
+        self.assertEqual(50, len(set(backup.id for backup in backups)))
+        keys = [(backup.updated, backup.id) for backup in backups]
+        self.assertEqual(sorted(keys, reverse=True), keys)
+
     def test_pagination_list(self):
-        # page one
-        backups, marker = models.Backup.list(self.context)
-        self.assertEqual(20, marker)
-        self.assertEqual(20, len(backups))
-        # page two
-        self.context.marker = 20
-        backups, marker = models.Backup.list(self.context)
-        self.assertEqual(40, marker)
-        self.assertEqual(20, len(backups))
-        # page three
-        self.context.marker = 40
-        backups, marker = models.Backup.list(self.context)
-        self.assertIsNone(marker)
-        self.assertEqual(10, len(backups))
+        self._assert_pages(self._list_pages(models.Backup.list))
 
     def test_pagination_list_for_instance(self):
-        # page one
-        backups, marker = models.Backup.list_for_instance(self.context,
-                                                          self.instance_id)
-        self.assertEqual(20, marker)
-        self.assertEqual(20, len(backups))
-        # page two
-        self.context.marker = 20
+        self._assert_pages(self._list_pages(models.Backup.list_for_instance,
+                                            self.instance_id))
+
+    def test_pagination_skips_new_backups(self):
+        # Backups created while paging do not shift the following pages.
         backups, marker = models.Backup.list(self.context)
-        self.assertEqual(40, marker)
-        self.assertEqual(20, len(backups))
-        # page three
-        self.context.marker = 40
-        backups, marker = models.Backup.list_for_instance(self.context,
-                                                          self.instance_id)
-        self.assertIsNone(marker)
-        self.assertEqual(10, len(backups))
+        models.DBBackup.create(tenant_id=self.context.tenant,
+                               state=BACKUP_STATE,
+                               instance_id=self.instance_id,
+                               name='Backup-new', deleted=False)
+        self.context.marker = marker
+        next_backups, marker = models.Backup.list(self.context)
+        self.assertEqual(20, len(next_backups))
+        self.assertFalse(set(backup.id for backup in backups) &
+                         set(backup.id for backup in next_backups))
+
+    def test_pagination_invalid_marker(self):
+        self.context.marker = 'not-a-marker'
+        self.assertRaises(exception.InvalidMarker,
+                          models.Backup.list, self.context)
 
 
 class OrderingTests(trove_testtools.TestCase):
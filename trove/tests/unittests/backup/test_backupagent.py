@@ -124,6 +124,12 @@ class MockSwift(object):
     def save_metadata(self, location, metadata):
         pass
 
+    def discard(self, filename):
+        pass
+
+    def leftovers(self):
+        return []
+
 
 class MockStorage(Storage):
 
@@ -376,6 +382,7 @@ class BackupAgentTest(trove_testtools.TestCase):
                 note='w00t',
                 sent=ANY,
                 size=ANY,
+                progress=ANY,
                 backup_type=MockBackup.backup_type,
                 state=BackupState.COMPLETED,
                 success=True
@@ -415,6 +422,7 @@ class BackupAgentTest(trove_testtools.TestCase):
                 note='w00t',
                 sent=ANY,
                 size=ANY,
+                progress=ANY,
                 backup_type=MockCheckProcessBackup.backup_type,
                 state=BackupState.FAILED,
                 success=True
@@ -459,12 +467,100 @@ class BackupAgentTest(trove_testtools.TestCase):
                     note='Error',
                     sent=ANY,
                     size=ANY,
+                    progress=ANY,
                     backup_type=MockLossyBackup.backup_type,
                     state=BackupState.FAILED,
                     success=False
                 )]
             )
 
+    @patch.object(conductor_api.API, 'get_client', Mock(return_value=Mock()))
+    @patch.object(conductor_api.API, 'update_backup',
+                  Mock(return_value=Mock()))
+    @patch.object(MockSwift, 'discard')
+    @patch('trove.guestagent.backup.backupagent.LOG')
+    def test_execute_backup_retried(self, mock_logging, mock_discard):
+        self.patch_conf_property('backup_retries', 1)
+        backup_info = {'id': '123',
+                       'location': 'fake-location',
+                       'type': 'InnoBackupEx',
+                       'checksum': 'fake-checksum',
+                       'datastore': 'mysql',
+                       'datastore_version': '5.5'
+                       }
+        with patch.object(MockSwift, 'save', side_effect=[
+                (False, 'Error', 'y', 'z'),
+                (True, 'w00t', 'fake-checksum', 'fake-location')]) as save:
+            backupagent.BackupAgent().execute_backup(
+                context=None, backup_info=backup_info, runner=MockBackup)
+
+        # The second attempt saves the backup under the same name, so that
+        # it can resume the first one.
+        self.assertEqual(2, save.call_count)
+        self.assertEqual(save.call_args_list[0][0][0],
+                         save.call_args_list[1][0][0])
+        self.assertFalse(mock_discard.called)
+        conductor_api.API.update_backup.assert_called_with(
+            ANY, backup_id='123', checksum='fake-checksum',
+            location='fake-location', note='w00t', sent=ANY, size=ANY,
+            progress=ANY, backup_type=MockBackup.backup_type,
+            state=BackupState.COMPLETED, success=True)
+
+    @patch.object(conductor_api.API, 'get_client', Mock(return_value=Mock()))
+    @patch.object(conductor_api.API, 'update_backup',
+                  Mock(return_value=Mock()))
+    @patch.object(MockSwift, 'discard')
+    @patch('trove.guestagent.backup.backupagent.LOG')
+    def test_execute_backup_retries_failed(self, mock_logging, mock_discard):
+        self.patch_conf_property('backup_retries', 2)
+        backup_info = {'id': '123',
+                       'location': 'fake-location',
+                       'type': 'InnoBackupEx',
+                       'checksum': 'fake-checksum',
+                       'datastore': 'mysql',
+                       'datastore_version': '5.5'
+                       }
+        with patch.object(MockSwift, 'save',
+                          return_value=(False, 'Error', 'y', 'z')) as save:
+            self.assertRaises(backupagent.BackupError,
+                              backupagent.BackupAgent().execute_backup,
+                              context=None, backup_info=backup_info,
+                              runner=MockBackup)
+
+        self.assertEqual(3, save.call_count)
+        # What the attempts saved is removed.
+        mock_discard.assert_called_once_with(save.call_args[0][0])
+        conductor_api.API.update_backup.assert_called_with(
+            ANY, backup_id='123', checksum='y', location='z', note='Error',
+            sent=ANY, size=ANY, progress=ANY,
+            backup_type=MockBackup.backup_type, state=BackupState.FAILED,
+            success=False)
+
+    @patch.object(conductor_api.API, 'get_client', Mock(return_value=Mock()))
+    @patch.object(conductor_api.API, 'update_backup',
+                  Mock(return_value=Mock()))
+    @patch.object(MockSwift, 'discard')
+    @patch.object(MockSwift, 'leftovers', return_value=[
+        '123.xbstream.gz.enc', '456.xbstream.gz.enc', '789.xbstream.gz.enc'])
+    @patch('trove.guestagent.backup.backupagent.LOG')
+    def test_execute_backup_discards_leftovers(self, mock_logging,
+                                               mock_leftovers, mock_discard):
+        backup_info = {'id': '123',
+                       'location': 'fake-location',
+                       'type': 'InnoBackupEx',
+                       'checksum': 'fake-checksum',
+                       'datastore': 'mysql',
+                       'datastore_version': '5.5'
+                       }
+        # 456 was left by an agent that died while running it, while 789
+        # is still running.
+        with patch.object(backupagent, 'RUNNING_BACKUPS', set(['789'])):
+            backupagent.BackupAgent().execute_backup(
+                context=None, backup_info=backup_info, runner=MockBackup)
+            self.assertEqual(set(['789']), backupagent.RUNNING_BACKUPS)
+
+        mock_discard.assert_called_once_with('456.xbstream.gz.enc')
+
     def test_execute_restore(self):
         """This test should ensure backup agent
                 resolves backup instance
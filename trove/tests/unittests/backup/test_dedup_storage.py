@@ -0,0 +1,358 @@
+# Copyright 2016 Tesora Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import datetime
+import hashlib
+import io
+import json
+import os
+import random
+import time
+
+from mock import patch
+from swiftclient.client import ClientException
+
+from trove.common import remote
+from trove.common.strategies.storage import dedup
+from trove.common.strategies.storage.swift import SwiftDownloadIntegrityError
+from trove.tests.unittests import trove_testtools
+
+
+class FakeObjectStore(object):
+    """An in-memory Swift container shared by several connections."""
+
+    url = 'http://mockswift/v1'
+
+    def __init__(self):
+        self.objects = {}
+        self.headers = {}
+        self.timestamps = {}
+        self.puts = []
+        self.heads = []
+        self.gets = []
+
+    def _missing(self, name):
+        if name not in self.objects:
+            raise ClientException('Object %s not found' % name,
+                                  http_status=404)
+
+    def put_container(self, container):
+        pass
+
+    def get_container(self, container, prefix='', full_listing=False):
+        return {}, [{'name': name,
+                     'hash': hashlib.md5(self.objects[name]).hexdigest(),
+                     'last_modified': datetime.datetime.utcfromtimestamp(
+                         self.timestamps[name]).isoformat()}
+                    for name in sorted(self.objects)
+                    if name.startswith(prefix)]
+
+    def put_object(self, container, name, contents, etag=None,
+                   headers=None):
+        headers = dict((key.lower(), value) for key, value
+                       in (headers or {}).items())
+        self.puts.append(name)
+        if not isinstance(contents, bytes):
+            contents = contents.encode('utf-8')
+        self.objects[name] = contents
+        self.headers[name] = headers
+        self.timestamps[name] = time.time()
+        return hashlib.md5(contents).hexdigest()
+
+    def _headers(self, name):
+        self._missing(name)
+        headers = dict(self.headers[name])
+        headers['etag'] = '"%s"' % hashlib.md5(
+            self.objects[name]).hexdigest()
+        return headers
+
+    def head_object(self, container, name):
+        self.heads.append(name)
+        return self._headers(name)
+
+    def get_object(self, container, name, **kwargs):
+        headers = self._headers(name)
+        self.gets.append(name)
+        return headers, self.objects[name]
+
+    def delete_object(self, container, name, headers=None, **kwargs):
+        self._missing(name)
+        timestamp = (headers or {}).get('X-Timestamp')
+        if timestamp and self.timestamps[name] >= float(timestamp):
+            raise ClientException('Object %s is newer' % name,
+                                  http_status=409)
+        del self.objects[name]
+        del self.headers[name]
+
+
+class FakeStream(io.BytesIO):
+
+    def metadata(self):
+        return {'lsn': '54'}
+
+
+class ContentDefinedChunkerTests(trove_testtools.TestCase):
+
+    def setUp(self):
+        super(ContentDefinedChunkerTests, self).setUp()
+        self.data = os.urandom(256 * 1024)
+
+    def _chunk(self, data, average_size=8192):
+        return list(dedup.ContentDefinedChunker(io.BytesIO(data),
+                                                average_size))
+
+    def test_chunk_sizes(self):
+        chunks = self._chunk(self.data)
+
+        self.assertEqual(self.data, b''.join(chunks))
+        self.assertTrue(len(chunks) > 4)
+        for chunk in chunks[:-1]:
+            self.assertTrue(2048 <= len(chunk) <= 4 * 8192)
+
+    def test_boundaries_survive_insertion(self):
+        chunks = self._chunk(self.data)
+        shifted = self._chunk(b'inserted' + self.data)
+
+        # Only the chunks around the insertion change.
+        self.assertTrue(len(set(chunks) - set(shifted)) <= 2)
+
+    def test_small_and_empty_streams(self):
+        self.assertEqual([], self._chunk(b''))
+        self.assertEqual([b'abc'], self._chunk(b'abc'))
+
+
+class DedupStorageTests(trove_testtools.TestCase):
+
+    def setUp(self):
+        super(DedupStorageTests, self).setUp()
+        self.patch_conf_property('backup_dedup_chunk_size', 8192)
+        self.patch_conf_property('backup_segment_upload_concurrency', 3)
+        self.patch_conf_property('backup_segment_download_concurrency', 3)
+        lifetime_patch = patch.object(dedup, 'REFERENCE_LIFETIME', 0)
+        lifetime_patch.start()
+        self.addCleanup(lifetime_patch.stop)
+        self.context = trove_testtools.TroveTestContext(self)
+        self.store = FakeObjectStore()
+        create_swift_client_patch = patch.object(
+            remote, 'create_swift_client', return_value=self.store)
+        create_swift_client_patch.start()
+        self.addCleanup(create_swift_client_patch.stop)
+        self.storage = dedup.DedupStorage(self.context)
+        rand = random.Random(4)
+        self.data = b''.join(
+            bytes(bytearray(rand.getrandbits(8) for _i in range(1024)))
+            for _j in range(160))
+
+    def _chunk_names(self):
+        return set(name for name in self.store.objects
+                   if name.startswith(dedup.CHUNK_PREFIX))
+
+    def _age_chunks(self):
+        for name in self._chunk_names():
+            self.store.timestamps[name] -= 3 * 24 * 3600
+
+    def _record_pending(self, names):
+        self.store.put_object('database_backups', 'pending/9.xbstream/0',
+                              json.dumps([name[len(dedup.CHUNK_PREFIX):]
+                                          for name in names]))
+
+    def _save(self, filename, data):
+        success, note, checksum, location = self.storage.save(
+            filename, FakeStream(data))
+        self.assertTrue(success, note)
+        return checksum, location
+
+    def _load(self, checksum, location):
+        return b''.join(self.storage.load(location, checksum))
+
+    def test_save_and_load(self):
+        checksum, location = self._save('123.xbstream', self.data)
+
+        self.assertEqual('http://mockswift/v1/database_backups/'
+                         'dedup_123.xbstream', location)
+        manifest = self.store.head_object('database_backups',
+                                          'dedup_123.xbstream')
+        self.assertEqual('true', manifest[dedup.MANIFEST_HEADER])
+        self.assertEqual('54', manifest['x-object-meta-lsn'])
+        # The chunks are compressed and encrypted.
+        for name in self._chunk_names():
+            self.assertNotIn(self.data[:64], self.store.objects[name])
+        self.assertEqual(self.data, self._load(checksum, location))
+
+    def test_second_backup_reuses_chunks(self):
+        self._save('1.xbstream', self.data)
+        chunks = self._chunk_names()
+        self.store.puts = []
+
+        changed = self.data[:80000] + b'changed' + self.data[80000:]
+        checksum, location = self._save('2.xbstream', changed)
+
+        new_chunks = self._chunk_names() - chunks
+        self.assertTrue(len(new_chunks) <= 2)
+        self.assertEqual(new_chunks, set(
+            name for name in self.store.puts
+            if name.startswith(dedup.CHUNK_PREFIX)))
+        self.assertEqual(changed, self._load(checksum, location))
+
+    def test_save_lists_chunks_before_checking_them(self):
+        head_object = self.store.head_object
+
+        def _listed_before_head(container, name):
+            headers, listing = self.store.get_container(
+                container, prefix=dedup.PENDING_PREFIX)
+            self.assertIn(name[len(dedup.CHUNK_PREFIX):], set(
+                chunk for obj in listing
+                for chunk in json.loads(self.store.objects[obj['name']])))
+            return head_object(container, name)
+
+        with patch.object(self.store, 'head_object',
+                          side_effect=_listed_before_head):
+            self._save('1.xbstream', self.data)
+
+        self.assertEqual(len(self._chunk_names()), len(self.store.heads))
+        # The lists are removed once the manifest refers to the chunks.
+        self.assertEqual([], self.store.get_container(
+            'database_backups', prefix=dedup.PENDING_PREFIX)[1])
+
+    def test_save_fails_if_reused_chunk_deleted(self):
+        self._save('1.xbstream', self.data)
+        name = sorted(self._chunk_names())[0]
+
+        def _deleted_while_waiting(seconds):
+            # By a delete that read the pending lists before they listed
+            # the chunk.
+            self.store.delete_object('database_backups', name)
+
+        with patch.object(dedup.eventlet, 'sleep',
+                          side_effect=_deleted_while_waiting):
+            success, note, checksum, location = self.storage.save(
+                '2.xbstream', FakeStream(self.data))
+
+        self.assertFalse(success)
+        self.assertNotIn('dedup_2.xbstream', self.store.objects)
+        self.assertEqual([], self.store.get_container(
+            'database_backups', prefix=dedup.PENDING_PREFIX)[1])
+
+    def test_load_detects_corrupted_chunk(self):
+        self.patch_conf_property('backup_dedup_encrypt_chunks', False)
+        self.patch_conf_property('backup_dedup_compress_chunks', False)
+        checksum, location = self._save('123.xbstream', self.data)
+        name = sorted(self._chunk_names())[0]
+        self.store.objects[name] = b'corrupted'
+
+        self.assertRaises(SwiftDownloadIntegrityError, self._load,
+                          checksum, location)
+
+    def test_delete_keeps_shared_chunks(self):
+        self.patch_conf_property('backup_dedup_gc_grace_period', 0)
+        self._save('1.xbstream', self.data)
+        first_chunks = self._chunk_names()
+        checksum, location = self._save('2.xbstream',
+                                        self.data[:100000] + os.urandom(4096))
+
+        self.storage.delete('dedup_1.xbstream')
+
+        manifest = self.storage._load_manifest('database_backups',
+                                               'dedup_2.xbstream')
+        second_chunks = set(dedup.CHUNK_PREFIX + name
+                            for name, size in manifest['chunks'])
+        self.assertEqual(second_chunks, self._chunk_names())
+        self.assertTrue(first_chunks - second_chunks)
+        self.assertNotIn('dedup_1.xbstream', self.store.objects)
+        self.assertEqual(self.data[:100000],
+                         self._load(checksum, location)[:100000])
+
+    def test_delete_honours_grace_period(self):
+        self._save('1.xbstream', self.data)
+        chunks = self._chunk_names()
+
+        self.storage.delete('dedup_1.xbstream')
+
+        self.assertEqual(chunks, self._chunk_names())
+
+    def test_delete_only_reads_new_manifests(self):
+        self.patch_conf_property('backup_dedup_gc_grace_period', 0)
+        for index in range(3):
+            self._save('%d.xbstream' % index, os.urandom(16384))
+        self.storage.delete('dedup_0.xbstream')
+        self._save('3.xbstream', os.urandom(16384))
+        self.store.gets = []
+
+        self.storage.delete('dedup_1.xbstream')
+
+        self.assertEqual(['chunk_references', 'dedup_1.xbstream',
+                          'dedup_3.xbstream'], sorted(self.store.gets))
+
+    def test_delete_rebuilds_stale_index(self):
+        self.patch_conf_property('backup_dedup_gc_grace_period', 0)
+        self._save('1.xbstream', self.data)
+        self._save('2.xbstream', self.data[:100000])
+        self._save('3.xbstream', self.data[50000:])
+        self.storage.delete('dedup_1.xbstream')
+        # Deleted without updating the index.
+        self.store.delete_object('database_backups', 'dedup_2.xbstream')
+        manifest = self.storage._load_manifest('database_backups',
+                                               'dedup_3.xbstream')
+
+        self.storage.delete('dedup_3.xbstream')
+
+        # The chunks shared with the second backup are no longer counted.
+        self.assertFalse(self._chunk_names() & set(
+            dedup.CHUNK_PREFIX + name for name, size in manifest['chunks']))
+        self.assertEqual({}, self.storage._load_index(
+            'database_backups')['manifests'])
+
+    def test_delete_spares_chunks_of_running_backup(self):
+        self._save('1.xbstream', self.data)
+        self._age_chunks()
+        chunks = self._chunk_names()
+        listed = set(sorted(chunks)[:3])
+        self._record_pending(listed)
+
+        self.storage.delete('dedup_1.xbstream')
+
+        self.assertEqual(listed, self._chunk_names())
+
+    def test_delete_rereads_pending_lists(self):
+        self.patch_conf_property('backup_segment_upload_concurrency', 1)
+        self._save('1.xbstream', self.data)
+        self._age_chunks()
+        chunks = self._chunk_names()
+        delete_object = self.store.delete_object
+
+        def _listed_after_read(container, name, **kwargs):
+            if name.startswith(dedup.CHUNK_PREFIX):
+                # A backup lists the chunks after the deleter read the
+                # pending lists.
+                self._record_pending(chunks)
+            return delete_object(container, name, **kwargs)
+
+        with patch.object(dedup, 'REFERENCE_LIFETIME', -1):
+            with patch.object(self.store, 'delete_object',
+                              side_effect=_listed_after_read):
+                self.storage.delete('dedup_1.xbstream')
+
+        self.assertTrue(len(chunks - self._chunk_names()) <= 2)
+
+    def test_delete_discards_lists_of_failed_backups(self):
+        self._save('1.xbstream', self.data)
+        self._age_chunks()
+        self._record_pending(self._chunk_names())
+        self.store.timestamps['pending/9.xbstream/0'] -= 3 * 24 * 3600
+
+        self.storage.delete('dedup_1.xbstream')
+
+        self.assertEqual(set(), self._chunk_names())
+        self.assertNotIn('pending/9.xbstream/0', self.store.objects)
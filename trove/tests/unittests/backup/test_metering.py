@@ -0,0 +1,138 @@
+# Copyright 2016 Tesora Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import io
+
+from mock import Mock, patch
+
+from trove.common import remote
+from trove.common.strategies.storage import swift
+from trove.common.strategies.storage.swift import SwiftStorage
+from trove.guestagent.backup.metering import BackupMeter
+from trove.tests.fakes.swift import FakeSwiftConnection
+from trove.tests.unittests import trove_testtools
+
+
+class FakeRunner(object):
+
+    def __init__(self, data, encoder=None):
+        self.stream = io.BytesIO(data)
+        self.encoder = encoder
+        self.manifest = 'backup.xbstream.gz'
+
+    def read(self, chunk_size):
+        return self.stream.read(chunk_size)
+
+    def metadata(self):
+        return {'lsn': '1234'}
+
+
+def _read_all(stream, chunk_size=100):
+    while stream.read(chunk_size):
+        pass
+
+
+class BackupMeterTest(trove_testtools.TestCase):
+
+    def test_counts_bytes_and_segments(self):
+        meter = BackupMeter(FakeRunner(b'x' * 1000), interval=0)
+        _read_all(meter)
+        meter.segment_uploaded(600, 0.5)
+        meter.segment_uploaded(400, 1.5)
+
+        stats = meter.stats()
+        self.assertEqual(1000, stats['bytes_read'])
+        self.assertEqual(2, stats['segments'])
+        self.assertEqual(1000, stats['bytes_uploaded'])
+        self.assertEqual(1.0, stats['segment_upload_avg'])
+        self.assertEqual(1.5, stats['segment_upload_max'])
+        self.assertNotIn('compression_ratio', stats)
+        self.assertEqual('backup.xbstream.gz', meter.manifest)
+
+    def test_compression_ratio(self):
+        meter = BackupMeter(FakeRunner(b'x' * 1000, Mock(bytes_in=4000)),
+                            interval=0)
+        _read_all(meter)
+
+        stats = meter.stats()
+        self.assertEqual(4000, stats['raw_bytes'])
+        self.assertEqual(4.0, stats['compression_ratio'])
+
+    @patch('trove.guestagent.backup.metering.time')
+    def test_wait_times_and_publish(self, mock_time):
+        # Each read takes 1s and the storage takes 2s between reads.
+        mock_time.time.side_effect = [0, 0, 1, 3, 4, 4, 6, 7, 7]
+        publish = Mock()
+        meter = BackupMeter(FakeRunner(b'x' * 200), publish=publish,
+                            interval=3)
+        _read_all(meter)
+
+        self.assertEqual(3.0, meter.producer_wait)
+        self.assertEqual(4.0, meter.upload_wait)
+        # Published after the reads ending at 4s and 7s (the last, empty,
+        # read).
+        self.assertEqual(2, publish.call_count)
+
+    def test_publish_failure_is_ignored(self):
+        publish = Mock(side_effect=Exception('conductor is down'))
+        meter = BackupMeter(FakeRunner(b'x' * 1000), publish=publish,
+                            interval=1)
+        meter._last_publish -= 10
+
+        with patch('trove.guestagent.backup.metering.LOG'):
+            _read_all(meter)
+        self.assertEqual(1000, meter.bytes_read)
+
+    def test_metadata_has_summary(self):
+        meter = BackupMeter(FakeRunner(b'x' * 1000), interval=0)
+        _read_all(meter)
+
+        metadata = meter.metadata()
+        self.assertEqual('1234', metadata['lsn'])
+        self.assertEqual('1000', metadata['meter_bytes_read'])
+
+
+class BackupMeterSwiftTest(trove_testtools.TestCase):
+
+    def setUp(self):
+        super(BackupMeterSwiftTest, self).setUp()
+        self.max_file_size = swift.MAX_FILE_SIZE
+        swift.MAX_FILE_SIZE = 128
+        self.addCleanup(setattr, swift, 'MAX_FILE_SIZE', self.max_file_size)
+        self.context = trove_testtools.TroveTestContext(self)
+
+    def _save(self):
+        swift_client = FakeSwiftConnection()
+        with patch.object(remote, 'create_swift_client',
+                          return_value=swift_client):
+            storage = SwiftStorage(self.context)
+            meter = BackupMeter(FakeRunner(b'x' * 1000), interval=0)
+            success, note, checksum, location = storage.save(
+                'backup.xbstream.gz', meter)
+        self.assertTrue(success)
+        return meter
+
+    def test_serial_upload_is_metered(self):
+        meter = self._save()
+
+        self.assertTrue(meter.segments >= 8)
+        self.assertEqual(1000, meter.segment_bytes)
+
+    def test_parallel_upload_is_metered(self):
+        self.patch_conf_property('backup_segment_upload_concurrency', 3)
+        meter = self._save()
+
+        self.assertTrue(meter.segments >= 8)
+        self.assertEqual(1000, meter.segment_bytes)
@@ -13,8 +13,14 @@
 # limitations under the License.
 
 import hashlib
+import io
+import json
+import os
+import shutil
+import tempfile
 
 from mock import Mock, MagicMock, patch
+from swiftclient.client import ClientException
 
 from trove.common import remote
 from trove.common.strategies.storage import swift
@@ -167,6 +173,268 @@ class SwiftStorageSaveChecksumTests(trove_testtools.TestCase):
                          "Incorrect swift location was returned.")
 
 
+class SwiftStorageParallelSaveTests(trove_testtools.TestCase):
+    """SwiftStorage.save with concurrent segment uploads."""
+
+    def setUp(self):
+        super(SwiftStorageParallelSaveTests, self).setUp()
+        self.max_file_size = swift.MAX_FILE_SIZE
+        swift.MAX_FILE_SIZE = 128
+        self.patch_conf_property('backup_segment_upload_concurrency', 4)
+        self.context = trove_testtools.TroveTestContext(self)
+        sleep_patch = patch('eventlet.sleep')
+        self.mock_sleep = sleep_patch.start()
+        self.addCleanup(sleep_patch.stop)
+
+    def tearDown(self):
+        swift.MAX_FILE_SIZE = self.max_file_size
+        super(SwiftStorageParallelSaveTests, self).tearDown()
+
+    def _save(self, swift_client, backup_id):
+        with patch.object(remote, 'create_swift_client',
+                          return_value=swift_client):
+            storage_strategy = SwiftStorage(self.context)
+            with MockBackupRunner(filename=backup_id,
+                                  user='user',
+                                  password='password') as runner:
+                return storage_strategy.save(runner.manifest, runner)
+
+    def test_parallel_checksum_save(self):
+        swift_client = FakeSwiftConnection()
+        swift_client.put_object = MagicMock(
+            side_effect=swift_client.put_object)
+        (success,
+         note,
+         checksum,
+         location) = self._save(swift_client, '123')
+
+        self.assertTrue(success, "The backup should have been successful.")
+        self.assertEqual('http://mockswift/v1/database_backups/123.gz.enc',
+                         location)
+        # The manifest lists every segment in order and is written last.
+        manifest_call = swift_client.put_object.call_args_list[-1]
+        self.assertEqual('multipart-manifest=put',
+                         manifest_call[1]['query_string'])
+        segments = json.loads(manifest_call[0][2])
+        self.assertTrue(len(segments) > 1)
+        self.assertEqual(
+            ['database_backups/123_%08d' % i for i in range(len(segments))],
+            [segment['path'] for segment in segments])
+        expected = hashlib.md5()
+        for segment in segments:
+            name = segment['path'].split('/')[1]
+            content = swift_client.container_objects[name]
+            self.assertEqual(hashlib.md5(content).hexdigest(),
+                             segment['etag'])
+            self.assertEqual(len(content), segment['size_bytes'])
+            expected.update(segment['etag'].encode())
+        self.assertEqual(expected.hexdigest(), checksum)
+
+    def test_parallel_small_file_save(self):
+        swift.MAX_FILE_SIZE = 2 * (1024 ** 3)
+        swift_client = FakeSwiftConnection()
+        (success,
+         note,
+         checksum,
+         location) = self._save(swift_client, '123')
+
+        self.assertTrue(success, "The backup should have been successful.")
+        self.assertEqual(
+            hashlib.md5(swift_client.container_objects['123.gz.enc'])
+            .hexdigest(), checksum)
+
+    @patch('trove.common.strategies.storage.swift.LOG')
+    def test_parallel_segment_etag_mismatch(self, mock_logging):
+        swift_client = FakeSwiftConnection()
+        swift_client.put_object = MagicMock(
+            side_effect=swift_client.put_object)
+        (success,
+         note,
+         checksum,
+         location) = self._save(swift_client, 'bad_segment_etag_123')
+
+        self.assertFalse(success, "The backup should have failed!")
+        self.assertTrue(note.startswith("Error saving data to Swift!"))
+        self.assertIsNone(checksum)
+        for call in swift_client.put_object.call_args_list:
+            self.assertNotEqual('multipart-manifest=put',
+                                call[1].get('query_string'))
+
+    @patch('trove.common.strategies.storage.swift.LOG')
+    def test_parallel_upload_error(self, mock_logging):
+        swift_client = FakeSwiftConnection()
+        swift_client.put_object = MagicMock(
+            side_effect=ClientException('upload failed'))
+        swift_client.delete_object = MagicMock()
+
+        self.assertRaises(ClientException,
+                          self._save, swift_client, '123')
+        # The uploads were retried, then the orphaned segments deleted.
+        self.assertTrue(swift_client.put_object.call_count >= 4)
+        swift_client.delete_object.assert_any_call('database_backups',
+                                                   '123_00000000')
+
+    @patch('trove.common.strategies.storage.swift.LOG')
+    def test_parallel_upload_retried(self, mock_logging):
+        swift_client = FakeSwiftConnection()
+        put_object = swift_client.put_object
+        errors = [ClientException('upload failed')]
+
+        def _flaky_put_object(container, name, contents, **kwargs):
+            if name == '123_00000001' and errors:
+                contents.read(10)
+                raise errors.pop()
+            return put_object(container, name, contents, **kwargs)
+        swift_client.put_object = _flaky_put_object
+
+        (success,
+         note,
+         checksum,
+         location) = self._save(swift_client, '123')
+
+        self.assertTrue(success, "The backup should have been successful.")
+        self.assertEqual(128, len(swift_client.container_objects[
+            '123_00000001']))
+        self.mock_sleep.assert_called_once_with(2)
+
+
+class FixedBackupStream(object):
+    """A backup stream that is identical every time it is run."""
+
+    def __init__(self, data):
+        self.stream = io.BytesIO(data)
+
+    def read(self, chunk_size):
+        return self.stream.read(chunk_size)
+
+    def metadata(self):
+        return {}
+
+
+class SwiftStorageResumeTests(trove_testtools.TestCase):
+    """SwiftStorage.save with a segment journal."""
+
+    def setUp(self):
+        super(SwiftStorageResumeTests, self).setUp()
+        self.max_file_size = swift.MAX_FILE_SIZE
+        swift.MAX_FILE_SIZE = 128
+        self.addCleanup(setattr, swift, 'MAX_FILE_SIZE', self.max_file_size)
+        self.journal_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.journal_dir)
+        self.patch_conf_property('backup_journal_dir', self.journal_dir)
+        self.patch_conf_property('backup_segment_upload_retries', 0)
+        self.context = trove_testtools.TroveTestContext(self)
+        self.data = os.urandom(1000)
+        self.swift_client = FakeSwiftConnection()
+        self.put_object = self.swift_client.put_object
+        self.swift_client.put_object = MagicMock(
+            side_effect=self.put_object)
+        self.swift_client.delete_object = MagicMock()
+
+    def _save(self, data):
+        with patch.object(remote, 'create_swift_client',
+                          return_value=self.swift_client):
+            storage_strategy = SwiftStorage(self.context)
+            return storage_strategy.save('123.xbstream',
+                                         FixedBackupStream(data))
+
+    def _uploaded(self):
+        return [call[0][1] for call in
+                self.swift_client.put_object.call_args_list]
+
+    @patch('trove.common.strategies.storage.swift.LOG')
+    def test_resume_after_failure(self, mock_logging):
+        def _fail_segment_5(container, name, contents, **kwargs):
+            if name == '123_00000005':
+                raise ClientException('upload failed')
+            return self.put_object(container, name, contents, **kwargs)
+        self.swift_client.put_object.side_effect = _fail_segment_5
+
+        self.assertRaises(ClientException, self._save, self.data)
+        # The segments are kept for the retry.
+        self.assertFalse(self.swift_client.delete_object.called)
+        self.assertTrue(os.listdir(self.journal_dir))
+
+        self.swift_client.put_object = MagicMock(side_effect=self.put_object)
+        success, note, checksum, location = self._save(self.data)
+
+        self.assertTrue(success)
+        self.assertEqual(['123_00000005', '123_00000006', '123_00000007',
+                          '123_00000008', '123.xbstream'],
+                         self._uploaded())
+        self.assertEqual([], os.listdir(self.journal_dir))
+
+    @patch('trove.common.strategies.storage.swift.LOG')
+    def test_resume_with_changed_stream(self, mock_logging):
+        self.swift_client.put_object.side_effect = ClientException('failed')
+        self.assertRaises(ClientException, self._save, self.data)
+        with open(os.path.join(self.journal_dir, '123.xbstream.journal'),
+                  'w') as journal:
+            for number in range(12):
+                journal.write(json.dumps({
+                    'name': '123_%08d' % number, 'size_bytes': 128,
+                    'checksum': 'not-the-same'}) + '\n')
+            # Interrupted while writing the last line.
+            journal.write('{"name": "123_000')
+
+        self.swift_client.put_object = MagicMock(side_effect=self.put_object)
+        success, note, checksum, location = self._save(self.data)
+
+        self.assertTrue(success)
+        self.assertEqual(10, len(self._uploaded()))
+        # The segments left over from the longer, earlier attempt.
+        self.swift_client.delete_object.assert_any_call('database_backups',
+                                                        '123_00000011')
+
+    @patch('trove.common.strategies.storage.swift.LOG')
+    def test_discard_after_failure(self, mock_logging):
+        def _fail_segment_5(container, name, contents, **kwargs):
+            if name == '123_00000005':
+                raise ClientException('upload failed')
+            return self.put_object(container, name, contents, **kwargs)
+        self.swift_client.put_object.side_effect = _fail_segment_5
+        self.assertRaises(ClientException, self._save, self.data)
+
+        with patch.object(remote, 'create_swift_client',
+                          return_value=self.swift_client):
+            SwiftStorage(self.context).discard('123.xbstream')
+
+        for number in range(5):
+            self.swift_client.delete_object.assert_any_call(
+                'database_backups', '123_%08d' % number)
+        self.assertEqual([], os.listdir(self.journal_dir))
+
+    @patch('trove.common.strategies.storage.swift.LOG')
+    def test_leftovers(self, mock_logging):
+        with patch.object(remote, 'create_swift_client',
+                          return_value=self.swift_client):
+            storage = SwiftStorage(self.context)
+        self.assertEqual([], storage.leftovers())
+
+        def _fail_segment_5(container, name, contents, **kwargs):
+            if name == '123_00000005':
+                raise ClientException('upload failed')
+            return self.put_object(container, name, contents, **kwargs)
+        self.swift_client.put_object.side_effect = _fail_segment_5
+        self.assertRaises(ClientException, self._save, self.data)
+        self.assertEqual(['123.xbstream'], storage.leftovers())
+
+        storage.discard('123.xbstream')
+        self.assertEqual([], storage.leftovers())
+
+    def test_segments_deleted_without_journal(self):
+        self.patch_conf_property('backup_journal_dir', None)
+
+        with patch.object(SwiftStorage, '_check_segment_etag',
+                          side_effect=[True, True, False]):
+            success, note, checksum, location = self._save(self.data)
+
+        self.assertFalse(success)
+        for number in range(3):
+            self.swift_client.delete_object.assert_any_call(
+                'database_backups', '123_%08d' % number)
+
+
 class SwiftStorageUtils(trove_testtools.TestCase):
 
     def setUp(self):
@@ -252,6 +520,71 @@ class SwiftStorageLoad(trove_testtools.TestCase):
                           backup_checksum)
 
 
+class SwiftStorageParallelLoadTests(trove_testtools.TestCase):
+    """SwiftStorage.load with concurrent segment downloads."""
+
+    def setUp(self):
+        super(SwiftStorageParallelLoadTests, self).setUp()
+        self.max_file_size = swift.MAX_FILE_SIZE
+        self.context = trove_testtools.TroveTestContext(self)
+        self.swift_client = FakeSwiftConnection()
+        self.create_swift_client_patch = patch.object(
+            remote, 'create_swift_client',
+            MagicMock(return_value=self.swift_client))
+        self.create_swift_client_patch.start()
+        self.addCleanup(self.create_swift_client_patch.stop)
+        self.swift = SwiftStorage(self.context)
+
+    def tearDown(self):
+        swift.MAX_FILE_SIZE = self.max_file_size
+        super(SwiftStorageParallelLoadTests, self).tearDown()
+
+    def _save(self, max_file_size):
+        swift.MAX_FILE_SIZE = max_file_size
+        with MockBackupRunner(filename='123', user='user',
+                              password='password') as runner:
+            (success,
+             note,
+             checksum,
+             location) = self.swift.save(runner.manifest, runner)
+        self.assertTrue(success)
+        self.patch_conf_property('backup_segment_download_concurrency', 3)
+        return checksum, location
+
+    def test_load_large_object(self):
+        checksum, location = self._save(128)
+        segments = sorted(name for name in self.swift_client.container_objects
+                          if name.startswith('123_'))
+        self.assertTrue(len(segments) > 3)
+        expected = b''.join(self.swift_client.container_objects[name]
+                            for name in segments)
+
+        stream = self.swift.load(location, checksum)
+        self.assertEqual(expected, b''.join(stream))
+
+    def test_load_single_object_ranges(self):
+        self.patch_conf_property('backup_chunk_size', 16)
+        with patch.object(swift, 'CHUNK_SIZE', 16):
+            checksum, location = self._save(2 * (1024 ** 3))
+            expected = self.swift_client.container_objects['123.gz.enc']
+            get_object = MagicMock(side_effect=self.swift_client.get_object)
+            with patch.object(self.swift_client, 'get_object', get_object):
+                stream = self.swift.load(location, checksum)
+                self.assertEqual(expected, b''.join(stream))
+        ranges = [call[1]['headers']['Range']
+                  for call in get_object.call_args_list]
+        self.assertEqual(3, len(ranges))
+
+    @patch('trove.common.strategies.storage.swift.LOG')
+    def test_load_segment_checksum_mismatch(self, mock_logging):
+        checksum, location = self._save(128)
+        self.swift_client.container_objects['123_00000001'] = b'corrupt'
+        self.patch_conf_property('verify_swift_checksum_on_restore', False)
+
+        stream = self.swift.load(location, checksum)
+        self.assertRaises(SwiftDownloadIntegrityError, b''.join, stream)
+
+
 class MockBackupStream(MockBackupRunner):
 
     def read(self, chunk_size):
@@ -109,6 +109,24 @@ class ClusterViewTest(trove_testtools.TestCase):
                   1, 3)
         test_case(['query_router', 'member'], ['member'], 2, 1)
 
+    @patch.object(ClusterView, '_build_flavor_info')
+    def test__build_instances_unavailable(self, *args):
+        cluster = Mock()
+        cluster.instances = [Mock(load_error=None, shard_id=None),
+                             Mock(load_error='Could not be loaded.',
+                                  shard_id=None, status='ERROR')]
+        for instance in cluster.instances:
+            instance.type = 'member'
+            instance.get_visible_ip_addresses = lambda: []
+            instance.datastore_version.manager = 'mongodb'
+
+        view = ClusterView(cluster, MagicMock())
+        instances, ip_list = view._build_instances([], ['member'])
+
+        self.assertNotIn('error', instances[0])
+        self.assertEqual('Could not be loaded.', instances[1]['error'])
+        self.assertEqual('ERROR', instances[1]['status'])
+
 
 class ClusterInstanceDetailViewTest(trove_testtools.TestCase):
 
@@ -0,0 +1,97 @@
+# Copyright 2016 Tesora Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import eventlet
+from mock import Mock, patch
+
+from trove.common.cache import StaleWhileRevalidateCache
+from trove.tests.unittests import trove_testtools
+
+
+class StaleWhileRevalidateCacheTest(trove_testtools.TestCase):
+
+    def setUp(self):
+        super(StaleWhileRevalidateCacheTest, self).setUp()
+        self.cache = StaleWhileRevalidateCache(ttl=10, stale_ttl=20, size=2)
+        time_patcher = patch('trove.common.cache.time')
+        self.mock_time = time_patcher.start()
+        self.addCleanup(time_patcher.stop)
+        self.now = 1000
+        self.mock_time.time.side_effect = lambda: self.now
+
+    def test_fresh_value_is_cached(self):
+        load = Mock(side_effect=[1, 2])
+        self.assertEqual(1, self.cache.get('key', load))
+        self.now += 10
+        self.assertEqual(1, self.cache.get('key', load))
+        self.assertEqual(1, load.call_count)
+
+    def test_stale_value_is_refreshed_in_background(self):
+        load = Mock(side_effect=[1, 2])
+        self.cache.get('key', load)
+        self.now += 15
+
+        self.assertEqual(1, self.cache.get('key', load))
+        # A second caller does not start another refresh.
+        self.assertEqual(1, self.cache.get('key', load))
+        eventlet.sleep(0)
+        self.assertEqual(2, self.cache.get('key', load))
+        self.assertEqual(2, load.call_count)
+
+    def test_expired_value_is_loaded(self):
+        load = Mock(side_effect=[1, 2])
+        self.cache.get('key', load)
+        self.now += 31
+        self.assertEqual(2, self.cache.get('key', load))
+
+    def test_bypass(self):
+        load = Mock(side_effect=[1, 2, 3])
+        self.cache.get('key', load)
+        self.assertEqual(2, self.cache.get('key', load, use_cache=False))
+        # The fresh value is cached for the next callers.
+        self.assertEqual(2, self.cache.get('key', load))
+
+    def test_failed_refresh_drops_value(self):
+        load = Mock(side_effect=[1, Exception('nova is down'), 3])
+        self.cache.get('key', load)
+        self.now += 15
+        with patch('trove.common.cache.LOG'):
+            self.assertEqual(1, self.cache.get('key', load))
+            eventlet.sleep(0)
+        self.assertEqual(0, len(self.cache))
+        self.assertEqual(3, self.cache.get('key', load))
+
+    def test_refresh_does_not_undo_invalidate(self):
+        load = Mock(side_effect=[1, 2])
+        self.cache.get('key', load)
+        self.now += 15
+        self.cache.get('key', load)
+        self.cache.invalidate('key')
+        eventlet.sleep(0)
+        self.assertEqual(0, len(self.cache))
+
+    def test_evicts_least_recently_used(self):
+        self.cache.get('a', lambda: 'a')
+        self.cache.get('b', lambda: 'b')
+        self.cache.get('a', lambda: 'new a')
+        self.cache.get('c', lambda: 'c')
+        self.assertEqual('a', self.cache.get('a', lambda: 'new a'))
+        self.assertEqual('new b', self.cache.get('b', lambda: 'new b'))
+
+    def test_disabled(self):
+        cache = StaleWhileRevalidateCache(ttl=0, stale_ttl=20, size=2)
+        load = Mock(side_effect=[1, 2])
+        cache.get('key', load)
+        self.assertEqual(2, cache.get('key', load))
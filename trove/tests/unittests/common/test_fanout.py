@@ -0,0 +1,72 @@
+# Copyright 2016 Tesora Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import eventlet
+
+from trove.common import exception
+from trove.common.fanout import fan_out
+from trove.tests.unittests import trove_testtools
+
+
+class FanOutTest(trove_testtools.TestCase):
+
+    def test_results_are_in_order(self):
+        def call(value, delay):
+            eventlet.sleep(delay)
+            return value
+
+        results = fan_out([lambda: call(1, 0.02), lambda: call(2, 0),
+                           lambda: call(3, 0.01)])
+        self.assertEqual([1, 2, 3], results)
+
+    def test_no_calls(self):
+        self.assertEqual([], fan_out([]))
+
+    def test_failures_are_returned(self):
+        error = exception.NotFound(uuid='1')
+
+        def fail():
+            raise error
+
+        self.assertEqual([1, error, 3],
+                         fan_out([lambda: 1, fail, lambda: 3]))
+
+    def test_concurrency_is_bounded(self):
+        self.patch_conf_property('api_fanout_concurrency', 2)
+        running = []
+        peak = [0]
+
+        def call():
+            running.append(None)
+            peak[0] = max(peak[0], len(running))
+            eventlet.sleep(0.01)
+            running.pop()
+
+        fan_out([call] * 5)
+        self.assertEqual(2, peak[0])
+
+    def test_deadline_is_shared(self):
+        def call(delay):
+            eventlet.sleep(delay)
+            return delay
+
+        # The second call only starts once the first one is done, and gets
+        # what is left of the deadline.
+        results = fan_out([lambda: call(0.06), lambda: call(0.06),
+                           lambda: call(0)],
+                          concurrency=1, timeout=0.1)
+        self.assertEqual(0.06, results[0])
+        self.assertIsInstance(results[1], exception.FanOutTimeout)
+        self.assertIsInstance(results[2], exception.FanOutTimeout)
@@ -13,7 +13,9 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 #
+from mock import patch
 from testtools.matchers import Equals, Is, Not
+from trove.common import exception
 from trove.common import wsgi
 from trove.tests.unittests import trove_testtools
 import webob
@@ -40,3 +42,102 @@ class TestWsgi(trove_testtools.TestCase):
         self.assertThat(ctx.user, Equals(user_id))
         self.assertThat(ctx.auth_token, Equals(token))
         self.assertEqual(0, len(ctx.service_catalog))
+
+
+class FakeController(wsgi.Controller):
+
+    def __init__(self):
+        self.shown = 0
+
+    def show(self, req, id):
+        etag = wsgi.etag(req, [id])
+        wsgi.check_etag(req, etag)
+        self.shown += 1
+        return wsgi.Result({'thing': {'id': id}}, 200, etag=etag)
+
+
+class TestEtag(trove_testtools.TestCase):
+
+    def setUp(self):
+        super(TestEtag, self).setUp()
+        self.controller = FakeController()
+        self.resource = self.controller.create_resource()
+
+    def _get(self, if_none_match=None, id='1'):
+        req = webob.Request.blank('/things/%s' % id)
+        req.environ['wsgiorg.routing_args'] = (
+            (), {'action': 'show', 'id': id})
+        if if_none_match:
+            req.headers['If-None-Match'] = if_none_match
+        return req.get_response(self.resource)
+
+    def test_etag(self):
+        response = self._get()
+
+        self.assertEqual(200, response.status_int)
+        self.assertIsNotNone(response.etag)
+        self.assertEqual(response.etag, self._get().etag)
+        self.assertNotEqual(response.etag, self._get(id='2').etag)
+
+    def test_not_modified(self):
+        etag = self._get().etag
+        response = self._get('"%s"' % etag)
+
+        self.assertEqual(304, response.status_int)
+        self.assertEqual(etag, response.etag)
+        self.assertEqual(b'', response.body)
+        self.assertEqual(1, self.controller.shown)
+
+    def test_modified(self):
+        response = self._get('"other"')
+
+        self.assertEqual(200, response.status_int)
+        self.assertEqual(1, self.controller.shown)
+
+    @patch.object(wsgi.time, 'time')
+    def test_max_age(self, mock_time):
+        req = wsgi.Request.blank('/things/1')
+        mock_time.return_value = 100
+        etag = wsgi.etag(req, ['1'], max_age=60)
+        mock_time.return_value = 119
+        self.assertEqual(etag, wsgi.etag(req, ['1'], max_age=60))
+        mock_time.return_value = 120
+        self.assertNotEqual(etag, wsgi.etag(req, ['1'], max_age=60))
+
+
+class ValidatedController(FakeController):
+
+    schemas = {
+        'create': {
+            "type": "object",
+            "required": ["thing"],
+            "properties": {"thing": {"type": "string"}}
+        },
+        'action': {'resize': {"type": "object"}}
+    }
+
+
+class TestValidation(trove_testtools.TestCase):
+
+    def setUp(self):
+        super(TestValidation, self).setUp()
+        self.controller = ValidatedController()
+        patcher = patch.dict(wsgi._validators, clear=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_validators_are_built_once(self):
+        with patch.object(wsgi.jsonschema, 'Draft4Validator',
+                          wraps=wsgi.jsonschema.Draft4Validator) as mock_v:
+            self.controller.create_resource()
+            self.assertEqual(2, mock_v.call_count)
+            self.controller.validate_request(
+                'create', {'body': {'thing': 'x'}})
+        self.assertEqual(2, mock_v.call_count)
+
+    def test_invalid_body(self):
+        with patch.object(wsgi, 'LOG'):
+            error = self.assertRaises(
+                exception.BadRequest, self.controller.validate_request,
+                'create', {'body': {'thing': 1}})
+        self.assertIn("thing 1 is not of type 'string'", str(error))
@@ -19,7 +19,10 @@ from trove.backup import state
 from trove.common import exception as t_exception
 from trove.common.instance import ServiceStatuses
 from trove.common import utils
+from trove.conductor.heartbeat import HeartbeatBatcher
 from trove.conductor import manager as conductor_manager
+from trove.conductor import models as conductor_models
+from trove.conductor.models import LastSeen
 from trove.guestagent.common import timeutils
 from trove.instance import models as t_models
 from trove.tests.unittests import trove_testtools
@@ -36,17 +39,18 @@ class ConductorMethodTests(trove_testtools.TestCase):
         bkup_models.DBBackup.save = OLD_DBB_SAVE
         super(ConductorMethodTests, self).setUp()
         util.init_db()
+        conductor_models.cache.clear()
         self.cond_mgr = conductor_manager.Manager()
         self.instance_id = utils.generate_uuid()
 
     def tearDown(self):
         super(ConductorMethodTests, self).tearDown()
 
-    def _create_iss(self):
+    def _create_iss(self, instance_id=None):
         new_id = utils.generate_uuid()
         iss = t_models.InstanceServiceStatus(
             id=new_id,
-            instance_id=self.instance_id,
+            instance_id=instance_id or self.instance_id,
             status=ServiceStatuses.NEW)
         iss.save()
         return new_id
@@ -109,6 +113,178 @@ class ConductorMethodTests(trove_testtools.TestCase):
         iss = self._get_iss(iss_id)
         self.assertEqual(ServiceStatuses.BUILDING, iss.status)
 
+    # --- Tests for batched heartbeats ---
+
+    def _batch_heartbeats(self, batch_size=100):
+        batcher = HeartbeatBatcher(self.cond_mgr._apply_heartbeat,
+                                   interval=60, batch_size=batch_size)
+        self.cond_mgr.heartbeats = batcher
+        self.addCleanup(batcher.flush)
+        return batcher
+
+    @patch('trove.conductor.heartbeat.LOG')
+    @patch('trove.conductor.manager.LOG')
+    def test_heartbeat_batched(self, *mocks):
+        batcher = self._batch_heartbeats()
+        other_id = utils.generate_uuid()
+        iss_id = self._create_iss()
+        other_iss_id = self._create_iss(other_id)
+        now = timeutils.float_utcnow()
+        build_p = {'service_status': ServiceStatuses.BUILDING.description}
+        run_p = {'service_status': ServiceStatuses.RUNNING.description}
+
+        self.cond_mgr.heartbeat(None, self.instance_id, build_p, sent=now)
+        self.cond_mgr.heartbeat(None, other_id, build_p, sent=now)
+        self.cond_mgr.heartbeat(None, self.instance_id, run_p, sent=now + 1)
+        self.assertEqual(2, batcher.queue_depth)
+        self.assertEqual(ServiceStatuses.NEW, self._get_iss(iss_id).status)
+
+        batcher.flush()
+        self.assertEqual(0, batcher.queue_depth)
+        self.assertEqual(ServiceStatuses.RUNNING,
+                         self._get_iss(iss_id).status)
+        self.assertEqual(ServiceStatuses.BUILDING,
+                         self._get_iss(other_iss_id).status)
+        seen = LastSeen.load(instance_id=self.instance_id,
+                             method_name='heartbeat')
+        self.assertEqual(now + 1, float(seen.sent))
+
+        # The last seen timestamps are updated by the next flush.
+        self.cond_mgr.heartbeat(None, self.instance_id, build_p, sent=now + 2)
+        batcher.flush()
+        self.assertEqual(ServiceStatuses.BUILDING,
+                         self._get_iss(iss_id).status)
+        seen = LastSeen.load(instance_id=self.instance_id,
+                             method_name='heartbeat')
+        self.assertEqual(now + 2, float(seen.sent))
+
+        stats = batcher.stats()
+        self.assertEqual(4, stats['received'])
+        self.assertEqual(1, stats['coalesced'])
+        self.assertEqual(2, stats['flushes'])
+        self.assertEqual(0, stats['flush_errors'])
+
+    @patch('trove.conductor.heartbeat.LOG')
+    def test_heartbeat_batched_keeps_newest(self, mock_logging):
+        batcher = self._batch_heartbeats()
+        iss_id = self._create_iss()
+        now = timeutils.float_utcnow()
+        build_p = {'service_status': ServiceStatuses.BUILDING.description}
+        run_p = {'service_status': ServiceStatuses.RUNNING.description}
+
+        batcher.add(self.instance_id, run_p, sent=now)
+        batcher.add(self.instance_id, build_p, sent=now - 60)
+        batcher.flush()
+        self.assertEqual(ServiceStatuses.RUNNING,
+                         self._get_iss(iss_id).status)
+
+        # Messages older than the last one applied are discarded.
+        batcher.add(self.instance_id, build_p, sent=now - 30)
+        batcher.flush()
+        self.assertEqual(ServiceStatuses.RUNNING,
+                         self._get_iss(iss_id).status)
+        self.assertEqual(1, batcher.discarded)
+
+    @patch('trove.conductor.heartbeat.LOG')
+    def test_heartbeat_batched_same_timestamp(self, mock_logging):
+        batcher = self._batch_heartbeats()
+        iss_id = self._create_iss()
+        now = timeutils.float_utcnow()
+        build_p = {'service_status': ServiceStatuses.BUILDING.description}
+        run_p = {'service_status': ServiceStatuses.RUNNING.description}
+
+        batcher.add(self.instance_id, build_p, sent=now)
+        batcher.flush()
+        # A message sent at the same time as the last one seen is applied.
+        batcher.add(self.instance_id, run_p, sent=now)
+        batcher.flush()
+        self.assertEqual(ServiceStatuses.RUNNING,
+                         self._get_iss(iss_id).status)
+        self.assertEqual(0, batcher.discarded)
+        self.assertEqual(0, batcher.flush_errors)
+
+    @patch('trove.conductor.heartbeat.LOG')
+    def test_heartbeat_batched_status_not_lost(self, mock_logging):
+        batcher = self._batch_heartbeats()
+        iss_id = self._create_iss()
+        now = timeutils.float_utcnow()
+        run_p = {'service_status': ServiceStatuses.RUNNING.description}
+
+        batcher.add(self.instance_id, run_p, sent=now)
+        batcher.add(self.instance_id, {}, sent=now + 1)
+        batcher.flush()
+        self.assertEqual(ServiceStatuses.RUNNING,
+                         self._get_iss(iss_id).status)
+
+    def test_heartbeat_batched_bogus_status(self):
+        batcher = self._batch_heartbeats()
+        self.assertRaises(ValueError, self.cond_mgr.heartbeat,
+                          None, self.instance_id,
+                          {'service_status': 'potato salad'})
+        self.assertEqual(0, batcher.queue_depth)
+
+    @patch('trove.conductor.heartbeat.LOG')
+    def test_heartbeat_batch_size_flushes(self, mock_logging):
+        batcher = self._batch_heartbeats(batch_size=2)
+        iss_id = self._create_iss()
+        other_id = utils.generate_uuid()
+        self._create_iss(other_id)
+        run_p = {'service_status': ServiceStatuses.RUNNING.description}
+        now = timeutils.float_utcnow()
+
+        batcher.add(self.instance_id, run_p, sent=now)
+        self.assertEqual(1, batcher.queue_depth)
+        batcher.add(other_id, run_p, sent=now)
+        self.assertEqual(0, batcher.queue_depth)
+        self.assertEqual(ServiceStatuses.RUNNING,
+                         self._get_iss(iss_id).status)
+
+    @patch('trove.conductor.heartbeat.LOG')
+    @patch('trove.conductor.manager.LOG')
+    def test_heartbeat_batch_failure_applies_each(self, *mocks):
+        batcher = self._batch_heartbeats()
+        iss_id = self._create_iss()
+        run_p = {'service_status': ServiceStatuses.RUNNING.description}
+
+        batcher.add(self.instance_id, run_p, sent=timeutils.float_utcnow())
+        with patch('trove.db.sqlalchemy.api.bulk_update',
+                   side_effect=t_exception.DBConstraintError(
+                       model_name='bulk_update', error='duplicate')):
+            batcher.flush()
+        self.assertEqual(1, batcher.flush_errors)
+        self.assertEqual(ServiceStatuses.RUNNING,
+                         self._get_iss(iss_id).status)
+
+    @patch('trove.conductor.heartbeat.LOG')
+    @patch('trove.conductor.manager.LOG')
+    def test_heartbeat_batch_newer_seen_meanwhile(self, *mocks):
+        batcher = self._batch_heartbeats()
+        iss_id = self._create_iss()
+        now = timeutils.float_utcnow()
+        build_p = {'service_status': ServiceStatuses.BUILDING.description}
+        batcher.add(self.instance_id, build_p, sent=now)
+        batcher.flush()
+        self.assertEqual(0, batcher.flush_errors)
+
+        # Another worker applies a newer heartbeat after the batch loaded
+        # the last seen timestamps.
+        batcher.add(self.instance_id, build_p, sent=now + 1)
+        LastSeen._update_if_older(self.instance_id, 'heartbeat', now + 2)
+        iss = self._get_iss(iss_id)
+        iss.set_status(ServiceStatuses.RUNNING)
+        iss.save()
+        with patch('trove.db.sqlalchemy.api.find_all_in',
+                   return_value=[LastSeen(self.instance_id, 'heartbeat',
+                                          now)]):
+            batcher.flush()
+
+        self.assertEqual(1, batcher.flush_errors)
+        self.assertEqual(ServiceStatuses.RUNNING,
+                         self._get_iss(iss_id).status)
+        seen = LastSeen.load(instance_id=self.instance_id,
+                             method_name='heartbeat')
+        self.assertEqual(now + 2, float(seen.sent))
+
     # --- Tests for update_backup ---
 
     def test_backup_not_found(self):
@@ -144,6 +320,15 @@ class ConductorMethodTests(trove_testtools.TestCase):
         bkup = self._get_backup(bkup_id)
         self.assertEqual(new_name, bkup.name)
 
+    @patch('trove.conductor.manager.LOG')
+    def test_backup_progress_stored(self, mock_logging):
+        bkup_id = self._create_backup('progress')
+        progress = '{"bytes_read": 1024, "throughput": 512}'
+        self.cond_mgr.update_backup(None, self.instance_id, bkup_id,
+                                    progress=progress)
+        bkup = self._get_backup(bkup_id)
+        self.assertEqual(progress, bkup.progress)
+
     # --- Tests for discarding old messages ---
     @patch('trove.conductor.manager.LOG')
     def test_heartbeat_newer_timestamp_accepted(self, mock_logging):
@@ -166,11 +351,22 @@ class ConductorMethodTests(trove_testtools.TestCase):
         iss = self._get_iss(iss_id)
         now = timeutils.float_utcnow()
         past = now - 60
-        self.cond_mgr.heartbeat(None, self.instance_id, new_p, sent=past)
+        self.cond_mgr.heartbeat(None, self.instance_id, new_p, sent=now)
         self.cond_mgr.heartbeat(None, self.instance_id, build_p, sent=past)
         iss = self._get_iss(iss_id)
         self.assertEqual(ServiceStatuses.NEW, iss.status)
 
+    @patch('trove.conductor.manager.LOG')
+    def test_heartbeat_same_timestamp_accepted(self, mock_logging):
+        new_p = {'service_status': ServiceStatuses.NEW.description}
+        build_p = {'service_status': ServiceStatuses.BUILDING.description}
+        iss_id = self._create_iss()
+        now = timeutils.float_utcnow()
+        self.cond_mgr.heartbeat(None, self.instance_id, new_p, sent=now)
+        self.cond_mgr.heartbeat(None, self.instance_id, build_p, sent=now)
+        iss = self._get_iss(iss_id)
+        self.assertEqual(ServiceStatuses.BUILDING, iss.status)
+
     def test_backup_newer_timestamp_accepted(self):
         old_name = "oldname"
         new_name = "renamed"
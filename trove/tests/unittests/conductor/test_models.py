@@ -0,0 +1,127 @@
+# Copyright 2016 Tesora Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from mock import patch
+
+from trove.common import exception
+from trove.common import utils
+from trove.conductor import models
+from trove.conductor.models import LastSeen
+from trove.conductor.models import LastSeenCache
+from trove.db import get_db_api
+from trove.tests.unittests import trove_testtools
+from trove.tests.unittests.util import util
+
+
+class LastSeenCacheTest(trove_testtools.TestCase):
+
+    def test_evicts_least_recently_used(self):
+        cache = LastSeenCache(capacity=2)
+        cache.set('a', 'heartbeat', 1.0)
+        cache.set('b', 'heartbeat', 2.0)
+        self.assertEqual(1.0, cache.get('a', 'heartbeat'))
+        cache.set('c', 'heartbeat', 3.0)
+
+        self.assertEqual(2, len(cache))
+        self.assertIsNone(cache.get('b', 'heartbeat'))
+        self.assertEqual(1.0, cache.get('a', 'heartbeat'))
+        self.assertEqual(3.0, cache.get('c', 'heartbeat'))
+
+    def test_never_goes_back_in_time(self):
+        cache = LastSeenCache(capacity=2)
+        cache.set('a', 'heartbeat', 2.0)
+        cache.set('a', 'heartbeat', 1.0)
+        self.assertEqual(2.0, cache.get('a', 'heartbeat'))
+
+    def test_disabled(self):
+        self.patch_conf_property('conductor_lastseen_cache_size', 0)
+        cache = LastSeenCache()
+        cache.set('a', 'heartbeat', 1.0)
+        self.assertIsNone(cache.get('a', 'heartbeat'))
+
+
+class LastSeenTest(trove_testtools.TestCase):
+
+    def setUp(self):
+        super(LastSeenTest, self).setUp()
+        util.init_db()
+        models.cache.clear()
+        self.instance_id = utils.generate_uuid()
+
+    def _sent(self):
+        return float(LastSeen.load(instance_id=self.instance_id,
+                                   method_name='heartbeat').sent)
+
+    def test_advance(self):
+        self.assertTrue(LastSeen.advance(self.instance_id, 'heartbeat', 10))
+        self.assertTrue(LastSeen.advance(self.instance_id, 'heartbeat', 20))
+        self.assertFalse(LastSeen.advance(self.instance_id, 'heartbeat', 15))
+        self.assertEqual(20, self._sent())
+
+    def test_advance_same_timestamp(self):
+        self.assertTrue(LastSeen.advance(self.instance_id, 'heartbeat', 20))
+        # From the cache, and from the database.
+        self.assertTrue(LastSeen.advance(self.instance_id, 'heartbeat', 20))
+        models.cache.clear()
+        self.assertTrue(LastSeen.advance(self.instance_id, 'heartbeat', 20))
+        self.assertEqual(20, self._sent())
+
+    def test_late_message_discarded_from_cache(self):
+        LastSeen.advance(self.instance_id, 'heartbeat', 20)
+        with patch.object(LastSeen, 'load') as mock_load, patch(
+                'trove.db.sqlalchemy.api.update_if_lower') as mock_update:
+            self.assertFalse(
+                LastSeen.advance(self.instance_id, 'heartbeat', 15))
+        self.assertFalse(mock_load.called)
+        self.assertFalse(mock_update.called)
+
+    def test_newer_message_from_other_worker(self):
+        LastSeen.advance(self.instance_id, 'heartbeat', 10)
+        # Another conductor worker records a newer message.
+        get_db_api().update_if_lower(LastSeen, 'sent', 30,
+                                     instance_id=self.instance_id,
+                                     method_name='heartbeat')
+
+        # The cache is behind, but the database has the final say.
+        self.assertFalse(LastSeen.advance(self.instance_id, 'heartbeat', 20))
+        self.assertEqual(30, models.cache.get(self.instance_id, 'heartbeat'))
+        self.assertEqual(30, self._sent())
+
+    def _race_first_message(self, sent):
+        # Both workers miss the row and the other one creates it first.
+        real_create = LastSeen.create
+        loads = [None]
+
+        def load(**kwargs):
+            if loads:
+                return loads.pop()
+            return get_db_api().find_by(LastSeen, **kwargs)
+
+        def create(instance_id, method_name, sent):
+            real_create(instance_id, method_name, 30)
+            raise exception.DBConstraintError(model_name='LastSeen',
+                                              error='duplicate')
+
+        with patch.object(LastSeen, 'load', side_effect=load), \
+                patch.object(LastSeen, 'create', side_effect=create):
+            return LastSeen.advance(self.instance_id, 'heartbeat', sent)
+
+    def test_first_message_race_newer(self):
+        self.assertTrue(self._race_first_message(40))
+        self.assertEqual(40, self._sent())
+
+    def test_first_message_race_older(self):
+        self.assertFalse(self._race_first_message(20))
+        self.assertEqual(30, self._sent())
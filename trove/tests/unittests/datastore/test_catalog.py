@@ -0,0 +1,150 @@
+# Copyright 2016 Tesora Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from mock import patch
+from sqlalchemy import orm
+
+from trove.configuration.models import DatastoreConfigurationParameters
+from trove.datastore import models as datastore_models
+from trove.datastore.models import Capabilities
+from trove.datastore.models import Datastore
+from trove.datastore.models import DatastoreVersion
+from trove.datastore.models import DBDatastoreCatalog
+from trove.datastore.models import DBDatastoreVersion
+from trove.db import get_db_api
+from trove.tests.unittests.datastore.base import TestDatastoreBase
+
+
+class TestDatastoreCatalog(TestDatastoreBase):
+
+    def setUp(self):
+        super(TestDatastoreCatalog, self).setUp()
+        self.catalog = datastore_models.catalog
+        self.catalog.clear()
+        self.addCleanup(self.catalog.clear)
+
+    def _change_elsewhere(self, image_id):
+        # Change the version as another process would, without touching
+        # the cache of this one.
+        version = DBDatastoreVersion.find_by(id=self.test_id)
+        version.image_id = image_id
+        get_db_api().save(version)
+        get_db_api().increment(DBDatastoreCatalog, 'generation',
+                               id=self.catalog.ID)
+
+    def test_lookups_are_cached(self):
+        Datastore.load(self.ds_name)
+        DatastoreVersion.load(self.datastore, self.ds_version)
+        DatastoreVersion.load_by_uuid(self.test_id)
+        Capabilities.load(self.test_id)
+
+        with patch.object(datastore_models.DBDatastore, 'find_by') as ds, \
+                patch.object(DBDatastoreVersion, 'find_by') as version, \
+                patch.object(datastore_models.DBCapabilities,
+                             'find_all') as capabilities:
+            self.assertEqual(self.ds_name, Datastore.load(self.ds_name).name)
+            self.assertEqual(self.test_id, DatastoreVersion.load(
+                self.datastore, self.ds_version).id)
+            self.assertEqual(self.ds_version, DatastoreVersion.load_by_uuid(
+                self.test_id).name)
+            self.assertIn(self.capability_name,
+                          Capabilities.load(self.test_id))
+        self.assertFalse(ds.called)
+        self.assertFalse(version.called)
+        self.assertFalse(capabilities.called)
+
+    def test_lookups_return_copies(self):
+        version = DatastoreVersion.load_by_uuid(self.test_id)
+        version.db_info.image_id = 'changed-by-caller'
+        cached = self.catalog._entries[('datastore_version', self.test_id)]
+
+        self.assertIsNone(orm.object_session(cached))
+        self.assertEqual('', cached.image_id)
+        again = DatastoreVersion.load_by_uuid(self.test_id)
+        self.assertIsNot(cached, again.db_info)
+        self.assertEqual('', again.image_id)
+        again.db_info.image_id = 'changed-by-caller'
+        self.assertEqual(
+            '', DatastoreVersion.load_by_uuid(self.test_id).image_id)
+
+    def test_cached_copy_can_be_saved(self):
+        DatastoreVersion.load_by_uuid(self.test_id)
+        version = DatastoreVersion.load_by_uuid(self.test_id)
+        version.db_info.image_id = 'new-image'
+        version.db_info.save()
+
+        self.assertEqual('new-image', DBDatastoreVersion.find_by(
+            id=self.test_id).image_id)
+        self.assertEqual(
+            'new-image', DatastoreVersion.load_by_uuid(self.test_id).image_id)
+
+    def test_not_found_is_not_cached(self):
+        with patch.object(datastore_models.DBDatastore, 'find_by',
+                          side_effect=datastore_models.exception.
+                          ModelNotFoundError):
+            self.assertRaises(datastore_models.exception.DatastoreNotFound,
+                              Datastore.load, self.ds_name)
+        self.assertEqual(self.ds_name, Datastore.load(self.ds_name).name)
+
+    def test_change_in_process_is_seen_at_once(self):
+        DatastoreVersion.load_by_uuid(self.test_id)
+        datastore_models.update_datastore_version(
+            self.ds_name, self.ds_version, "mysql", "new-image", "", True)
+
+        self.assertEqual('new-image',
+                         DatastoreVersion.load_by_uuid(self.test_id).image_id)
+
+    def test_change_elsewhere_is_seen_after_ttl(self):
+        self.patch_conf_property('datastore_catalog_ttl', 60)
+        DatastoreVersion.load_by_uuid(self.test_id)
+        self._change_elsewhere('new-image')
+
+        self.assertEqual('', DatastoreVersion.load_by_uuid(
+            self.test_id).image_id)
+        self.catalog._checked -= 60
+        self.assertEqual('new-image', DatastoreVersion.load_by_uuid(
+            self.test_id).image_id)
+
+    def test_no_change_keeps_cache(self):
+        DatastoreVersion.load_by_uuid(self.test_id)
+        self.catalog._checked -= 60
+
+        with patch.object(DBDatastoreVersion, 'find_by') as version:
+            DatastoreVersion.load_by_uuid(self.test_id)
+        self.assertFalse(version.called)
+
+    def test_disabled(self):
+        self.patch_conf_property('datastore_catalog_ttl', 0)
+        DatastoreVersion.load_by_uuid(self.test_id)
+        self._change_elsewhere('new-image')
+
+        self.assertEqual('new-image',
+                         DatastoreVersion.load_by_uuid(self.test_id).image_id)
+        self.assertEqual(0, len(self.catalog._entries))
+
+    def test_configuration_parameters_are_invalidated(self):
+        self.assertEqual(
+            [], DatastoreConfigurationParameters.load_parameters(
+                self.test_id))
+        param = DatastoreConfigurationParameters.create(
+            name='max_connections' + self.rand_id,
+            datastore_version_id=self.test_id,
+            restart_required=False, data_type='integer',
+            max_size=10, min_size=1)
+        self.addCleanup(param.delete)
+
+        params = DatastoreConfigurationParameters.load_parameters(
+            self.test_id)
+        self.assertEqual([param.name], [p.name for p in params])
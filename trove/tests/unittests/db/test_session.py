@@ -0,0 +1,181 @@
+# Copyright 2016 Tesora Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import threading
+
+from mock import call, MagicMock, Mock, patch
+
+from trove.db.sqlalchemy import api
+from trove.db.sqlalchemy import session
+from trove.tests.unittests import trove_testtools
+
+
+class ReadRoutingTest(trove_testtools.TestCase):
+
+    def setUp(self):
+        super(ReadRoutingTest, self).setUp()
+        self.patch_conf_property('slave_connection', 'mysql://slave/trove',
+                                 section='database')
+        self.addCleanup(session.route_reads_to_slave, False)
+        state_patcher = patch.dict(session._SLAVE_STATE,
+                                   {'checked': 0, 'usable': False})
+        state_patcher.start()
+        self.addCleanup(state_patcher.stop)
+        writes_patcher = patch.dict(session._RECENT_WRITES, clear=True)
+        writes_patcher.start()
+        self.addCleanup(writes_patcher.stop)
+        self.engine = MagicMock()
+        self.engine.dialect.name = 'mysql'
+        self.status = {'Seconds_Behind_Master': 0}
+        self.connection = self.engine.connect.return_value
+        self.connection.execute.return_value.first.side_effect = (
+            lambda: self.status)
+        engine_patcher = patch.object(session, 'get_engine',
+                                      return_value=self.engine)
+        engine_patcher.start()
+        self.addCleanup(engine_patcher.stop)
+
+    def test_reads_not_routed_by_default(self):
+        self.assertFalse(session.reads_use_slave())
+
+    def test_reads_routed_until_write(self):
+        session.route_reads_to_slave(True)
+        self.assertTrue(session.reads_use_slave())
+        session.mark_written()
+        self.assertFalse(session.reads_use_slave())
+
+    def test_no_slave_configured(self):
+        self.patch_conf_property('slave_connection', None, section='database')
+        session.route_reads_to_slave(True)
+        self.assertFalse(session.reads_use_slave())
+
+    @patch.object(session, 'LOG')
+    def test_lagging_slave(self, mock_logging):
+        self.status = {'Seconds_Behind_Master': 600}
+        session.route_reads_to_slave(True)
+        self.assertFalse(session.reads_use_slave())
+
+    @patch.object(session, 'LOG')
+    def test_stopped_slave(self, mock_logging):
+        self.status = {'Seconds_Behind_Master': None}
+        session.route_reads_to_slave(True)
+        self.assertFalse(session.reads_use_slave())
+
+    @patch.object(session, 'LOG')
+    def test_unreachable_slave(self, mock_logging):
+        self.engine.connect.side_effect = Exception('unreachable')
+        session.route_reads_to_slave(True)
+        self.assertFalse(session.reads_use_slave())
+
+    @patch.object(session, 'LOG')
+    def test_slave_check_cached(self, mock_logging):
+        session.route_reads_to_slave(True)
+        self.assertTrue(session.reads_use_slave())
+        self.status = {'Seconds_Behind_Master': 600}
+        self.assertTrue(session.reads_use_slave())
+        self.assertEqual(1, self.engine.connect.call_count)
+
+        session._SLAVE_STATE['checked'] -= 60
+        self.assertFalse(session.reads_use_slave())
+
+    @patch.object(session, 'get_session')
+    def test_queries_use_slave(self, mock_get_session):
+        model = Mock()
+        session.route_reads_to_slave(True)
+        api.find_by(model, id='1')
+        mock_get_session.assert_called_with(use_slave=True)
+
+        api.save(model)
+        api.find_by(model, id='1')
+        mock_get_session.assert_called_with(use_slave=False)
+
+    @patch.object(session, 'get_session')
+    def test_create_then_show(self, mock_get_session):
+        model = Mock()
+        # POST /instances
+        session.route_reads_to_slave(False, tenant='tenant1')
+        api.save(model)
+
+        # GET /instances/<id>, served by another request of the tenant.
+        session.route_reads_to_slave(True, tenant='tenant1')
+        api.find_by(model, id='1')
+        mock_get_session.assert_called_with(use_slave=False)
+
+        # Other tenants still read from the slave.
+        session.route_reads_to_slave(True, tenant='tenant2')
+        api.find_by(model, id='1')
+        mock_get_session.assert_called_with(use_slave=True)
+
+    def _sessions(self, on_slave, on_master):
+        sessions = {True: MagicMock(), False: MagicMock()}
+        for use_slave, found in ((True, on_slave), (False, on_master)):
+            query = sessions[use_slave].query.return_value
+            query.filter_by.return_value.first.return_value = found
+        return lambda use_slave=False: sessions[use_slave]
+
+    @patch.object(session, 'get_session')
+    def test_create_then_show_on_another_worker(self, mock_get_session):
+        model = Mock()
+        row = Mock()
+        mock_get_session.side_effect = self._sessions(None, row)
+        # POST /instances, served by one API worker.
+        session.route_reads_to_slave(False, tenant='tenant1')
+        api.save(model)
+        found = []
+
+        def _show():
+            # GET /instances/<id>, served by another worker, which has its
+            # own routing state and has not seen the write.
+            with patch.object(session, '_RECENT_WRITES', {}):
+                session.route_reads_to_slave(True, tenant='tenant1')
+                found.append(api.find_by(model, id='1'))
+
+        thread = threading.Thread(target=_show)
+        thread.start()
+        thread.join()
+        self.assertEqual([row], found)
+        self.assertEqual([call(use_slave=True), call(use_slave=False)],
+                         mock_get_session.call_args_list[-2:])
+
+    @patch.object(session, 'get_session')
+    def test_found_on_slave(self, mock_get_session):
+        row = Mock()
+        mock_get_session.side_effect = self._sessions(row, None)
+        session.route_reads_to_slave(True, tenant='tenant1')
+        self.assertEqual(row, api.find_by(Mock(), id='1'))
+        mock_get_session.assert_called_once_with(use_slave=True)
+
+    def test_tenant_reads_from_slave_after_lag(self):
+        session.route_reads_to_slave(False, tenant='tenant1')
+        session.mark_written()
+
+        session.route_reads_to_slave(True, tenant='tenant1')
+        self.assertFalse(session.reads_use_slave())
+        # db_slave_max_lag plus db_slave_check_interval later.
+        session._RECENT_WRITES['tenant1'] -= 40
+        self.assertTrue(session.reads_use_slave())
+        self.assertEqual({}, session._RECENT_WRITES)
+
+    def test_recent_writes_bounded(self):
+        with patch.object(session, '_RECENT_WRITES_SIZE', 2):
+            for tenant in ('tenant1', 'tenant2'):
+                session.route_reads_to_slave(False, tenant=tenant)
+                session.mark_written()
+            session._RECENT_WRITES['tenant1'] -= 40
+            session.route_reads_to_slave(False, tenant='tenant3')
+            session.mark_written()
+
+        self.assertEqual(['tenant2', 'tenant3'],
+                         sorted(session._RECENT_WRITES))
@@ -222,6 +222,12 @@ class ApiTest(trove_testtools.TestCase):
         self._verify_call('get_diagnostics')
         self.assertThat(resp, Is('[all good]'))
 
+    def test_report_status(self):
+        self.api.report_status()
+
+        self._verify_rpc_prepare_before_cast()
+        self._verify_cast('report_status')
+
     def test_restart(self):
         self.api.restart()
 
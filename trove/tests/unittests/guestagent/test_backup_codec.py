@@ -0,0 +1,242 @@
+# Copyright 2016 Tesora Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import gzip
+import io
+import os
+
+import eventlet
+from mock import Mock, patch
+
+from trove.common import utils
+from trove.guestagent.common import backup_codec
+from trove.guestagent.strategies.backup import base as backupBase
+from trove.guestagent.strategies.backup.mysql_impl import MySqlApp
+from trove.guestagent.strategies.restore import base as restoreBase
+from trove.tests.unittests import trove_testtools
+
+BACKUP_XTRA_CLS = ("trove.guestagent.strategies.backup."
+                   "mysql_impl.InnoBackupEx")
+RESTORE_XTRA_CLS = ("trove.guestagent.strategies.restore."
+                    "mysql_impl.InnoBackupEx")
+
+
+def _read_all(stream, chunk_size=1000):
+    output = []
+    chunk = stream.read(chunk_size)
+    while chunk:
+        output.append(chunk)
+        chunk = stream.read(chunk_size)
+    return b''.join(output)
+
+
+def _chunks(data, chunk_size=777):
+    for start in range(0, len(data), chunk_size):
+        yield data[start:start + chunk_size]
+
+
+class BackupCodecTest(trove_testtools.TestCase):
+
+    def setUp(self):
+        super(BackupCodecTest, self).setUp()
+        self.patch_conf_property('backup_codec_block_size', 4096)
+        self.patch_conf_property('backup_codec_threads', 3)
+        # Compressible but not trivially so.
+        self.data = b''.join(os.urandom(16) * 64 for _i in range(40))
+
+    def _encode(self, codec):
+        return _read_all(codec.encoder(io.BytesIO(self.data)))
+
+    def test_gzip_roundtrip(self):
+        codec = backup_codec.StreamCodec(compression='gzip', key='key')
+        encoded = self._encode(codec)
+
+        self.assertTrue(len(encoded) < len(self.data))
+        self.assertEqual(self.data, b''.join(codec.decode(_chunks(encoded))))
+
+    def test_gzip_is_readable_by_gzip(self):
+        codec = backup_codec.StreamCodec(compression='gzip', key='key')
+        encoded = self._encode(codec)
+
+        gzip_file = gzip.GzipFile(fileobj=io.BytesIO(encoded))
+        self.assertEqual(self.data, gzip_file.read())
+
+    def test_encrypted_roundtrip(self):
+        codec = backup_codec.StreamCodec(compression='gzip',
+                                         encryption='aes-256-ctr', key='key')
+        encoded = self._encode(codec)
+
+        self.assertTrue(encoded.startswith(backup_codec.AesCtrCipher.magic))
+        self.assertEqual(self.data, b''.join(codec.decode(_chunks(encoded))))
+
+    def test_encrypted_only_roundtrip(self):
+        codec = backup_codec.StreamCodec(encryption='aes-256-ctr', key='key')
+        encoded = self._encode(codec)
+
+        self.assertEqual(len(self.data) +
+                         backup_codec.AesCtrCipher.header_size,
+                         len(encoded))
+        self.assertNotIn(self.data[:64], encoded)
+        self.assertEqual(self.data, b''.join(codec.decode(_chunks(encoded))))
+
+    def test_decrypt_with_wrong_key(self):
+        codec = backup_codec.StreamCodec(encryption='aes-256-ctr', key='key')
+        encoded = self._encode(codec)
+
+        other = backup_codec.StreamCodec(encryption='aes-256-ctr',
+                                         key='other')
+        self.assertNotEqual(self.data,
+                            b''.join(other.decode(_chunks(encoded))))
+
+    def test_decrypt_truncated_header(self):
+        codec = backup_codec.StreamCodec(encryption='aes-256-ctr', key='key')
+
+        self.assertRaises(backup_codec.CodecError, b''.join,
+                          codec.decode([b'TRVAES01']))
+
+    def test_encrypt_at_offset(self):
+        cipher = backup_codec.AesCtrCipher('key')
+        whole = cipher.encrypt_at(0, self.data)
+
+        for offset in (1, 15, 16, 17, 4099):
+            self.assertEqual(whole[offset:offset + 100],
+                             cipher.encrypt_at(offset,
+                                               self.data[offset:offset + 100]))
+
+    def test_compression_error(self):
+        codec = backup_codec.StreamCodec(compression='gzip', key='key')
+        compress_block = codec.compressor.compress_block
+        blocks = []
+
+        def _fail_second_block(block):
+            blocks.append(block)
+            if len(blocks) == 2:
+                raise IOError('compression failed')
+            return compress_block(block)
+
+        spawn = eventlet.spawn
+        threads = []
+
+        def _spawn(*args):
+            threads.append(spawn(*args))
+            return threads[-1]
+
+        encoder = codec.encoder(io.BytesIO(self.data))
+        with patch.object(codec.compressor, 'compress_block',
+                          side_effect=_fail_second_block):
+            with patch.object(backup_codec.eventlet, 'spawn',
+                              side_effect=_spawn):
+                self.assertRaises(IOError, _read_all, encoder)
+        eventlet.sleep(0)
+
+        # No block is left waiting for the offset of the failed one.
+        self.assertTrue(len(threads) > 2)
+        self.assertTrue(all(thread.dead for thread in threads))
+
+    def test_unknown_compression(self):
+        self.assertRaises(backup_codec.CodecError,
+                          backup_codec.StreamCodec, compression='bzip3')
+
+    @patch.object(backup_codec, 'zstandard', None)
+    def test_missing_compression_module(self):
+        self.assertRaises(backup_codec.CodecError,
+                          backup_codec.StreamCodec, compression='zstd')
+
+    def test_metadata(self):
+        codec = backup_codec.StreamCodec(compression='gzip',
+                                         encryption='aes-256-ctr', key='key')
+        metadata = codec.metadata()
+
+        self.assertEqual({'stream_compression': 'gzip',
+                          'stream_encryption': 'aes-256-ctr'}, metadata)
+        self.assertEqual('.gz.enc', codec.extension)
+        restored = backup_codec.StreamCodec.from_metadata(metadata, 'key')
+        self.assertEqual('gzip', restored.compressor.name)
+        self.assertTrue(restored.encrypted)
+        self.assertIsNone(
+            backup_codec.StreamCodec.from_metadata({'lsn': '1'}, 'key'))
+
+    def test_from_config_disabled(self):
+        self.assertIsNone(backup_codec.StreamCodec.from_config())
+
+
+class BackupCodecRunnerTest(trove_testtools.TestCase):
+
+    def setUp(self):
+        super(BackupCodecRunnerTest, self).setUp()
+        self.get_auth_pwd_patch = patch.object(
+            MySqlApp, 'get_auth_password', Mock(return_value='password'))
+        self.get_auth_pwd_patch.start()
+        self.addCleanup(self.get_auth_pwd_patch.stop)
+        self.get_data_dir_patch = patch.object(
+            MySqlApp, 'get_data_dir', return_value='/var/lib/mysql/data')
+        self.get_data_dir_patch.start()
+        self.addCleanup(self.get_data_dir_patch.stop)
+        backupBase.BackupRunner.is_zipped = True
+        backupBase.BackupRunner.is_encrypted = True
+        restoreBase.RestoreRunner.is_zipped = True
+        restoreBase.RestoreRunner.is_encrypted = True
+
+    def test_backup_with_inprocess_codec(self):
+        self.patch_conf_property('backup_use_inprocess_codec', True)
+        RunnerClass = utils.import_class(BACKUP_XTRA_CLS)
+        bkup = RunnerClass(12345, extra_opts="")
+
+        self.assertNotIn('gzip', bkup.command)
+        self.assertNotIn('openssl', bkup.command)
+        self.assertEqual("12345.xbstream.gz.enc", bkup.manifest)
+        self.assertEqual({'stream_compression': 'gzip',
+                          'stream_encryption': 'aes-256-ctr'},
+                         bkup.codec.metadata())
+
+    def test_restore_with_inprocess_codec(self):
+        RunnerClass = utils.import_class(RESTORE_XTRA_CLS)
+        restr = RunnerClass(None, restore_location="/var/lib/mysql/data",
+                            location="filename", checksum="md5",
+                            metadata={'stream_compression': 'gzip',
+                                      'stream_encryption': 'aes-256-ctr'})
+
+        self.assertNotIn('gzip', restr.restore_cmd)
+        self.assertNotIn('openssl', restr.restore_cmd)
+        self.assertIsNotNone(restr.codec)
+
+    def test_restore_without_codec_metadata(self):
+        RunnerClass = utils.import_class(RESTORE_XTRA_CLS)
+        restr = RunnerClass(None, restore_location="/var/lib/mysql/data",
+                            location="filename", checksum="md5",
+                            metadata={'lsn': '1234'})
+
+        self.assertIn('gzip -d -c', restr.restore_cmd)
+        self.assertIn('openssl enc -d', restr.restore_cmd)
+        self.assertIsNone(restr.codec)
+
+    def test_load_stream_with_codec_of_backup(self):
+        RunnerClass = utils.import_class(RESTORE_XTRA_CLS)
+        storage = Mock()
+        storage.load.return_value = [b'encoded']
+        restr = RunnerClass(storage, restore_location="/var/lib/mysql/data",
+                            location="filename", checksum="md5",
+                            metadata={'stream_compression': 'gzip',
+                                      'stream_encryption': 'aes-256-ctr'})
+        codec = Mock()
+        codec.decode.return_value = [b'decoded']
+
+        # A parent written without a codec is not decoded in-process, even
+        # though the restored backup was.
+        self.assertEqual([b'encoded'],
+                         restr._load_stream('parent', 'md5', None))
+        self.assertEqual([b'decoded'],
+                         restr._load_stream('parent', 'md5', codec))
+        codec.decode.assert_called_once_with([b'encoded'])
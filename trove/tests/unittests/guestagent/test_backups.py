@@ -11,6 +11,7 @@
 #    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
 #    License for the specific language governing permissions and limitations
 #    under the License.
+import eventlet
 import hashlib
 import mock
 import os
@@ -347,6 +348,92 @@ class GuestAgentBackupTest(trove_testtools.TestCase):
         observed = restr._incremental_restore_cmd('/foo/bar/')
         self.assertEqual(expected, observed)
 
+    @patch.object(operating_system, 'remove')
+    @patch.object(operating_system, 'create_directory')
+    @patch('trove.guestagent.strategies.restore.mysql_impl.cfg.'
+           'get_configuration_property', return_value='/mnt')
+    def test_restore_xtrabackup_incremental_chain(self, *args):
+        RunnerClass = utils.import_class(RESTORE_XTRA_INCR_CLS)
+        storage = Mock()
+        storage.load_metadata.side_effect = [
+            {'parent_location': 'inc1', 'parent_checksum': 'md5-inc1'},
+            {'parent_location': 'full', 'parent_checksum': 'md5-full'},
+            {}]
+        restr = RunnerClass(storage, restore_location="/var/lib/mysql/data",
+                            location="inc2", checksum="md5-inc2")
+        self.patch_conf_property('restore_incremental_concurrency', 3)
+
+        events = []
+
+        def _unpack(location, checksum, command, codec):
+            events.append(('unpack', location))
+            # Let the other downloads start before this one finishes.
+            eventlet.sleep(0)
+            return 10
+
+        with patch.multiple(restr, _unpack=DEFAULT,
+                            _incremental_prepare=DEFAULT) as mocks:
+            mocks['_unpack'].side_effect = _unpack
+            mocks['_incremental_prepare'].side_effect = (
+                lambda incremental_dir: events.append(
+                    ('prepare', incremental_dir)))
+            restr._incremental_restore("inc2", "md5-inc2")
+
+        self.assertEqual(3, storage.load_metadata.call_count)
+        self.assertEqual(30, restr.content_length)
+        # All backups are downloaded before the first prepare completes,
+        # but the logs are applied in order, starting with the full backup.
+        self.assertEqual([('unpack', 'full'), ('unpack', 'inc1'),
+                          ('unpack', 'inc2')], events[:3])
+        self.assertEqual([('prepare', None),
+                          ('prepare', '/mnt/md5-inc1'),
+                          ('prepare', '/mnt/md5-inc2')], events[3:])
+
+    @patch.object(operating_system, 'remove')
+    @patch.object(operating_system, 'create_directory')
+    @patch('trove.guestagent.strategies.restore.mysql_impl.cfg.'
+           'get_configuration_property', return_value='/mnt')
+    def test_restore_xtrabackup_incremental_mixed_chain(self, *args):
+        # The in-process codec was enabled after the full backup and
+        # disabled again before the last incremental backup.
+        restoreBase.RestoreRunner.is_zipped = True
+        restoreBase.RestoreRunner.is_encrypted = False
+        codec_metadata = {'stream_compression': 'gzip',
+                          'stream_encryption': 'none'}
+        RunnerClass = utils.import_class(RESTORE_XTRA_INCR_CLS)
+        storage = Mock()
+        storage.load_metadata.side_effect = [
+            {'parent_location': 'inc1', 'parent_checksum': 'md5-inc1'},
+            dict(codec_metadata, parent_location='full',
+                 parent_checksum='md5-full'),
+            {}]
+        restr = RunnerClass(storage, restore_location="/var/lib/mysql/data",
+                            location="inc2", checksum="md5-inc2",
+                            metadata={})
+
+        unpacked = {}
+
+        def _unpack(location, checksum, command, codec):
+            unpacked[location] = (command, codec)
+            return 10
+
+        with patch.multiple(restr, _unpack=DEFAULT,
+                            _incremental_prepare=DEFAULT) as mocks:
+            mocks['_unpack'].side_effect = _unpack
+            restr._incremental_restore("inc2", "md5-inc2")
+
+        command, codec = unpacked['full']
+        self.assertEqual(UNZIP + PIPE + XTRA_RESTORE, command)
+        self.assertIsNone(codec)
+        command, codec = unpacked['inc1']
+        self.assertEqual(XTRA_RESTORE_RAW % {'restore_location':
+                                             '/mnt/md5-inc1'}, command)
+        self.assertEqual(codec_metadata, codec.metadata())
+        command, codec = unpacked['inc2']
+        self.assertEqual(UNZIP + PIPE + (XTRA_RESTORE_RAW % {
+            'restore_location': '/mnt/md5-inc2'}), command)
+        self.assertIsNone(codec)
+
     def test_restore_decrypted_mysqldump_command(self):
         restoreBase.RestoreRunner.is_encrypted = False
         RunnerClass = utils.import_class(RESTORE_SQLDUMP_CLS)
@@ -1213,3 +1300,79 @@ class CouchDBRestoreTests(trove_testtools.TestCase):
         self.restore_runner.post_restore = mock.Mock()
         self.assertRaises(exception.ProcessExecutionError,
                           self.restore_runner.restore)
+
+
+class RestorePipelineTests(trove_testtools.TestCase):
+
+    def setUp(self):
+        super(RestorePipelineTests, self).setUp()
+        self.chunks = [os.urandom(100) for _i in range(50)]
+        self.output = mock.Mock()
+
+    def _written(self):
+        return b''.join(call[0][0] for call in
+                        self.output.write.call_args_list)
+
+    def test_feed(self):
+        pipeline = restoreBase.RestorePipeline(iter(self.chunks),
+                                               buffer_size=0)
+
+        self.assertEqual(5000, pipeline.feed(self.output))
+        self.assertEqual(b''.join(self.chunks), self._written())
+        self.assertEqual(5000, pipeline.bytes_read)
+
+    @patch.object(restoreBase.eventlet, 'sleep')
+    def test_feed_rate_limit(self, mock_sleep):
+        pipeline = restoreBase.RestorePipeline(iter(self.chunks),
+                                               rate_limit=1000)
+
+        pipeline.feed(self.output)
+        # The last chunk is due 5 seconds after the start at 1000 bytes/s.
+        self.assertAlmostEqual(5.0, mock_sleep.call_args[0][0], delta=0.5)
+
+    def test_feed_download_error(self):
+        def _stream():
+            yield self.chunks[0]
+            raise IOError('connection reset')
+
+        pipeline = restoreBase.RestorePipeline(_stream())
+
+        self.assertRaises(IOError, pipeline.feed, self.output)
+        self.assertEqual(self.chunks[0], self._written())
+
+    def test_feed_write_error(self):
+        self.output.write.side_effect = IOError('broken pipe')
+        pipeline = restoreBase.RestorePipeline(iter(self.chunks),
+                                               buffer_size=0)
+
+        self.assertRaises(IOError, pipeline.feed, self.output)
+        # The download stopped with the restore process.
+        self.assertTrue(pipeline.bytes_read < 5000)
+
+    def test_feed_buffer_size_in_bytes(self):
+        chunks = [os.urandom(size) for size in (100, 300, 50, 50, 200) * 10]
+        pipeline = restoreBase.RestorePipeline(iter(chunks), buffer_size=250)
+        queued = []
+        self.output.write.side_effect = (
+            lambda chunk: queued.append(pipeline.queued_bytes))
+
+        # A chunk larger than the buffer is queued on its own.
+        self.assertEqual(7000, pipeline.feed(self.output))
+        self.assertEqual(b''.join(chunks), self._written())
+        self.assertTrue(0 < max(queued) <= 250)
+        self.assertEqual(0, pipeline.queued_bytes)
+
+    def test_feed_write_error_with_full_buffer(self):
+        stream = mock.MagicMock()
+        stream.__iter__.return_value = iter(self.chunks)
+        pipeline = restoreBase.RestorePipeline(stream, buffer_size=200)
+
+        def _write(chunk):
+            # Let the download fill the buffer and block on it.
+            restoreBase.eventlet.sleep(0)
+            raise IOError('broken pipe')
+        self.output.write.side_effect = _write
+
+        self.assertRaises(IOError, pipeline.feed, self.output)
+        self.assertTrue(pipeline.bytes_read < 5000)
+        stream.close.assert_called_once_with()
@@ -37,7 +37,7 @@ class TestConfigurationManager(trove_testtools.TestCase):
                     chown=DEFAULT, chmod=DEFAULT)
     def test_read_write_configuration(self, read_file, write_file,
                                       chown, chmod):
-        sample_path = Mock()
+        sample_path = '/etc/trove/sample.cnf'
         sample_owner = Mock()
         sample_group = Mock()
         sample_codec = MagicMock()
@@ -452,3 +452,57 @@ class TestConfigurationOverrideStrategy(trove_testtools.TestCase):
             self.assertEqual('pi', manager.get_value('Section_1')['name'])
             self.assertEqual(3.1415, manager.get_value('Section_1')['value'])
             self.assertIsNone(manager.get_value('Section_2'))
+
+    @patch.multiple(operating_system, chmod=Mock(), chown=Mock())
+    def test_import_override_strategy_cache(self):
+        revision_dir = self._create_temp_dir()
+        codec = IniCodec()
+        current_user = getpass.getuser()
+
+        with tempfile.NamedTemporaryFile() as base_config:
+            operating_system.write_file(
+                base_config.name, {'Section_1': {'name': 'pi'}}, codec)
+            strategy = ImportOverrideStrategy(revision_dir, 'ext')
+            manager = ConfigurationManager(
+                base_config.name, current_user, current_user, codec,
+                requires_root=False, override_strategy=strategy)
+            manager.apply_user_override({'Section_1': {'name': 'e'}}, 'id1')
+            manager.apply_system_override({'Section_2': {'foo': 'bar'}})
+
+            list_files = patch.object(
+                operating_system, 'list_files_in_directory',
+                wraps=operating_system.list_files_in_directory)
+            read_file = patch.object(operating_system, 'read_file',
+                                     wraps=operating_system.read_file)
+            with list_files as list_mock, read_file as read_mock:
+                # Nothing is listed or read while nothing changes.
+                expected = {'Section_1': {'name': 'e'},
+                            'Section_2': {'foo': 'bar'}}
+                self.assertEqual(expected, manager.parse_configuration())
+                self.assertEqual(expected, manager.parse_configuration())
+                self.assertTrue(strategy.exists(manager.USER_GROUP, 'id1'))
+                self.assertEqual({'Section_1': {'name': 'e'}},
+                                 manager.get_user_override('id1'))
+                self.assertEqual(0, list_mock.call_count)
+                self.assertEqual(0, read_mock.call_count)
+
+                # The results are copies of the cached options.
+                manager.parse_configuration()['Section_1']['name'] = 'x'
+                self.assertEqual(expected, manager.parse_configuration())
+
+                # Changes made outside the strategy are picked up, and all
+                # the revisions are read again.
+                path = os.path.join(revision_dir, '20-user-002-id2.ext')
+                operating_system.write_file(
+                    path, {'Section_1': {'name': 'sqrt(2)'}}, codec)
+                os.utime(revision_dir, (0, 0))
+                self.assertEqual('sqrt(2)',
+                                 manager.parse_configuration()['Section_1'][
+                                     'name'])
+                self.assertEqual(1, list_mock.call_count)
+                self.assertEqual(3, read_mock.call_count)
+
+                operating_system.remove(path)
+                os.utime(revision_dir, (1, 1))
+                self.assertEqual(expected, manager.parse_configuration())
+                self.assertEqual(2, list_mock.call_count)
@@ -447,24 +447,51 @@ class MySqlAdminTest(trove_testtools.TestCase):
         super(MySqlAdminTest, self).tearDown()
 
     def test__associate_dbs(self):
-        db_result = [{"grantee": "'test_user'@'%'", "table_schema": "db1"},
-                     {"grantee": "'test_user'@'%'", "table_schema": "db2"},
-                     {"grantee": "'test_user'@'%'", "table_schema": "db3"},
-                     {"grantee": "'test_user1'@'%'", "table_schema": "db1"},
-                     {"grantee": "'test_user1'@'%'", "table_schema": "db3"}]
+        db_result = [{"User": "test_user", "Host": "%", "Db": "db1"},
+                     {"User": "test_user", "Host": "%", "Db": "db2"},
+                     {"User": "test_user", "Host": "%", "Db": "db3"},
+                     {"User": "test_user", "Host": "localhost", "Db": "db4"}]
         user = MagicMock()
         user.name = "test_user"
         user.host = "%"
         user.databases = []
-        expected = ("SELECT grantee, table_schema FROM "
-                    "information_schema.SCHEMA_PRIVILEGES WHERE privilege_type"
-                    " != 'USAGE' GROUP BY grantee, table_schema;")
+        expected = ("SELECT User, Host, Db FROM mysql.db "
+                    "WHERE User IN (:user0) ORDER BY Db;")
 
         with patch.object(self.mock_client, 'execute',
                           return_value=db_result) as mock_execute:
             self.mySqlAdmin._associate_dbs(user)
-            self.assertEqual(3, len(user.databases))
+            self.assertEqual(['db1', 'db2', 'db3'],
+                             [db['_name'] for db in user.databases])
             self._assert_execute_call(expected, mock_execute)
+            mock_execute.assert_called_once_with(ANY, user0="test_user")
+
+    def test__associate_dbs_several_users(self):
+        db_result = [{"User": "test_user", "Host": "%", "Db": "db1"},
+                     {"User": "test_user", "Host": "%", "Db": "db2"},
+                     {"User": "test_user1", "Host": "%", "Db": "db3"}]
+        users = []
+        for name in ("test_user", "test_user1", "test_user2"):
+            user = MagicMock()
+            user.name = name
+            user.host = "%"
+            user.databases = []
+            users.append(user)
+
+        with patch.object(self.mock_client, 'execute',
+                          return_value=db_result) as mock_execute:
+            self.mySqlAdmin._associate_dbs(*users)
+            mock_execute.assert_called_once_with(
+                ANY, user0="test_user", user1="test_user1",
+                user2="test_user2")
+            self.assertEqual([['db1', 'db2'], ['db3'], []],
+                             [[db['_name'] for db in mysql_user.databases]
+                              for mysql_user in users])
+
+    def test__associate_dbs_no_users(self):
+        with patch.object(self.mock_client, 'execute') as mock_execute:
+            self.mySqlAdmin._associate_dbs()
+            self.assertFalse(mock_execute.called)
 
     def _assert_execute_call(self, expected_query, execute_mock, call_idx=0):
         args, _ = execute_mock.call_args_list[call_idx]
@@ -666,6 +693,24 @@ class MySqlAdminTest(trove_testtools.TestCase):
             self.mySqlAdmin.list_users(limit)
             self._assert_execute_call(expected, mock_execute)
 
+    def test_list_users_associates_dbs_once(self):
+        rows = [{'User': 'user%d' % index, 'Host': '%',
+                 'Marker': 'user%d@%%' % index} for index in range(3)]
+
+        with patch.object(self.mock_client, 'execute') as mock_execute:
+            mock_execute.return_value = MagicMock(rowcount=3)
+            mock_execute.return_value.__iter__.return_value = rows
+            with patch.object(self.mySqlAdmin,
+                              '_associate_dbs') as mock_associate_dbs:
+                users, next_marker = self.mySqlAdmin.list_users(limit=2)
+                self.assertEqual(['user0', 'user1'],
+                                 [user['_name'] for user in users])
+                self.assertEqual('user1@%', next_marker)
+                mock_associate_dbs.assert_called_once_with(ANY, ANY)
+                self.assertEqual(['user0', 'user1'],
+                                 [user.name for user in
+                                  mock_associate_dbs.call_args[0]])
+
     def test_list_users_with_marker(self):
         marker = "aMarker"
         expected = ("SELECT User, Host, Marker FROM"
@@ -1930,6 +1975,61 @@ class KeepAliveConnectionTest(trove_testtools.TestCase):
                           dbapi_con, Mock(), Mock())
 
 
+class FakeProbe(base_datastore_service.ConnectionProbe):
+
+    def __init__(self):
+        super(FakeProbe, self).__init__()
+        self.connections = []
+        self.ping_errors = []
+
+    def _connect(self):
+        connection = Mock()
+        self.connections.append(connection)
+        return connection
+
+    def _ping(self, connection):
+        if self.ping_errors:
+            raise self.ping_errors.pop(0)
+
+
+class ConnectionProbeTest(trove_testtools.TestCase):
+
+    def test_connection_is_kept(self):
+        probe = FakeProbe()
+
+        self.assertTrue(probe.ping())
+        self.assertTrue(probe.ping())
+        self.assertEqual(1, len(probe.connections))
+        self.assertEqual(2, probe.stats()['pings'])
+
+    def test_reconnect(self):
+        probe = FakeProbe()
+        probe.ping()
+        probe.ping_errors = [Exception('server has gone away')]
+
+        self.assertTrue(probe.ping())
+        self.assertEqual(2, len(probe.connections))
+        probe.connections[0].close.assert_called_once_with()
+
+    def test_ping_fails(self):
+        probe = FakeProbe()
+        probe.ping_errors = [Exception('timed out')]
+
+        self.assertFalse(probe.ping())
+        self.assertEqual(1, probe.stats()['failures'])
+        probe.connections[0].close.assert_called_once_with()
+        # The next ping connects again.
+        self.assertTrue(probe.ping())
+        self.assertEqual(2, len(probe.connections))
+
+    def test_connect_fails(self):
+        probe = FakeProbe()
+        probe._connect = Mock(side_effect=Exception('no such socket'))
+
+        self.assertFalse(probe.ping())
+        self.assertEqual(0, probe.stats()['pings'])
+
+
 class BaseDbStatusTest(trove_testtools.TestCase):
 
     def setUp(self):
@@ -2087,6 +2187,96 @@ class BaseDbStatusTest(trove_testtools.TestCase):
                               rd_instance.ServiceStatuses.SHUTDOWN,
                               install_done=True)
 
+    def _test_update(self, initial_status, new_status, since_heartbeat,
+                     report=False, transition=None):
+        self.patch_conf_property('status_keepalive_interval', 300)
+        base_db_status = BaseDbStatus()
+        base_db_status.status = initial_status
+        base_db_status.last_heartbeat = time.time() - since_heartbeat
+        base_db_status._transition = transition
+        base_db_status._get_actual_db_status = Mock(return_value=new_status)
+        with patch.object(BaseDbStatus, 'prepare_completed') as patch_pc:
+            patch_pc.__get__ = Mock(return_value=True)
+            with patch.object(base_datastore_service.eventlet,
+                              'spawn_after') as mock_spawn:
+                if report:
+                    base_db_status.report_status()
+                else:
+                    base_db_status.update()
+        return base_db_status, mock_spawn
+
+    def test_update_skips_unchanged_status(self):
+        self._test_update(rd_instance.ServiceStatuses.RUNNING,
+                          rd_instance.ServiceStatuses.RUNNING, 60)
+
+        self.assertFalse(conductor_api.API.called)
+
+    def test_update_sends_changed_status(self):
+        status, _ = self._test_update(rd_instance.ServiceStatuses.RUNNING,
+                                      rd_instance.ServiceStatuses.SHUTDOWN,
+                                      60)
+
+        heartbeat = conductor_api.API.return_value.heartbeat
+        self.assertEqual(1, heartbeat.call_count)
+        self.assertEqual(rd_instance.ServiceStatuses.SHUTDOWN, status.status)
+
+    def test_update_sends_keepalive(self):
+        # The next periodic update would be more than 300s after the last
+        # heartbeat.
+        status, _ = self._test_update(rd_instance.ServiceStatuses.RUNNING,
+                                      rd_instance.ServiceStatuses.RUNNING,
+                                      280)
+
+        heartbeat = conductor_api.API.return_value.heartbeat
+        self.assertEqual(1, heartbeat.call_count)
+        self.assertTrue(status.last_heartbeat > time.time() - 10)
+
+    def test_update_transitional_status(self):
+        status, mock_spawn = self._test_update(
+            rd_instance.ServiceStatuses.RUNNING,
+            rd_instance.ServiceStatuses.BLOCKED, 60)
+
+        mock_spawn.assert_called_once_with(5, status._scheduled_update)
+
+    def test_update_transitional_status_for_too_long(self):
+        blocked = rd_instance.ServiceStatuses.BLOCKED
+        status, mock_spawn = self._test_update(
+            blocked, blocked, 60, transition=(blocked, time.time() - 700))
+
+        self.assertFalse(mock_spawn.called)
+        self.assertFalse(conductor_api.API.called)
+
+    def test_update_new_transitional_status(self):
+        # The window starts again when the status changes.
+        status, mock_spawn = self._test_update(
+            rd_instance.ServiceStatuses.BLOCKED,
+            rd_instance.ServiceStatuses.CRASHED, 60,
+            transition=(rd_instance.ServiceStatuses.BLOCKED,
+                        time.time() - 700))
+
+        mock_spawn.assert_called_once_with(5, status._scheduled_update)
+        self.assertEqual(rd_instance.ServiceStatuses.CRASHED,
+                         status._transition[0])
+
+    def test_report_status_sends_unchanged_status(self):
+        # The control plane set the status to PAUSED during a resize.
+        status, _ = self._test_update(rd_instance.ServiceStatuses.RUNNING,
+                                      rd_instance.ServiceStatuses.RUNNING,
+                                      60, report=True)
+
+        heartbeat = conductor_api.API.return_value.heartbeat
+        self.assertEqual(1, heartbeat.call_count)
+        self.assertEqual({'service_status': 'running'},
+                         heartbeat.call_args[0][1])
+        self.assertFalse(status._report_due)
+
+    def test_update_stable_status(self):
+        _, mock_spawn = self._test_update(rd_instance.ServiceStatuses.BLOCKED,
+                                          rd_instance.ServiceStatuses.RUNNING,
+                                          60)
+
+        self.assertFalse(mock_spawn.called)
+
     def test_wait_for_database_service_status(self):
         status = BaseDbStatus()
         expected_status = rd_instance.ServiceStatuses.RUNNING
@@ -2278,6 +2468,12 @@ class MySqlAppStatusTest(trove_testtools.TestCase):
         InstanceServiceStatus.create(instance_id=self.FAKE_ID,
                                      status=rd_instance.ServiceStatuses.NEW)
         dbaas.CONF.guest_id = self.FAKE_ID
+        # Check the status with the client and processes, unless a test
+        # pings the server.
+        patcher = patch.object(mysql_common_service.MySqlProbe, 'ping',
+                               return_value=False)
+        self.mock_ping = patcher.start()
+        self.addCleanup(patcher.stop)
 
     def tearDown(self):
         mysql_common_service.utils.execute_with_timeout = \
@@ -2302,6 +2498,15 @@ class MySqlAppStatusTest(trove_testtools.TestCase):
 
         self.assertEqual(rd_instance.ServiceStatuses.RUNNING, status)
 
+    @patch.object(utils, 'execute_with_timeout')
+    def test_get_actual_db_status_ping(self, mock_execute):
+        self.mock_ping.return_value = True
+
+        status = MySqlAppStatus.get()._get_actual_db_status()
+
+        self.assertEqual(rd_instance.ServiceStatuses.RUNNING, status)
+        self.assertFalse(mock_execute.called)
+
     @patch.object(utils, 'execute_with_timeout',
                   side_effect=ProcessExecutionError())
     @patch.object(os.path, 'exists', return_value=True)
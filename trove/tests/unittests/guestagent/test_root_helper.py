@@ -0,0 +1,235 @@
+# Copyright 2016 Tesora Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import os
+import shutil
+import stat
+import tempfile
+import threading
+
+from mock import patch
+
+from trove.common import exception
+from trove.common import utils
+from trove.guestagent.common import operating_system
+from trove.guestagent.common.operating_system import FileMode
+from trove.guestagent.common import root_helper
+from trove.tests.unittests import trove_testtools
+
+
+class RootHelperOperationsTest(trove_testtools.TestCase):
+
+    def setUp(self):
+        super(RootHelperOperationsTest, self).setUp()
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        self.subdir = os.path.join(self.root, 'data')
+        os.mkdir(self.subdir)
+        self.files = [os.path.join(self.root, 'my.cnf'),
+                      os.path.join(self.subdir, 'ibdata1')]
+        for path in self.files:
+            open(path, 'w').close()
+
+    def _mode(self, path):
+        return stat.S_IMODE(os.stat(path).st_mode)
+
+    def test_exists(self):
+        self.assertTrue(root_helper.exists(self.files[0]))
+        self.assertFalse(root_helper.exists(self.subdir))
+        self.assertTrue(root_helper.exists(self.subdir, is_directory=True))
+        self.assertFalse(root_helper.exists(self.files[0] + '.bak'))
+
+    def test_write_and_read_file(self):
+        path = os.path.join(self.root, 'new.cnf')
+        root_helper.write_file(path, root_helper.encode("[mysqld]\n"))
+        self.assertEqual(0o600, self._mode(path))
+        self.assertEqual("[mysqld]\n",
+                         root_helper.decode(root_helper.read_file(path)))
+
+    def test_chmod(self):
+        root_helper.chmod(self.root, reset=0o750)
+        for path in [self.root, self.subdir] + self.files:
+            self.assertEqual(0o750, self._mode(path))
+
+        root_helper.chmod(self.root, add=0o004, remove=0o050,
+                          recursive=False)
+        self.assertEqual(0o704, self._mode(self.root))
+        self.assertEqual(0o750, self._mode(self.subdir))
+
+    def test_chmod_force(self):
+        missing = os.path.join(self.root, 'missing')
+        self.assertRaises(OSError, root_helper.chmod, missing, reset=0o600)
+        root_helper.chmod(missing, reset=0o600, force=True)
+
+    def test_list_files(self):
+        self.assertEqual([], root_helper.list_files(self.root))
+        self.assertEqual(set(self.files),
+                         set(root_helper.list_files(self.root,
+                                                    recursive=True)))
+        self.assertEqual([self.files[1]],
+                         root_helper.list_files(self.root, recursive=True,
+                                                pattern='ib.*'))
+        self.assertEqual(set([self.root, self.subdir] + self.files),
+                         set(root_helper.list_files(self.root,
+                                                    recursive=True,
+                                                    include_dirs=True)))
+
+
+class RootHelperClientTest(trove_testtools.TestCase):
+
+    def setUp(self):
+        super(RootHelperClientTest, self).setUp()
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        self.socket_path = os.path.join(self.root, 'root-helper.sock')
+        self.client = root_helper.RootHelperClient(self.socket_path)
+        self.addCleanup(self.client.close)
+
+    def _serve(self):
+        server = root_helper.RootHelperServer(self.socket_path, os.getuid())
+        thread = threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+
+    def test_call(self):
+        self._serve()
+        self.assertTrue(self.client.call('exists', path=self.root,
+                                         is_directory=True))
+        self.assertEqual([], self.client.call('list_files',
+                                              root_dir=self.root))
+
+    def test_call_error(self):
+        self._serve()
+        self.assertRaisesRegexp(
+            exception.RootHelperError, 'Unknown operation',
+            self.client.call, 'rm', path=self.root)
+        self.assertRaisesRegexp(
+            exception.RootHelperError, 'No such file',
+            self.client.call, 'read_file',
+            path=os.path.join(self.root, 'missing'))
+        # The connection is still usable.
+        self.assertFalse(self.client.call('exists', path=self.root))
+
+    def test_concurrent_calls(self):
+        self._serve()
+        self.assertFalse(self.client.call('exists', path=self.root))
+        with self.client._connections.item() as busy:
+            # Another greenthread waits for a reply on the connection.
+            self.assertIsNotNone(busy.socket)
+            self.assertTrue(self.client.call('exists', path=self.root,
+                                             is_directory=True))
+        self.assertEqual(2, self.client._connections.current_size)
+
+    def test_connections_bounded(self):
+        self.patch_conf_property('root_helper_connections', 1)
+        client = root_helper.RootHelperClient(self.socket_path)
+        self.addCleanup(client.close)
+        self._serve()
+        for i in range(3):
+            self.assertFalse(client.call('exists', path=self.root))
+        self.assertEqual(1, client._connections.current_size)
+
+    @patch.object(utils, 'execute_with_timeout')
+    def test_start_helper(self, mock_execute):
+        mock_execute.side_effect = lambda *args, **kwargs: self._serve()
+        self.assertTrue(self.client.call('exists', path=self.root,
+                                         is_directory=True))
+        mock_execute.assert_called_once_with(
+            root_helper.sys.executable, '-m', root_helper.__name__,
+            '--socket', self.socket_path, '--uid', str(os.getuid()),
+            run_as_root=True, root_helper='sudo')
+
+    @patch.object(utils, 'execute_with_timeout')
+    def test_start_helper_failed(self, mock_execute):
+        mock_execute.side_effect = exception.ProcessExecutionError()
+        self.assertRaises(exception.RootHelperError,
+                          self.client.call, 'exists', path=self.root)
+        # Do not try again right away.
+        self.assertRaises(exception.RootHelperError,
+                          self.client.call, 'exists', path=self.root)
+        self.assertEqual(1, mock_execute.call_count)
+
+
+class OperatingSystemRootHelperTest(trove_testtools.TestCase):
+
+    def setUp(self):
+        super(OperatingSystemRootHelperTest, self).setUp()
+        self.patch_conf_property('root_helper_daemon', True)
+        call_patcher = patch.object(root_helper, 'call')
+        self.mock_call = call_patcher.start()
+        self.addCleanup(call_patcher.stop)
+        execute_patcher = patch.object(utils, 'execute_with_timeout',
+                                       return_value=('', ''))
+        self.mock_execute = execute_patcher.start()
+        self.addCleanup(execute_patcher.stop)
+
+    def test_disabled(self):
+        self.patch_conf_property('root_helper_daemon', False)
+        operating_system.chown('/tmp/data', 'trove', 'trove', as_root=True)
+        self.assertFalse(self.mock_call.called)
+        self.assertTrue(self.mock_execute.called)
+
+    def test_chown(self):
+        operating_system.chown('/tmp/data', 'trove', None, as_root=True)
+        self.mock_call.assert_called_once_with(
+            'chown', timeout=30, path='/tmp/data', user='trove', group=None,
+            recursive=True, force=False)
+        self.assertFalse(self.mock_execute.called)
+
+    def test_chmod(self):
+        operating_system.chmod('/tmp/data', FileMode.SET_USR_RW,
+                               recursive=False, as_root=True, timeout=10)
+        self.mock_call.assert_called_once_with(
+            'chmod', timeout=10, path='/tmp/data', reset=0o600, add=0,
+            remove=0, recursive=False, force=False)
+        self.assertFalse(self.mock_execute.called)
+
+    def test_not_as_root(self):
+        operating_system.chmod('/tmp/data', FileMode.SET_USR_RW)
+        self.assertFalse(self.mock_call.called)
+        self.assertTrue(self.mock_execute.called)
+
+    def test_read_file(self):
+        self.mock_call.return_value = root_helper.encode('key: value\n')
+        self.assertEqual(
+            'key: value\n',
+            operating_system.read_file('/etc/trove.cnf', as_root=True))
+        self.mock_call.assert_called_with(
+            'read_file', timeout=30, path='/etc/trove.cnf')
+
+    def test_write_file(self):
+        operating_system.write_file('/etc/trove.cnf', 'key: value\n',
+                                    as_root=True)
+        self.mock_call.assert_called_once_with(
+            'write_file', timeout=30, path='/etc/trove.cnf',
+            data=root_helper.encode('key: value\n'))
+        self.assertFalse(self.mock_execute.called)
+
+    def test_list_files_in_directory(self):
+        self.mock_call.return_value = ['/var/lib/mysql/ibdata1']
+        self.assertEqual(
+            {'/var/lib/mysql/ibdata1'},
+            operating_system.list_files_in_directory(
+                '/var/lib/mysql', recursive=True, as_root=True))
+
+    def test_fall_back_to_sudo(self):
+        self.mock_call.side_effect = exception.RootHelperError(
+            reason="Not running.")
+        operating_system.chown('/tmp/data', 'trove', 'trove', as_root=True)
+        self.mock_execute.assert_called_once_with(
+            'chown', '-R', 'trove:trove', '/tmp/data',
+            run_as_root=True, root_helper='sudo')
@@ -15,10 +15,15 @@
 #
 import jsonschema
 from mock import Mock
+from mock import patch
 from testtools.matchers import Is, Equals
 from testtools.testcase import skip
+import webob.exc
 
 from trove.common import apischema
+from trove.common import exception
+from trove.common import wsgi
+from trove.instance import models
 from trove.instance.service import InstanceController
 from trove.tests.unittests import trove_testtools
 
@@ -336,3 +341,78 @@ class TestInstanceController(trove_testtools.TestCase):
         self.assertEqual(1, instance.detach_replica.call_count)
         self.assertEqual(1, instance.assign_configuration.call_count)
         instance.update_db.assert_called_once_with(**args)
+
+    def _show(self, if_none_match=None):
+        req = wsgi.Request.blank('/v1.0/2500/instances/1')
+        req.environ[wsgi.CONTEXT_KEY] = self.context
+        if if_none_match:
+            req.headers['If-None-Match'] = if_none_match
+        return self.controller.show(req, '2500', '1')
+
+    @patch.object(InstanceController, 'authorize_instance_action')
+    @patch.object(models, 'get_detail_etag_data', return_value={'a': 1})
+    @patch.object(models, 'get_db_info')
+    @patch.object(models, 'load_instance_with_info')
+    @patch('trove.instance.service.views.InstanceDetailView')
+    def test_show_etag(self, mock_view, mock_load, *args):
+        self.patch_conf_property('api_etag_max_age', 60)
+        mock_view.return_value.data.return_value = {}
+        etag = self._show().etag
+        self.assertIsNotNone(etag)
+        self.assertEqual(1, mock_load.call_count)
+
+        self.assertRaises(webob.exc.HTTPNotModified,
+                          self._show, '"%s"' % etag)
+        self.assertEqual(1, mock_load.call_count)
+
+    @patch.object(InstanceController, 'authorize_instance_action')
+    @patch.object(models, 'get_db_info')
+    @patch.object(models, 'load_instance_with_info')
+    @patch('trove.instance.service.views.InstanceDetailView')
+    def test_show_without_etag(self, mock_view, mock_load, mock_db_info,
+                               *args):
+        mock_view.return_value.data.return_value = {}
+        self.assertIsNone(self._show().etag)
+        self.assertFalse(mock_db_info.called)
+
+    def _detail(self, *ids):
+        req = wsgi.Request.blank('/v1.0/2500/instances/detail?%s' %
+                                 '&'.join('id=%s' % id for id in ids))
+        req.environ[wsgi.CONTEXT_KEY] = self.context
+        return self.controller.detail(req, '2500')
+
+    @patch.object(InstanceController, 'authorize_instance_action')
+    @patch.object(models.Instances, 'load_details')
+    @patch('trove.instance.service.views.InstanceDetailView')
+    def test_detail(self, mock_view, mock_load, mock_authorize):
+        mock_view.return_value.data.side_effect = [
+            {'instance': {'id': '1'}}, {'instance': {'id': '3'}}]
+        mock_load.return_value = {'1': Mock(), '2': exception.NotFound(),
+                                  '3': Mock()}
+
+        result = self._detail('1', '2', '1', '3')
+
+        mock_load.assert_called_once_with(self.context, ['1', '2', '3'])
+        self.assertEqual(2, mock_authorize.call_count)
+        self.assertEqual([{'id': '1'}, {'id': '3'}],
+                         result._data['instances'])
+        self.assertEqual(['2'], [e['id'] for e in result._data['errors']])
+        self.assertEqual(404, result._data['errors'][0]['code'])
+
+    @patch.object(InstanceController, 'authorize_instance_action',
+                  side_effect=exception.UnauthorizedRequest)
+    @patch.object(models.Instances, 'load_details')
+    def test_detail_unauthorized(self, mock_load, mock_authorize):
+        mock_load.return_value = {'1': Mock()}
+
+        result = self._detail('1')
+
+        self.assertEqual([], result._data['instances'])
+        self.assertEqual(['1'], [e['id'] for e in result._data['errors']])
+
+    def test_detail_without_ids(self):
+        self.assertRaises(exception.BadRequest, self._detail)
+
+    def test_detail_too_many_ids(self):
+        self.patch_conf_property('instances_page_size', 2)
+        self.assertRaises(exception.BadRequest, self._detail, '1', '2', '3')
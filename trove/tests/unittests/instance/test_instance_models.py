@@ -11,9 +11,12 @@
 #    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
 #    License for the specific language governing permissions and limitations
 #    under the License.
+from datetime import datetime
+from datetime import timedelta
 import uuid
 
 from mock import Mock, patch
+from novaclient import exceptions as nova_exceptions
 
 from trove.backup import models as backup_models
 from trove.common import cfg
@@ -402,3 +405,345 @@ class TestReplication(trove_testtools.TestCase):
                           None, 'name', 2, "UUID", [], [], self.datastore,
                           self.datastore_version, 1,
                           None, slave_of_id=self.replica_info.id)
+
+
+class TestServiceStatusLiveness(trove_testtools.TestCase):
+
+    def _status(self, seconds_ago):
+        status = InstanceServiceStatus(ServiceStatuses.RUNNING,
+                                       id=str(uuid.uuid4()),
+                                       instance_id=str(uuid.uuid4()))
+        status.updated_at = datetime.utcnow() - timedelta(seconds=seconds_ago)
+        return status
+
+    def test_is_stale(self):
+        self.assertFalse(self._status(30).is_stale())
+        self.assertTrue(self._status(61).is_stale())
+
+    def test_is_stale_with_keepalive(self):
+        self.patch_conf_property('status_keepalive_interval', 120)
+
+        self.assertFalse(self._status(150).is_stale())
+        self.assertTrue(self._status(181).is_stale())
+
+
+class TestInstanceResetStatus(trove_testtools.TestCase):
+
+    def setUp(self):
+        super(TestInstanceResetStatus, self).setUp()
+        self.context = trove_testtools.TroveTestContext(self, is_admin=True)
+        self.instance = Instance(
+            self.context, Mock(id='inst-id'), Mock(),
+            InstanceServiceStatus(ServiceStatuses.RUNNING),
+            ds_version=Mock(), ds=Mock())
+        self.instance.update_db = Mock()
+        get_guest_patcher = patch.object(Instance, 'get_guest')
+        self.mock_get_guest = get_guest_patcher.start()
+        self.addCleanup(get_guest_patcher.stop)
+
+    @patch.object(Instance, 'is_error', True)
+    @patch.object(InstanceServiceStatus, 'find_by')
+    def test_reset_status(self, mock_find_by):
+        self.instance.reset_status()
+
+        reset_status = mock_find_by.return_value
+        reset_status.set_status.assert_called_once_with(
+            ServiceStatuses.UNKNOWN)
+        reset_status.save.assert_called_once_with()
+        # The guest reports its status even if it did not change.
+        guest = self.mock_get_guest.return_value
+        guest.report_status.assert_called_once_with()
+
+    @patch.object(Instance, 'is_error', True)
+    @patch.object(InstanceServiceStatus, 'find_by')
+    def test_reset_status_guest_error(self, mock_find_by):
+        self.mock_get_guest.return_value.report_status.side_effect = (
+            exception.GuestError(original_message='Unreachable.'))
+        self.instance.reset_status()
+
+        mock_find_by.return_value.save.assert_called_once_with()
+
+
+class TestInstancesLoad(trove_testtools.TestCase):
+
+    def setUp(self):
+        util.init_db()
+        self.datastore = datastore_models.DBDatastore.create(
+            id=str(uuid.uuid4()),
+            name='name' + str(uuid.uuid4()),
+            default_version_id=str(uuid.uuid4()))
+        self.datastore_version = datastore_models.DBDatastoreVersion.create(
+            id=self.datastore.default_version_id,
+            name='name' + str(uuid.uuid4()),
+            image_id=str(uuid.uuid4()),
+            packages=str(uuid.uuid4()),
+            datastore_id=self.datastore.id,
+            manager='mysql',
+            active=1)
+        self.db_infos = []
+        self.statuses = []
+        for index in range(3):
+            db_info = DBInstance(
+                InstanceTasks.NONE,
+                id=str(uuid.uuid4()),
+                name="TestInstance%d" % index,
+                compute_instance_id=str(uuid.uuid4()),
+                datastore_version_id=self.datastore_version.id)
+            db_info.save()
+            self.db_infos.append(db_info)
+            status = InstanceServiceStatus(
+                ServiceStatuses.RUNNING,
+                id=str(uuid.uuid4()),
+                instance_id=db_info.id)
+            status.save()
+            self.statuses.append(status)
+        super(TestInstancesLoad, self).setUp()
+
+    def tearDown(self):
+        for model in self.db_infos + self.statuses:
+            model.delete()
+        self.datastore_version.delete()
+        self.datastore.delete()
+        super(TestInstancesLoad, self).tearDown()
+
+    def _load(self, db_items):
+        find_server = Mock(return_value=Mock(status='ACTIVE', addresses={}))
+        return models.Instances._load_servers_status(
+            lambda context, db, status, server=None, **kwargs: SimpleInstance(
+                context, db, status, **kwargs),
+            None, db_items, find_server)
+
+    @patch.object(datastore_models.Datastore, 'load')
+    @patch.object(datastore_models.DatastoreVersion, 'load_by_uuid')
+    @patch.object(InstanceServiceStatus, 'find_by')
+    def test_load_servers_status_in_bulk(self, *mocks):
+        instances = self._load(self.db_infos)
+
+        self.assertEqual([db_info.id for db_info in self.db_infos],
+                         [instance.id for instance in instances])
+        for instance in instances:
+            self.assertEqual(ServiceStatuses.RUNNING,
+                             instance.datastore_status.status)
+            self.assertEqual(self.datastore_version.id,
+                             instance.datastore_version.id)
+            self.assertEqual(self.datastore.name, instance.datastore.name)
+        # Nothing is loaded one instance at a time.
+        for mock in mocks:
+            self.assertFalse(mock.called)
+
+    @patch('trove.instance.models.LOG')
+    def test_load_servers_status_missing_status(self, mock_logging):
+        self.statuses.pop(1).delete()
+        instances = self._load(self.db_infos)
+
+        self.assertEqual([self.db_infos[0].id, self.db_infos[2].id],
+                         [instance.id for instance in instances])
+
+    def test_etag_data(self):
+        db_info = self.db_infos[0]
+        data = models.get_detail_etag_data(db_info)
+        self.assertEqual([], data['replicas'])
+        self.assertNotIn('fault', data)
+
+        self.statuses[0].set_status(ServiceStatuses.SHUTDOWN)
+        self.statuses[0].save()
+        self.assertNotEqual(data, models.get_detail_etag_data(db_info))
+
+    def test_etag_data_replicas(self):
+        self.db_infos[1].slave_of_id = self.db_infos[0].id
+        self.db_infos[1].save()
+
+        data = models.get_detail_etag_data(self.db_infos[0])
+        self.assertEqual([self.db_infos[1].id], data['replicas'])
+
+
+class TestInstancesLoadDetails(TestInstancesLoad):
+
+    def setUp(self):
+        super(TestInstancesLoadDetails, self).setUp()
+        self.context = trove_testtools.TroveTestContext(self, is_admin=True)
+        self.servers = [Mock(id=db_info.compute_instance_id, status='ACTIVE',
+                             addresses={}) for db_info in self.db_infos]
+
+    @patch.object(models.srv_grp.ServerGroup, 'load_by_member')
+    @patch.object(models, 'load_guest_info')
+    @patch.object(models, 'load_server_list')
+    def test_load_details(self, mock_servers, mock_guest, mock_groups):
+        mock_servers.return_value = self.servers[:2]
+        mock_guest.side_effect = lambda instance, context, id: instance
+        mock_groups.return_value = {
+            self.servers[0].id: Mock(policies=['affinity'])}
+        self.db_infos[1].slave_of_id = self.db_infos[0].id
+        self.db_infos[1].save()
+        ids = [self.db_infos[0].id, self.db_infos[1].id, 'missing']
+
+        instances = models.Instances.load_details(self.context, ids)
+
+        self.assertEqual(1, mock_servers.call_count)
+        self.assertEqual(2, mock_guest.call_count)
+        self.assertEqual(1, mock_groups.call_count)
+        first = instances[self.db_infos[0].id]
+        self.assertEqual('affinity', first.locality)
+        self.assertEqual([self.db_infos[1].id],
+                         [replica.id for replica in first.slaves])
+        self.assertIsNone(first.fault)
+        self.assertIsNone(instances[self.db_infos[1].id].locality)
+        self.assertIsInstance(instances['missing'], exception.NotFound)
+
+    @patch.object(models.srv_grp.ServerGroup, 'load_by_member')
+    @patch.object(models, 'load_server_list')
+    def test_load_details_of_other_tenant(self, mock_servers, mock_groups):
+        context = trove_testtools.TroveTestContext(self, tenant='other')
+        ids = [self.db_infos[0].id]
+
+        instances = models.Instances.load_details(context, ids)
+
+        self.assertIsInstance(instances[ids[0]], exception.NotFound)
+        self.assertFalse(mock_groups.called)
+
+
+class TestInstancesLoadByCluster(TestInstancesLoad):
+
+    def setUp(self):
+        super(TestInstancesLoadByCluster, self).setUp()
+        self.context = trove_testtools.TroveTestContext(self)
+        self.cluster_id = str(uuid.uuid4())
+        for db_info in self.db_infos:
+            db_info.cluster_id = self.cluster_id
+            db_info.save()
+
+    @patch.object(models, 'load_any_instance')
+    def test_failed_member_is_loaded_from_db(self, mock_load):
+        failed_id = self.db_infos[1].id
+
+        def load(context, id, load_server=True):
+            if id == failed_id:
+                raise exception.TroveError("nova is down")
+            return Mock(id=id)
+        mock_load.side_effect = load
+
+        with patch.object(models, 'LOG') as mock_log:
+            instances = models.Instances.load_all_by_cluster_id(
+                self.context, self.cluster_id)
+        self.assertEqual(1, mock_log.error.call_count)
+
+        self.assertEqual([db_info.id for db_info in self.db_infos],
+                         [instance.id for instance in instances])
+        failed = instances[1]
+        self.assertIsInstance(failed, models.UnavailableInstance)
+        self.assertEqual({}, failed.addresses)
+        self.assertEqual(ServiceStatuses.RUNNING,
+                         failed.datastore_status.status)
+        # Not shown as ACTIVE although its datastore was last RUNNING.
+        self.assertEqual(models.InstanceStatus.ERROR, failed.status)
+        self.assertTrue(failed.load_error)
+
+    @patch.object(models, 'load_any_instance')
+    def test_failed_member_without_status(self, mock_load):
+        failed_id = self.db_infos[1].id
+        self.statuses.pop(1).delete()
+
+        def load(context, id, load_server=True):
+            if id == failed_id:
+                raise exception.ModelNotFoundError(
+                    "InstanceServiceStatus Not Found")
+            return Mock(id=id)
+        mock_load.side_effect = load
+
+        with patch.object(models, 'LOG'):
+            instances = models.Instances.load_all_by_cluster_id(
+                self.context, self.cluster_id)
+
+        self.assertEqual([db_info.id for db_info in self.db_infos],
+                         [instance.id for instance in instances])
+        self.assertEqual(ServiceStatuses.UNKNOWN,
+                         instances[1].datastore_status.status)
+
+
+class TestServerLookup(trove_testtools.TestCase):
+
+    def setUp(self):
+        super(TestServerLookup, self).setUp()
+        self.context = trove_testtools.TroveTestContext(self)
+        self.client = Mock()
+        nova_patcher = patch.object(models, 'create_nova_client',
+                                    return_value=self.client)
+        nova_patcher.start()
+        self.addCleanup(nova_patcher.stop)
+        self.addCleanup(models.server_cache.clear)
+
+    def _servers(self, *ids):
+        return [Mock(id=server_id, status='ACTIVE', addresses={})
+                for server_id in ids]
+
+    @patch('trove.common.exception.LOG')
+    def test_server_list_matcher(self, mock_logging):
+        servers = self._servers('a', 'b', 'c', 'c')
+        find_server = models.create_server_list_matcher(servers)
+
+        self.assertIs(servers[1], find_server('instance', 'b'))
+        self.assertRaises(exception.ComputeInstanceNotFound,
+                          find_server, 'instance', 'd')
+        with patch.object(models, 'LOG'):
+            self.assertRaises(exception.TroveError,
+                              find_server, 'instance', 'c')
+
+    def test_load_server_list_gets_page_servers(self):
+        servers = dict((server.id, server)
+                       for server in self._servers('a', 'b'))
+
+        def get(server_id):
+            if server_id not in servers:
+                raise nova_exceptions.NotFound(404)
+            return servers[server_id]
+
+        self.client.servers.get.side_effect = get
+        found = models.load_server_list(self.context,
+                                        ['a', 'b', 'gone', 'a'])
+
+        self.assertEqual(['a', 'b'], sorted(server.id for server in found))
+        self.assertEqual(3, self.client.servers.get.call_count)
+        self.assertFalse(self.client.servers.list.called)
+
+    def test_load_server_list_lists_large_pages(self):
+        self.patch_conf_property('nova_server_lookup_limit', 2)
+        self.client.servers.list.return_value = self._servers('a', 'b', 'c')
+        found = models.load_server_list(self.context, ['a', 'b', 'c'])
+
+        self.assertEqual(self.client.servers.list.return_value, found)
+        self.assertFalse(self.client.servers.get.called)
+
+    def test_load_server_list_empty(self):
+        self.assertEqual([], models.load_server_list(self.context, []))
+        self.assertFalse(self.client.servers.list.called)
+
+    def test_load_server_list_cached(self):
+        self.patch_conf_property('api_cache_ttl', 60)
+        self.client.servers.get.side_effect = (
+            lambda server_id: self._servers(server_id)[0])
+        models.load_server_list(self.context, ['a', 'b'])
+        found = models.load_server_list(self.context, ['a', 'b'])
+
+        self.assertEqual(['a', 'b'], sorted(server.id for server in found))
+        self.assertEqual(2, self.client.servers.get.call_count)
+
+        # Unless the caller asks for fresh data.
+        self.context.use_cache = False
+        models.load_server_list(self.context, ['a', 'b'])
+        self.assertEqual(4, self.client.servers.get.call_count)
+
+    def test_server_status_cache_invalidated_by_action(self):
+        self.patch_conf_property('api_cache_ttl', 60)
+        self.client.servers.get.return_value = Mock(
+            id='server', status='ACTIVE', addresses={})
+        db_info = Mock(compute_instance_id='server', region_id=None,
+                       task_status=InstanceTasks.NONE)
+        models.load_simple_instance_server_status(self.context, db_info)
+        self.client.servers.get.return_value = Mock(
+            id='server', status='REBOOT', addresses={})
+        models.load_simple_instance_server_status(self.context, db_info)
+        self.assertEqual('ACTIVE', db_info.server_status)
+
+        models.invalidate_cached_info(db_info)
+        models.load_simple_instance_server_status(self.context, db_info)
+        self.assertEqual('REBOOT', db_info.server_status)
@@ -39,6 +39,7 @@ from trove.common.instance import ServiceStatuses
 from trove.common.notification import TroveInstanceModifyVolume
 from trove.common import remote
 from trove.common.strategies import storage
+from trove.common.strategies.storage import dedup
 import trove.common.template as template
 from trove.common import utils
 from trove.datastore import models as datastore_models
@@ -806,6 +807,21 @@ class BuiltInstanceTasksTest(trove_testtools.TestCase):
         assert not self.instance_task.server.reboot.called
         assert not self.instance_task.set_datastore_status_to_paused.called
 
+    @patch.object(InstanceServiceStatus, 'find_by')
+    def test_set_datastore_status_to_paused(self, mock_find_by):
+        self.instance_task.set_datastore_status_to_paused()
+        datastore_status = mock_find_by.return_value
+        self.assertEqual(ServiceStatuses.PAUSED, datastore_status.status)
+        datastore_status.save.assert_called_once_with()
+        # The guest reports its status even if it did not change.
+        self.instance_task._guest.report_status.assert_called_once_with()
+
+    @patch.object(InstanceServiceStatus, 'find_by')
+    def test_set_datastore_status_to_paused_guest_error(self, mock_find_by):
+        self.instance_task._guest.report_status.side_effect = GuestError
+        self.instance_task.set_datastore_status_to_paused()
+        mock_find_by.return_value.save.assert_called_once_with()
+
     @patch.object(BaseInstance, 'update_db')
     def test_detach_replica(self, mock_update_db):
         with patch.object(self.instance_task, 'reset_task_status') as tr_mock:
@@ -1047,6 +1063,16 @@ class BackupTasksTest(trove_testtools.TestCase):
                 self.backup.state,
                 "backup should be in DELETE_FAILED status")
 
+    @patch.object(dedup.DedupStorage, 'delete')
+    def test_delete_dedup_backup(self, mock_delete):
+        with patch.object(self.swift_client, 'head_object',
+                          return_value={dedup.MANIFEST_HEADER: 'true'}):
+            taskmanager_models.BackupTasks.delete_backup('dummy context',
+                                                         self.backup.id)
+        mock_delete.assert_called_once_with('12e48.xbstream.gz')
+        self.assertFalse(self.swift_client.delete_object.called)
+        self.backup.delete.assert_any_call()
+
     def test_parse_manifest(self):
         manifest = 'container/prefix'
         cont, prefix = taskmanager_models.BackupTasks._parse_manifest(manifest)